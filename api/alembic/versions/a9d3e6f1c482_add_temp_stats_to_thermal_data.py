@@ -0,0 +1,27 @@
+"""add temp_stats to thermal_data
+
+Revision ID: a9d3e6f1c482
+Revises: f2c9d1a7b354
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e6f1c482'
+down_revision: Union[str, None] = 'f2c9d1a7b354'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Histogram, percentiles and hotspots per thermal image, filled by the next preprocessing run."""
+    op.add_column('thermal_data', sa.Column('temp_stats', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('thermal_data', 'temp_stats')
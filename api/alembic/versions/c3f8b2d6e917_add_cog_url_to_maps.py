@@ -0,0 +1,26 @@
+"""add cog_url to maps
+
+Revision ID: c3f8b2d6e917
+Revises: a9d3e6f1c482
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8b2d6e917'
+down_revision: Union[str, None] = 'a9d3e6f1c482'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Cloud-optimized GeoTIFF next to the PNG of a map, served as XYZ tiles."""
+    op.add_column('maps', sa.Column('cog_url', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('maps', 'cog_url')
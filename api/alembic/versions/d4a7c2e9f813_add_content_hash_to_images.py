@@ -0,0 +1,37 @@
+"""add content_hash to images
+
+Revision ID: d4a7c2e9f813
+Revises: b3e8f1a2c4d7
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c2e9f813'
+down_revision: Union[str, None] = 'b3e8f1a2c4d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add the upload content hash used for duplicate detection within a report."""
+    op.add_column('images', sa.Column('content_hash', sa.String(), nullable=True))
+    op.create_index(op.f('ix_images_content_hash'), 'images', ['content_hash'], unique=False)
+    # Images uploaded before this migration have no hash and are never treated as duplicates.
+    op.create_index(
+        'ux_images_mapping_report_id_content_hash',
+        'images',
+        ['mapping_report_id', 'content_hash'],
+        unique=True,
+        postgresql_where=sa.text('content_hash IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ux_images_mapping_report_id_content_hash', table_name='images')
+    op.drop_index(op.f('ix_images_content_hash'), table_name='images')
+    op.drop_column('images', 'content_hash')
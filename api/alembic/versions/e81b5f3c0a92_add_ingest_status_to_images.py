@@ -0,0 +1,26 @@
+"""add ingest_status to images
+
+Revision ID: e81b5f3c0a92
+Revises: d4a7c2e9f813
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81b5f3c0a92'
+down_revision: Union[str, None] = 'd4a7c2e9f813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Track whether metadata, thumbnail and mapping data of a deferred upload are available yet."""
+    op.add_column('images', sa.Column('ingest_status', sa.String(), server_default='ready', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('images', 'ingest_status')
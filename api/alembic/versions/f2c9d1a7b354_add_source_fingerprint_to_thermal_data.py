@@ -0,0 +1,26 @@
+"""add source_fingerprint to thermal_data
+
+Revision ID: f2c9d1a7b354
+Revises: e81b5f3c0a92
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c9d1a7b354'
+down_revision: Union[str, None] = 'e81b5f3c0a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Remember which version of the R-JPEG a stored matrix was parsed from, so reprocessing can skip it."""
+    op.add_column('thermal_data', sa.Column('source_fingerprint', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('thermal_data', 'source_fingerprint')
@@ -178,6 +178,17 @@ class Config:
         self.WEBODM_PASSWORD = self._get_env("WEBODM_PASSWORD", "admin")
         self.WEBODM_URL = self._get_env("WEBODM_URL", "http://127.0.0.1:8000")
         self.LOG_LEVEL = self._get_env("LOG_LEVEL", "WARNING")
+        self.EXIFTOOL_POOL_SIZE = int(self._get_env("EXIFTOOL_POOL_SIZE", 4))
+        self.DB_POOL_SIZE = int(self._get_env("DB_POOL_SIZE", 5))
+        self.DB_MAX_OVERFLOW = int(self._get_env("DB_MAX_OVERFLOW", 10))
+        self.INGEST_WORKERS = int(self._get_env("INGEST_WORKERS", 12))
+        self.INGEST_ADMISSION_TIMEOUT = float(self._get_env("INGEST_ADMISSION_TIMEOUT", 10))
+        self.UPLOAD_SESSION_TTL = float(self._get_env("UPLOAD_SESSION_TTL", 24 * 3600))  # seconds until an untouched chunked upload is removed
+        self.THERMAL_MATRIX_COMPRESSION = self._get_env("THERMAL_MATRIX_COMPRESSION", "none")  # "none" | "zstd"
+        self.THERMAL_PARSE_WORKERS = int(self._get_env("THERMAL_PARSE_WORKERS", 2))
+        self.MAPPING_COMPOSITOR = self._get_env("MAPPING_COMPOSITOR", "auto").lower()  # "auto" | "parallel" | "tiled"
+        self.MAPPING_POOL_SIZE = int(self._get_env("MAPPING_POOL_SIZE", 0))  # per Celery child, 0 = from CPUs and available memory
+        self.MAPPING_POOL_MAX_TASKS_PER_CHILD = int(self._get_env("MAPPING_POOL_MAX_TASKS_PER_CHILD", 500))
 
     def _set_variables_local(self):        
         # Local config.json settings
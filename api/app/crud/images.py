@@ -1,6 +1,8 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import select, or_
 from sqlalchemy import update as sa_update
+from sqlalchemy import insert as sa_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from datetime import datetime
 
@@ -15,6 +17,8 @@ from app.schemas.image import (
 )
 from app.services.cleanup import delete_image_file
 
+BULK_INSERT_CHUNK_SIZE = 500  # images per INSERT, ~25 bind parameters each
+
 
 def get_all(db: Session):
     return db.query(models.Image).all()
@@ -72,6 +76,26 @@ def get_by_report_full(db: Session, report_id: int):
     )
 
 
+def get_by_content_hashes(db: Session, mapping_report_id: int, content_hashes: list[str]) -> dict:
+    """Return the images of a mapping report with one of the given content hashes, keyed by hash."""
+    if not content_hashes:
+        return {}
+    images = (
+        db.query(models.Image)
+        .filter(
+            models.Image.mapping_report_id == mapping_report_id,
+            models.Image.content_hash.in_(content_hashes),
+        )
+        .options(
+            joinedload(models.Image.mapping_data),
+            joinedload(models.Image.thermal_data),
+            joinedload(models.Image.detections),
+        )
+        .all()
+    )
+    return {image.content_hash: image for image in images}
+
+
 def create(db: Session, data: ImageCreate):
     # img_in = ImageCreate(**data)
     new_image = models.Image(
@@ -83,6 +107,99 @@ def create(db: Session, data: ImageCreate):
     return new_image
 
 
+def get_full_images(db: Session, image_ids: list[int]):
+    return (
+        db.query(models.Image)
+        .options(
+            joinedload(models.Image.mapping_data),
+            joinedload(models.Image.thermal_data),
+            joinedload(models.Image.detections),
+        )
+        .filter(models.Image.id.in_(image_ids))
+        .all()
+    )
+
+
+def create_bulk(
+    db: Session,
+    images: list[ImageCreate],
+    mapping_data: list[MappingDataCreate | None] | None = None,
+) -> list[int | None]:
+    """Insert a batch of images and their mapping data in one transaction.
+
+    Images whose content_hash already exists in their mapping report are skipped
+    (ON CONFLICT DO NOTHING on the unique hash index). The image_id of the given
+    mapping data is replaced by the id of the inserted image. All images need a
+    content_hash that is unique within the batch.
+    Returns:
+        The new image id per input image, in input order, None for skipped duplicates.
+    """
+    if not images:
+        return []
+
+    # one multi-row INSERT per chunk, a single one for thousands of images exceeds
+    # Postgres' limit of 65535 bind parameters
+    ids_by_hash = {}
+    for start in range(0, len(images), BULK_INSERT_CHUNK_SIZE):
+        stmt = (
+            pg_insert(models.Image)
+            .values([image.model_dump() for image in images[start:start + BULK_INSERT_CHUNK_SIZE]])
+            .on_conflict_do_nothing(
+                index_elements=["mapping_report_id", "content_hash"],
+                index_where=models.Image.content_hash.isnot(None),
+            )
+            .returning(models.Image.id, models.Image.content_hash)
+        )
+        # RETURNING gives no order guarantee, match the rows by their hash
+        ids_by_hash.update({content_hash: image_id for image_id, content_hash in db.execute(stmt).all()})
+    image_ids = [ids_by_hash.get(image.content_hash) for image in images]
+
+    mapping_rows = [
+        {**data.model_dump(), "image_id": image_id}
+        for data, image_id in zip(mapping_data or [], image_ids)
+        if data is not None and image_id is not None
+    ]
+    if mapping_rows:
+        db.execute(sa_insert(models.MappingData), mapping_rows)
+
+    db.commit()
+    return image_ids
+
+
+def get_pending_by_ids(db: Session, image_ids: list[int]):
+    return (
+        db.query(models.Image)
+        .filter(
+            models.Image.id.in_(image_ids),
+            models.Image.ingest_status == "pending",
+        )
+        .order_by(models.Image.id)
+        .all()
+    )
+
+
+def count_pending_by_report(db: Session, report_id: int) -> int:
+    return (
+        db.query(models.Image.id)
+        .join(models.MappingReport, models.Image.mapping_report_id == models.MappingReport.id)
+        .filter(
+            models.MappingReport.report_id == report_id,
+            models.Image.ingest_status == "pending",
+        )
+        .count()
+    )
+
+
+def get_ingest_status_by_report(db: Session, report_id: int):
+    return (
+        db.query(models.Image.id, models.Image.filename, models.Image.ingest_status)
+        .join(models.MappingReport, models.Image.mapping_report_id == models.MappingReport.id)
+        .filter(models.MappingReport.report_id == report_id)
+        .order_by(models.Image.id)
+        .all()
+    )
+
+
 def update(db: Session, image_id: int, update_data: ImageUpdate):
     image = db.query(models.Image).filter(models.Image.id == image_id).first()
     if not image:
@@ -121,6 +238,27 @@ def create_mapping_data(db: Session, data: MappingDataCreate):
     return get_full_image(db, new_mapping_data.image_id)
 
 
+def create_multiple_mapping_data(db: Session, data: list[MappingDataCreate]):
+    new_mapping_data_list = [
+        models.MappingData(**mapping_data.model_dump()) for mapping_data in data
+    ]
+    db.add_all(new_mapping_data_list)
+    db.commit()
+    return new_mapping_data_list
+
+
+def set_pending_ingest_status(db: Session, image_ids: list[int], status: str):
+    db.execute(
+        sa_update(models.Image)
+        .where(
+            models.Image.id.in_(image_ids),
+            models.Image.ingest_status == "pending",
+        )
+        .values(ingest_status=status)
+    )
+    db.commit()
+
+
 def delete_mapping_data(db: Session, image_id: int):
     db.query(models.MappingData).filter(
         models.MappingData.image_id == image_id
@@ -179,6 +317,64 @@ def create_multiple_thermal_data(db: Session, data: list[ThermalDataCreate]):
     return new_thermal_data_list
 
 
+def get_thermal_data_by_image_ids(db: Session, image_ids: list[int]) -> dict[int, models.ThermalData]:
+    if not image_ids:
+        return {}
+    rows = (
+        db.query(models.ThermalData)
+        .filter(models.ThermalData.image_id.in_(image_ids))
+        .all()
+    )
+    return {row.image_id: row for row in rows}
+
+
+def upsert_thermal_data(db: Session, data: list[ThermalDataCreate]) -> int:
+    """Update the thermal data of images that have a row and insert it for the others, in two bulk statements."""
+    if not data:
+        return 0
+    existing = dict(
+        db.query(models.ThermalData.image_id, models.ThermalData.id)
+        .filter(models.ThermalData.image_id.in_([td.image_id for td in data]))
+        .all()
+    )
+    updates = [{"id": existing[td.image_id], **td.model_dump()} for td in data if td.image_id in existing]
+    inserts = [td.model_dump() for td in data if td.image_id not in existing]
+    if updates:
+        db.execute(sa_update(models.ThermalData), updates)
+    if inserts:
+        db.execute(sa_insert(models.ThermalData), inserts)
+    db.commit()
+    return len(data)
+
+
+def refresh_thermal_data(db: Session, image_ids: list[int]):
+    """Reload the thermal_data relationship of already loaded images with one query."""
+    if not image_ids:
+        return []
+    return (
+        db.query(models.Image)
+        .options(selectinload(models.Image.thermal_data))
+        .filter(models.Image.id.in_(image_ids))
+        .populate_existing()
+        .all()
+    )
+
+
+def get_thermal_stats_by_report(db: Session, report_id: int, min_temp: float | None = None) -> list[tuple[int, dict]]:
+    """(image_id, temp_stats) of the report's thermal images, only those reaching min_temp if given."""
+    query = (
+        db.query(models.ThermalData.image_id, models.ThermalData.temp_stats)
+        .join(models.Image, models.Image.id == models.ThermalData.image_id)
+        .join(models.MappingReport, models.MappingReport.id == models.Image.mapping_report_id)
+        .filter(models.MappingReport.report_id == report_id)
+        .filter(models.ThermalData.temp_stats.isnot(None))
+    )
+    if min_temp is not None:
+        # max_temp is the hottest pixel, images below the threshold cannot have a matching hotspot
+        query = query.filter(or_(models.ThermalData.max_temp >= min_temp, models.ThermalData.max_temp.is_(None)))
+    return query.all()
+
+
 def get_all_thermal_data(db: Session):
     return db.query(models.ThermalData).all()
 
@@ -203,7 +399,14 @@ def delete_all_thermal_data(db: Session):
     return {"status": "success", "message": "All thermal data deleted successfully"}
 
 
-def update_thermal_matrix_path(db: Session, image_id: int, new_path: str):
+def update_thermal_matrix_path(
+    db: Session,
+    image_id: int,
+    new_path: str,
+    min_temp: float | None = None,
+    max_temp: float | None = None,
+    temp_stats: dict | None = None,
+):
     thermal_data = (
         db.query(models.ThermalData)
         .filter(models.ThermalData.image_id == image_id)
@@ -213,6 +416,11 @@ def update_thermal_matrix_path(db: Session, image_id: int, new_path: str):
         raise ValueError("Thermal data not found for this image")
 
     thermal_data.temp_matrix_path = new_path
+    if min_temp is not None and max_temp is not None:
+        thermal_data.min_temp = min_temp
+        thermal_data.max_temp = max_temp
+    if temp_stats is not None:
+        thermal_data.temp_stats = temp_stats
     db.commit()
     db.refresh(thermal_data)
     return thermal_data
@@ -21,6 +21,9 @@ def get_full_map(db: Session, map_id: int):
         .first()
     )
 
+def get(db: Session, map_id: int):
+    return db.query(models.Map).filter(models.Map.id == map_id).first()
+
 def get_maps_by_mapping_report(db: Session, mapping_report_id: int):
     return db.query(models.Map).filter(models.Map.mapping_report_id == mapping_report_id).all()
 
@@ -38,10 +41,13 @@ def delete(db: Session, map_id: int):
     map_to_delete = db.query(models.Map).filter(models.Map.id == map_id).first()
     if map_to_delete:
         image_url = map_to_delete.url
+        cog_url = map_to_delete.cog_url
         db.delete(map_to_delete)
         db.commit()
         if image_url:
             delete_file(Path(image_url))
+        if cog_url:
+            delete_file(Path(cog_url))
         return True
     return False
 
@@ -16,6 +16,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import inspect
 from app.services.on_startup import cleanup_lost_tasks
+from app.services.chunked_upload import sweep_expired_sessions
 import os
 import redis
 
@@ -46,6 +47,12 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    # readable by cross-origin frontends: resumable uploads and binary thermal matrices
+    expose_headers=[
+        "ETag", "Upload-Offset",
+        "X-Matrix-Width", "X-Matrix-Height", "X-Matrix-Roi", "X-Matrix-Step",
+        "X-Temp-Scale", "X-Temp-Offset", "X-Temp-Min", "X-Temp-Max",
+    ],
 )
 
 
@@ -65,6 +72,7 @@ app.include_router(reconstruction.router)
 app.include_router(export.router)
 
 cleanup_lost_tasks()  # Cleanup lost tasks on startup
+sweep_expired_sessions()  # Remove abandoned chunked uploads
 
 
 inspector = inspect(engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -30,7 +30,20 @@ class Image(Base):
     mappable = Column(Boolean, default=False)
     panoramic = Column(Boolean, default=False)
     thermal = Column(Boolean, default=False)
-    
+    content_hash = Column(String, nullable=True, index=True)  # sha256 of the uploaded file
+    ingest_status = Column(String, default="ready", server_default="ready", nullable=False)  # "pending" | "ready" | "error"
+
+    __table_args__ = (
+        # the same file can only be uploaded once per report
+        Index(
+            "ux_images_mapping_report_id_content_hash",
+            "mapping_report_id",
+            "content_hash",
+            unique=True,
+            postgresql_where=text("content_hash IS NOT NULL"),
+        ),
+    )
+
     # relationships
     mapping_report = relationship("MappingReport", back_populates="images")
     mapping_data = relationship("MappingData", back_populates="image", uselist=False, cascade="all, delete")
@@ -72,10 +85,12 @@ class ThermalData(Base):
     counterpart_scale = Column(Float, default=1.1)
     min_temp = Column(Float)
     max_temp = Column(Float)
-    temp_matrix_path = Column(String, nullable=True)  # Path to the .npy file containing the thermal matrix
+    temp_matrix_path = Column(String, nullable=True)  # Path to the .tmx (or legacy .npy) file containing the thermal matrix
     temp_embedded = Column(Boolean, default=True)
     temp_unit = Column(String, default="C")
     lut_name = Column(String, nullable=True)
+    source_fingerprint = Column(String, nullable=True)  # content hash (or mtime/size) of the R-JPEG the matrix was parsed from
+    temp_stats = Column(JSONB, nullable=True)  # histogram, percentiles and hotspots of the matrix, see thermal_statistics
 
     # relationships
     image = relationship("Image", foreign_keys=[image_id], back_populates="thermal_data")
@@ -16,6 +16,7 @@ class Map(Base):
     mapping_report_id = Column(Integer, ForeignKey("mapping_reports.id"), index=True)
     name = Column(String)
     url = Column(String, nullable=True)
+    cog_url = Column(String, nullable=True)  # Cloud-optimized GeoTIFF of the map, source of the XYZ tiles
     created_at = Column(DateTime, nullable=True)
     odm = Column(Boolean, default=False)
     bounds = Column(JSONB, nullable=True)  # JSONB for storing bounds coordinates
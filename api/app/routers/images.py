@@ -1,36 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Header, Response
 from sqlalchemy.orm import Session
 from typing import List
+import os
 import time
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from collections import Counter
+from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 import app.services.thermal.thermal_processing as thermal_processing
+from app.services.thermal.thermal_on_demand import thermal_parse_pool
 
 
 from app.database import get_db
 
 # Import schemas
-from app.schemas.image import ImageOut, ImageCreate, ImageUpdate, ImageUploadResult, ThermalMatrixResponse, ImageBasicPlusOut
+from app.schemas.image import ImageOut, ImageCreate, ImageUpdate, ImageUploadResult, ThermalMatrixResponse, ImageBasicPlusOut, IngestProgressOut, ThermalStatisticsOut, ThermalHotspotOut
 
 # Import CRUD logic
 import app.crud.images as crud_image
 
-from app.services.image_processing import process_image, check_mapping_report
+from app.services.image_processing import process_images, check_mapping_report
+from app.services.ingest_executor import ingest_executor, IngestBusy
 
 router = APIRouter(prefix="/images", tags=["Images"])
 
+# matrices only change when a report is reprocessed, clients revalidate with the ETag after a minute
+THERMAL_MATRIX_CACHE_CONTROL = "private, max-age=60"
+
 
 @router.get("/", response_model=List[ImageOut])
 def list_images(db: Session = Depends(get_db)):
     return crud_image.get_all(db)
 
 
+@router.get("/ingest/metrics")
+def get_ingest_metrics():
+    """Load of the shared upload pipeline: slots, queue depth and latency per stage."""
+    return ingest_executor.metrics()
+
+
 # @router.post("/{report_id}", response_model=ImageOut)
 # def create_image(report_id: int, image: ImageCreate, db: Session = Depends(get_db)):
 #     return crud_image.create(db, image)
 
 @router.post("/report/{report_id}", response_model=List[ImageUploadResult])
-def create_images_batch(report_id: int, files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+def create_images_batch(
+    report_id: int,
+    files: List[UploadFile] = File(...),
+    deferred: bool = Query(False, description="Only store the files, metadata and thumbnails follow in the background"),
+    db: Session = Depends(get_db),
+):
     if not files:
         raise HTTPException(status_code=400, detail="No images provided")
     #track time to evaluate performance
@@ -38,27 +57,13 @@ def create_images_batch(report_id: int, files: List[UploadFile] = File(...), db:
     #responses = [process_image(report_id, file, db) for file in files]
 
     mapping_report_id = check_mapping_report(report_id, db)
+    # give the connection back, process_images opens its own sessions once the request has an ingest slot
+    db.close()
 
-    def _process(file: UploadFile):
-        # Create a new DB session for this thread
-        db_local = get_db()
-        db_local = next(db_local)  # Get the session from the generator
-        try:
-            result = process_image(report_id, file, mapping_report_id, db_local)
-            db_local.close()
-            return result
-        except Exception as e:
-            db_local.rollback()
-            db_local.close()
-            return {
-                "image_object": None,
-                "filename": file.filename,
-                "status": "error",
-                "error": str(e)
-            }
-
-    with ThreadPoolExecutor(max_workers=12) as executor:
-        responses = list(executor.map(_process, files))
+    try:
+        responses = process_images(report_id, files, mapping_report_id, deferred=deferred)
+    except IngestBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
 
     end_time = time.time()
     processing_time = end_time - start_time
@@ -70,10 +75,44 @@ def get_images_by_report(report_id: int, db: Session = Depends(get_db)): # wihto
     images = crud_image.get_by_report(db, report_id)
     if not images:
         raise HTTPException(status_code=404, detail="No images found for this report")
-    # sort by created_at ascending
-    images.sort(key=lambda x: x.created_at or time.time())
+    # sort by created_at ascending, images without a date (e.g. not ingested yet) last
+    images.sort(key=lambda x: (x.created_at is None, x.created_at or datetime.min))
     return images
 
+
+@router.get("/report/{report_id}/ingest", response_model=IngestProgressOut)
+def get_ingest_progress(report_id: int, db: Session = Depends(get_db)):
+    """Readiness of the report's images, used to follow deferred uploads."""
+    images = crud_image.get_ingest_status_by_report(db, report_id)
+    counts = Counter(image.ingest_status for image in images)
+    return IngestProgressOut(
+        pending=counts["pending"],
+        ready=counts["ready"],
+        error=counts["error"],
+        images=images,
+    )
+
+@router.get("/report/{report_id}/thermal_hotspots", response_model=List[ThermalHotspotOut])
+def get_thermal_hotspots(
+    report_id: int,
+    min_temp: float = Query(..., description="Only hotspots at least this hot (°C)"),
+    limit: int = Query(500, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    """
+    Hotspots of all thermal images of a report at or above min_temp, hottest first.
+    Answered from the statistics stored during preprocessing, no matrix is loaded.
+    """
+    hotspots = [
+        ThermalHotspotOut(image_id=image_id, x=x, y=y, temp=temp)
+        for image_id, temp_stats in crud_image.get_thermal_stats_by_report(db, report_id, min_temp)
+        for x, y, temp in temp_stats.get("hotspots", [])
+        if temp >= min_temp
+    ]
+    hotspots.sort(key=lambda hotspot: hotspot.temp, reverse=True)
+    return hotspots[:limit]
+
+
 @router.get("/{image_id}", response_model=ImageOut)
 def get_image(image_id: int, db: Session = Depends(get_db)):
     return crud_image.get_full_image(db, image_id)
@@ -89,7 +128,7 @@ def delete_image(image_id: int, db: Session = Depends(get_db)):
     return crud_image.delete(db, image_id)
 
 
-@router.get("/{image_id}/thermal_matrix", response_model=ThermalMatrixResponse | None)
+@router.get("/{image_id}/thermal_matrix", response_model=ThermalMatrixResponse)
 def get_thermal_matrix(image_id: int, db: Session = Depends(get_db)):
     """
     Returns the thermal matrix for a given image ID.
@@ -97,22 +136,113 @@ def get_thermal_matrix(image_id: int, db: Session = Depends(get_db)):
     image = crud_image.get_full_image(db, image_id)
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
-    if not image.thermal:
+    if not image.thermal or not image.thermal_data:
         raise HTTPException(status_code=404, detail="Thermal data not available for this image")
 
-    #TODO check under image.thermal_data if there is already a temp_matrix_path, if so load it, other wise try parsing the image and save it
-    if image.thermal_data and image.thermal_data.temp_matrix_path:
-        # Load the temperature matrix from the saved file
-        thermal_matrix = thermal_processing.load_temperature_matrix(image.thermal_data.temp_matrix_path)
+    path, min_temp, max_temp = _thermal_matrix_source(image)
+    thermal_matrix = thermal_processing.load_temperature_matrix(path)
+    if min_temp is None or max_temp is None:
         min_temp, max_temp = thermal_processing.get_temperature_range(thermal_matrix)
-    elif image.thermal_data:
-        # Parse the thermal image to get the temperature matrix
-        if not image.url:
-            raise HTTPException(status_code=400, detail="Image URL is not available for parsing")
-        
-        
-        return None
-    else:
-        raise HTTPException(status_code=404, detail="Thermal data not available for this image")
 
     return ThermalMatrixResponse(image_id=image_id, matrix=thermal_matrix, min_temp=min_temp, max_temp=max_temp)
+
+
+@router.get("/{image_id}/thermal_statistics", response_model=ThermalStatisticsOut)
+def get_thermal_statistics(image_id: int, db: Session = Depends(get_db)):
+    """
+    Returns the temperature histogram, percentiles and hotspots of a thermal image.
+    """
+    image = crud_image.get_full_image(db, image_id)
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not image.thermal or not image.thermal_data:
+        raise HTTPException(status_code=404, detail="Thermal data not available for this image")
+
+    temp_stats = image.thermal_data.temp_stats
+    if temp_stats is None:
+        # matrices from before the statistics existed, or not parsed yet
+        path, _, _ = _thermal_matrix_source(image)
+        db.refresh(image.thermal_data)
+        temp_stats = image.thermal_data.temp_stats
+        if temp_stats is None:
+            min_temp, max_temp, temp_stats = thermal_processing.summarize_temperature_matrix(path)
+            if temp_stats is None:
+                raise HTTPException(status_code=422, detail="Thermal matrix contains no temperatures")
+            crud_image.update_thermal_matrix_path(db, image_id, path, float(min_temp), float(max_temp), temp_stats)
+
+    return ThermalStatisticsOut(image_id=image_id, **temp_stats)
+
+
+@router.get("/{image_id}/thermal_matrix/binary")
+def get_thermal_matrix_binary(
+    image_id: int,
+    roi: str | None = Query(None, description="Region as x,y,width,height in matrix pixels"),
+    step: int = Query(1, ge=1, le=64, description="Take every n-th row and column"),
+    fmt: str = Query("f32", alias="format", pattern="^(f32|i16|png16)$"),
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Returns (a region of) the thermal matrix as binary: little-endian float32 °C ("f32"),
+    int16 ("i16") or a 16 bit PNG ("png16"). Shape, scale/offset and the stored temperature
+    range of the whole image are sent as X-Matrix-* / X-Temp-* headers.
+    """
+    image = crud_image.get_full_image(db, image_id)
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not image.thermal or not image.thermal_data:
+        raise HTTPException(status_code=404, detail="Thermal data not available for this image")
+    region = _parse_roi(roi)
+    path, min_temp, max_temp = _thermal_matrix_source(image)
+    stat = os.stat(path)
+    etag_source = f"{path}:{stat.st_mtime_ns}:{stat.st_size}:{region}:{step}:{fmt}"
+    etag = f'"{hashlib.sha1(etag_source.encode()).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": THERMAL_MATRIX_CACHE_CONTROL}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        data, info = thermal_processing.encode_temperature_window(path, region, step, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if min_temp is None or max_temp is None:
+        min_temp, max_temp = thermal_processing.get_temperature_range(thermal_processing.load_temperature_matrix(path))
+    headers.update({
+        "X-Matrix-Width": str(info["width"]),
+        "X-Matrix-Height": str(info["height"]),
+        "X-Matrix-Roi": ",".join(str(v) for v in info["roi"]),
+        "X-Matrix-Step": str(step),
+        "X-Temp-Scale": f"{info['scale']:.7g}",
+        "X-Temp-Offset": f"{info['offset']:.7g}",
+        "X-Temp-Min": repr(float(min_temp)),
+        "X-Temp-Max": repr(float(max_temp)),
+    })
+    return Response(content=data, media_type=thermal_processing.MATRIX_MEDIA_TYPES[fmt], headers=headers)
+
+
+def _thermal_matrix_source(image) -> tuple[str, float | None, float | None]:
+    """Stored matrix path and temperature range of a thermal image, parsing the R-JPEG on first access."""
+    thermal_data = image.thermal_data
+    if thermal_data.temp_matrix_path and os.path.isfile(thermal_data.temp_matrix_path):
+        return thermal_data.temp_matrix_path, thermal_data.min_temp, thermal_data.max_temp
+    if not image.url:
+        raise HTTPException(status_code=400, detail="Image URL is not available for parsing")
+    try:
+        return thermal_parse_pool.ensure_matrix(image.id, image.mapping_report.report_id, image.url)
+    except TimeoutError:
+        raise HTTPException(status_code=503, detail="Thermal image is still being parsed", headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Thermal image could not be parsed: {e}")
+
+
+def _parse_roi(roi: str | None) -> tuple[int, int, int, int] | None:
+    if roi is None:
+        return None
+    try:
+        x, y, w, h = (int(v) for v in roi.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="roi must be x,y,width,height")
+    if w <= 0 or h <= 0:
+        raise HTTPException(status_code=400, detail="roi width and height must be positive")
+    return x, y, w, h
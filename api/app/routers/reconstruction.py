@@ -3,7 +3,6 @@ import logging
 from datetime import datetime, timezone
 from typing import Optional, Tuple
 
-import pyexifinfo as p
 import redis
 import json
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
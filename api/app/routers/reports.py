@@ -1,14 +1,15 @@
 import os
 import shutil
-from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 import logging
 
 import app.crud.report as crud
 import app.crud.groups as crud_groups
+import app.crud.images as crud_image
 from app.database import get_db
 from app.schemas.report import (
     ReportCreate,
@@ -24,13 +25,17 @@ from app.schemas.report import (
     MappingReportOut,
     ProcessingSettings,
 )
-from app.schemas.image import UploadSummary, VideoUploadResult, ImageUploadResult
+from app.schemas.image import UploadSummary, VideoUploadResult, ImageUploadResult, UploadSessionCreate, UploadSessionOut
 from app.schemas.map import MapOut, MapSharingData
 from app.services.celery_app import celery_app, task_is_really_active
-from app.services.image_processing import process_image, check_mapping_report, UPLOAD_DIR
+from app.services.image_processing import process_images, check_mapping_report, UPLOAD_DIR
+from app.services.ingest_executor import IngestBusy
 from app.services.camera_config_service import extract_video_metadata
+import app.services.chunked_upload as chunked_upload
 
 import app.services.mapping.processing_manager as process_report_service
+import app.services.mapping.map_tiles as map_tiles
+import app.crud.map as map_crud
 import app.services.image_describer as image_describer_service
 import app.services.drz_backend_sharing as drz_service
 from app.config import config
@@ -41,6 +46,8 @@ VIDEO_EXTENSIONS = {"mp4", "mov", "avi", "mkv", "webm", "m4v", "ts", "mts"}
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
+MAP_TILE_CACHE_CONTROL = "public, max-age=86400"
+
 r = redis.Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=0)
 
 logger = logging.getLogger(__name__)
@@ -79,6 +86,7 @@ def delete_report(report_id: int, db: Session = Depends(get_db)):
 def upload_files(
     report_id: int,
     files: List[UploadFile] = File(...),
+    deferred: bool = Query(False, description="Only store the images, metadata and thumbnails follow in the background"),
     db: Session = Depends(get_db),
 ):
     """
@@ -88,6 +96,9 @@ def upload_files(
     - Video only, no MappingReport exists → creates a ReconstructionReport, saves video.
     - Video + images, OR video with existing MappingReport → processes images, discards video with warning.
     - Unknown file types → per-file error in the images list.
+
+    With deferred=true images are only stored and returned with ingest_status "pending";
+    metadata, thumbnails and mapping data are created by the ingest worker.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
@@ -155,19 +166,12 @@ def upload_files(
     # ── Image handling ──────────────────────────────────────────────────────
     if image_files:
         mapping_report_id = check_mapping_report(report_id, db)
-
-        def _process(file: UploadFile):
-            db_local = next(get_db())
-            try:
-                return process_image(report_id, file, mapping_report_id, db_local)
-            except Exception as e:
-                db_local.rollback()
-                return ImageUploadResult(status="error", filename=file.filename, error=str(e))
-            finally:
-                db_local.close()
-
-        with ThreadPoolExecutor(max_workers=12) as executor:
-            image_results = list(executor.map(_process, image_files))
+        # give the connection back, process_images opens its own sessions once the request has an ingest slot
+        db.close()
+        try:
+            image_results = process_images(report_id, image_files, mapping_report_id, deferred=deferred)
+        except IngestBusy as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
         report_type = "mapping"
 
     # ── Unknown files ───────────────────────────────────────────────────────
@@ -184,6 +188,77 @@ def upload_files(
     )
 
 
+# Resumable chunked uploads
+# 1. POST   /{report_id}/uploads               announce a file (name, size, optional sha256)
+# 2. PUT    /{report_id}/uploads/{upload_id}   raw body chunk, header Upload-Offset (+ optional Upload-Checksum)
+# 3. GET    /{report_id}/uploads/{upload_id}   offset to resume from after a dropped connection
+# The request that completes the file also processes it like a regular image upload. If no ingest
+# slot is free it gets a 429, the client then resends an empty chunk at the final offset.
+@router.post("/{report_id}/uploads", response_model=UploadSessionOut, status_code=201)
+def create_upload_session(report_id: int, body: UploadSessionCreate, db: Session = Depends(get_db)):
+    if not crud.get_short_report(db, report_id):
+        raise HTTPException(status_code=404, detail="Report not found")
+    try:
+        return chunked_upload.create_session(report_id, body.filename, body.size, body.checksum)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{report_id}/uploads/{upload_id}", response_model=UploadSessionOut)
+def get_upload_session(report_id: int, upload_id: str, response: Response):
+    try:
+        session = chunked_upload.get_session(report_id, upload_id)
+    except chunked_upload.UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return session
+
+
+@router.put("/{report_id}/uploads/{upload_id}", response_model=UploadSessionOut)
+async def upload_chunk(
+    report_id: int,
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(...),
+    upload_checksum: str | None = Header(None),
+    db: Session = Depends(get_db),
+):
+    try:
+        session = await chunked_upload.append_chunk(
+            report_id, upload_id, upload_offset, request.stream(), upload_checksum
+        )
+        if session["complete"]:
+            result = await run_in_threadpool(chunked_upload.complete_session, report_id, upload_id, db)
+            session["result"] = result
+    except chunked_upload.UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except chunked_upload.UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    except chunked_upload.UploadSessionBusy as e:
+        raise HTTPException(status_code=423, detail=str(e))
+    except IngestBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except chunked_upload.UploadChecksumMismatch as e:
+        # 460 "Checksum Mismatch" as in the tus protocol
+        raise HTTPException(status_code=460, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return session
+
+
+@router.delete("/{report_id}/uploads/{upload_id}", status_code=204)
+def delete_upload_session(report_id: int, upload_id: str):
+    try:
+        chunked_upload.delete_session(report_id, upload_id)
+    except chunked_upload.UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except chunked_upload.UploadSessionBusy as e:
+        raise HTTPException(status_code=423, detail=str(e))
+
+
 # MappingReport endpoints
 @router.post("/{report_id}/mapping_report", response_model=MappingReportOut)
 def create_mapping_report(report_id: int, data: MappingReportCreate, db: Session = Depends(get_db)):
@@ -202,12 +277,34 @@ def get_mapping_report_maps(report_id: int, db: Session = Depends(get_db)):
 def get_mapping_report_maps(report_id: int, db: Session = Depends(get_db)):
     return crud.get_mapping_report_maps_slim(db, report_id)
 
+@router.get("/{report_id}/mapping_report/maps/{map_id}/tiles/{z}/{x}/{y}.png")
+def get_map_tile(report_id: int, map_id: int, z: int, x: int, y: int, db: Session = Depends(get_db)):
+    """
+    Serves XYZ (web mercator) tile z/x/y of a map from its cloud-optimized GeoTIFF.
+    Tiles outside the map are transparent.
+    """
+    db_map = map_crud.get(db, map_id)
+    if not db_map or db_map.mapping_report.report_id != report_id:
+        raise HTTPException(status_code=404, detail="Map not found")
+    if not db_map.cog_url or not os.path.isfile(db_map.cog_url):
+        raise HTTPException(status_code=404, detail="Map has no tiles")
+    if not 0 <= z <= map_tiles.MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Invalid tile address")
+
+    tile = map_tiles.render_xyz_tile(db_map.cog_url, z, x, y)
+    content = map_tiles.EMPTY_TILE if tile is None else map_tiles.encode_png(tile)
+    # a map's files never change, reprocessing creates a new map
+    return Response(content=content, media_type="image/png", headers={"Cache-Control": MAP_TILE_CACHE_CONTROL})
+
 @router.get("/{report_id}/mapping_report/webodm_project_id", response_model=int | None)
 def get_mapping_report_webodm_project_id(report_id: int, db: Session = Depends(get_db)):
     return crud.get_mapping_report_webodm_project_id(db, report_id)
 
 @router.post("/{report_id}/process", response_model=ReportOut)
 def process_report(report_id: int, processing_settings: ProcessingSettings, db: Session = Depends(get_db)):
+    pending = crud_image.count_pending_by_report(db, report_id)
+    if pending:
+        raise HTTPException(status_code=409, detail=f"{pending} image(s) of the report are still being ingested")
     returnval = crud.update_process(db, report_id, "queued", 0.0)
     processing_settings_dict = processing_settings.model_dump()
     logger.warning(f"Starting processing for report {report_id} with settings: {processing_settings_dict}")
@@ -180,7 +180,7 @@ def get_appearance_settings():
 
 @router.post("/camera_configs/exif_dump")
 async def get_exif_dump(file: UploadFile = File(...)) -> dict[str, Any]:
-    """Upload a sample image; returns the complete pyexifinfo metadata dict (not saved)."""
+    """Upload a sample image; returns the complete exiftool metadata dict (not saved)."""
     try:
         return await run_in_threadpool(camera_config_svc.read_exif_from_upload_sync, file)
     except ValueError as e:
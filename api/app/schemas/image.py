@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -16,14 +16,16 @@ class ImageBase(BaseModel):
     preprocessed: Optional[bool] = False  
     created_at: Optional[datetime] = None
     uploaded_at: Optional[datetime] = None
-    width: int
-    height: int
+    width: Optional[int] = None  # None until a deferred upload has been ingested
+    height: Optional[int] = None
     coord: Optional[dict] = None  # JSONB as dict
     camera_model: Optional[str] = None
     mappable: Optional[bool] = False
     panoramic: Optional[bool] = False
     thermal: Optional[bool] = False
-    
+    content_hash: Optional[str] = None
+    ingest_status: Optional[str] = "ready"  # "pending" | "ready" | "error"
+
 
 class ImageCreate(ImageBase):
     pass
@@ -62,6 +64,35 @@ class ImageUploadResult(BaseModel):
     image_object: Optional[ImageOut] = None
 
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int                        # total size in bytes
+    checksum: Optional[str] = None   # sha256 hex digest of the whole file, verified on completion
+
+
+class UploadSessionOut(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    offset: int                      # bytes received so far, the next chunk has to start here
+    complete: bool = False
+    result: Optional[ImageUploadResult] = None
+
+
+class ImageIngestStatus(BaseModel):
+    id: int
+    filename: str
+    ingest_status: str
+    model_config = ConfigDict(from_attributes=True)
+
+
+class IngestProgressOut(BaseModel):
+    pending: int = 0
+    ready: int = 0
+    error: int = 0
+    images: List[ImageIngestStatus] = []
+
+
 class VideoUploadResult(BaseModel):
     status: str           # "uploaded" | "skipped" | "error"
     filename: Optional[str] = None
@@ -132,13 +163,14 @@ class ThermalDataBase(BaseModel):
     counterpart_scale: Optional[float] = 1.1
     min_temp: Optional[float] = None
     max_temp: Optional[float] = None
-    temp_matrix_path: Optional[str] = None  # Path to the .npy file containing the thermal matrix
+    temp_matrix_path: Optional[str] = None  # Path to the .tmx (or legacy .npy) file containing the thermal matrix
     temp_embedded: Optional[bool] = True
     temp_unit: Optional[str] = "C"
     lut_name: Optional[str] = None
+    source_fingerprint: Optional[str] = None
 
 class ThermalDataCreate(ThermalDataBase):
-    pass
+    temp_stats: Optional[dict] = None  # see thermal_statistics, not part of ThermalDataOut to keep image lists small
 
 class ThermalDataUpdate(BaseModel):
     image_id: Optional[int] = None
@@ -146,10 +178,12 @@ class ThermalDataUpdate(BaseModel):
     counterpart_scale: Optional[float] = None
     min_temp: Optional[float] = None
     max_temp: Optional[float] = None
-    temp_matrix_path: Optional[str] = None  # Path to the .npy file containing the thermal matrix
+    temp_matrix_path: Optional[str] = None  # Path to the .tmx (or legacy .npy) file containing the thermal matrix
     temp_embedded: Optional[bool] = True
     temp_unit: Optional[str] = None
     lut_name: Optional[str] = None
+    source_fingerprint: Optional[str] = None
+    temp_stats: Optional[dict] = None
 
 class ThermalDataOut(ThermalDataBase):
     id: int
@@ -162,6 +196,26 @@ class ThermalMatrixResponse(BaseModel):
     max_temp: float
     matrix: List[List[float]]  # or int if they're integers
 
+
+class ThermalHistogram(BaseModel):
+    min: float
+    max: float
+    counts: List[int]  # equally wide bins between min and max
+
+
+class ThermalStatisticsOut(BaseModel):
+    image_id: int
+    histogram: ThermalHistogram
+    percentiles: Dict[str, float]  # "p1" ... "p99"
+    hotspots: List[List[float]]  # [x, y, temp] in matrix pixels, hottest first
+
+
+class ThermalHotspotOut(BaseModel):
+    image_id: int
+    x: int
+    y: int
+    temp: float
+
 ##################
 ## Detection
 ##################
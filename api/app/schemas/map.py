@@ -12,6 +12,7 @@ class MapBase(BaseModel):
     mapping_report_id: int
     name: str
     url: str
+    cog_url: Optional[str] = None  # Cloud-optimized GeoTIFF, maps with one can be loaded as XYZ tiles
     odm: bool = False  # Indicates if the map is generated by ODM
     bounds: Optional[dict] = None  # JSONB as dict for storing bounds coordinates
 
@@ -21,6 +22,7 @@ class MapCreate(MapBase):
 class MapUpdate(BaseModel):
     name: Optional[str] = None
     url: Optional[str] = None
+    cog_url: Optional[str] = None
     odm: Optional[bool] = None
     bounds: Optional[dict] = None
 
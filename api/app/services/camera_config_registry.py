@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import logging
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+MTIME_CHECK_INTERVAL = 2.0  # seconds between stat() calls per config file
+
+
+class CameraConfigRegistry:
+    """In-memory cache of the per-model camera config JSON files.
+
+    Lookups are served from memory. A file is re-read when its mtime changed
+    (checked at most every MTIME_CHECK_INTERVAL seconds) or when it was written
+    through this registry. Auto-discovery of unknown models is serialized per
+    model, so concurrent upload threads only discover and write a config once.
+    """
+
+    def __init__(self, config_dir: Path, filename_for: Callable[[str], str]):
+        self.config_dir = config_dir
+        self._filename_for = filename_for
+        self._lock = threading.Lock()
+        # filename -> (mtime_ns, last_checked, config)
+        self._entries: dict[str, tuple[int, float, dict]] = {}
+        self._discovery_locks: dict[str, threading.Lock] = {}
+
+    def load_all(self) -> list[tuple[Path, dict]]:
+        """Read every config file in the directory into memory, sorted by filename."""
+        configs = []
+        for path in sorted(self.config_dir.glob("*.json")):
+            config = self._load(path)
+            if config is not None:
+                configs.append((path, config))
+        return configs
+
+    def get(self, model_name: str) -> dict | None:
+        """Return the config for model_name, or None if there is no config file."""
+        path = self.config_dir / self._filename_for(model_name)
+        entry = self._entries.get(path.name)
+        if entry and time.monotonic() - entry[1] < MTIME_CHECK_INTERVAL:
+            return entry[2]
+        return self._load(path)
+
+    def get_or_discover(self, model_name: str, discover: Callable[[], dict]) -> dict:
+        """Return the config for model_name, running discover() once if it does not exist yet."""
+        config = self.get(model_name)
+        if config is not None:
+            return config
+
+        filename = self._filename_for(model_name)
+        with self._lock:
+            discovery_lock = self._discovery_locks.setdefault(filename, threading.Lock())
+        with discovery_lock:
+            # another thread may have discovered it while we were waiting
+            config = self._load(self.config_dir / filename)
+            if config is None:
+                config = discover()
+                self.save(model_name, config)
+        return config
+
+    def save(self, model_name: str, config: dict) -> Path:
+        """Atomically write config to disk and update the cache."""
+        path = self.config_dir / self._filename_for(model_name)
+        self.config_dir.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.config_dir, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(config, f, indent=2)
+            os.replace(tmp_path, path)
+        except Exception:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._store(path, config)
+        return path
+
+    def invalidate(self, model_name: str | None = None) -> None:
+        """Drop one cached config (or all of them) so the next lookup re-reads the file."""
+        with self._lock:
+            if model_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._filename_for(model_name), None)
+
+    def _load(self, path: Path) -> dict | None:
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path.name, None)
+            return None
+
+        entry = self._entries.get(path.name)
+        if entry and entry[0] == mtime:
+            with self._lock:
+                self._entries[path.name] = (mtime, time.monotonic(), entry[2])
+            return entry[2]
+
+        with path.open() as f:
+            config = json.load(f)
+        logger.debug(f"Loaded camera config {path.name}")
+        with self._lock:
+            self._entries[path.name] = (mtime, time.monotonic(), config)
+        return config
+
+    def _store(self, path: Path, config: dict) -> None:
+        mtime = path.stat().st_mtime_ns
+        with self._lock:
+            self._entries[path.name] = (mtime, time.monotonic(), config)
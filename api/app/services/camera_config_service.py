@@ -1,4 +1,4 @@
-import json
+import copy
 import logging
 import shutil
 import tempfile
@@ -9,20 +9,17 @@ from fastapi import UploadFile
 logger = logging.getLogger(__name__)
 
 from app.services.image_metadata_extraction import (
-    CAMERA_CONFIGS_DIR,
-    _model_name_to_filename,
     _read_metadata,
+    camera_configs,
 )
 
 
 def list_configs() -> list[dict]:
     """Return summary of all model configs, excluding _default and other templates."""
     results = []
-    for path in sorted(CAMERA_CONFIGS_DIR.glob("*.json")):
+    for path, data in camera_configs.load_all():
         if path.name.startswith("_"):
             continue
-        with path.open() as f:
-            data = json.load(f)
         results.append({
             "model_name": data.get("_model", path.stem),
             "auto_discovered": data.get("_auto_discovered", False),
@@ -33,19 +30,14 @@ def list_configs() -> list[dict]:
 
 def get_config(model_name: str) -> dict | None:
     """Load config for model_name, or None if not found."""
-    path = CAMERA_CONFIGS_DIR / _model_name_to_filename(model_name)
-    if not path.exists():
-        return None
-    with path.open() as f:
-        return json.load(f)
+    config = camera_configs.get(model_name)
+    # callers may modify the returned dict, never hand out the cached one
+    return copy.deepcopy(config) if config is not None else None
 
 
 def save_config(model_name: str, config_data: dict) -> None:
-    """Write config dict to disk."""
-    path = CAMERA_CONFIGS_DIR / _model_name_to_filename(model_name)
-    CAMERA_CONFIGS_DIR.mkdir(exist_ok=True)
-    with path.open("w") as f:
-        json.dump(config_data, f, indent=2)
+    """Write config dict to disk and refresh the in-memory registry."""
+    camera_configs.save(model_name, config_data)
 
 
 def build_empty_config(model_name: str) -> dict:
@@ -71,7 +63,7 @@ def build_empty_config(model_name: str) -> dict:
 
 
 def read_exif_from_upload_sync(file: UploadFile) -> dict:
-    """Save UploadFile to temp, run pyexifinfo, delete temp. Returns raw metadata dict."""
+    """Save UploadFile to temp, run exiftool, delete temp. Returns raw metadata dict."""
     suffix = Path(file.filename).suffix if file.filename else ".jpg"
     with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
         tmp_path = tmp.name
@@ -101,7 +93,7 @@ def extract_video_metadata(video_path: str) -> tuple:
     try:
         metadata = _read_metadata(video_path)
     except Exception:
-        logger.warning(f"pyexifinfo failed on {video_path}", exc_info=True)
+        logger.warning(f"exiftool failed on {video_path}", exc_info=True)
         return None, "N/A"
 
     # --- flight_timestamp: collect all dates, filter bad ones, pick oldest ---
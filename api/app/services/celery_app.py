@@ -20,6 +20,7 @@ celery_app.autodiscover_tasks(["app.services.image_describer"])
 
 celery_app.conf.task_routes = {
     "mapping.*": {"queue": "mapping"},
+    "ingest.*": {"queue": "ingest"},
     "detection.*": {"queue": "detection"},
     "description.*": {"queue": "description"},
     "detection_yolo.*": {"queue": "detection_yolo"},
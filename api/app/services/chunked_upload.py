@@ -0,0 +1,364 @@
+import os
+import json
+import base64
+import fcntl
+import hashlib
+import time
+import logging
+from pathlib import Path
+from typing import AsyncIterator
+from uuid import uuid4
+
+import anyio
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from app.config import config
+
+from app.services.image_processing import (
+    UPLOAD_DIR,
+    ALLOWED_EXTENSIONS,
+    check_mapping_report,
+    hash_file,
+    process_stored_image,
+)
+from app.services.ingest_executor import ingest_executor
+import app.crud.images as crud_image
+
+logger = logging.getLogger(__name__)
+
+# partial files and their session state live next to the finished images of the report
+SESSIONS_DIRNAME = ".uploads"
+SUPPORTED_CHECKSUM_ALGORITHM = "sha256"
+SWEEP_INTERVAL = 3600  # seconds between sweeps for expired uploads
+
+_last_sweep = 0.0
+
+
+class UploadSessionNotFound(Exception):
+    """Raised for unknown upload ids."""
+
+
+class UploadSessionBusy(Exception):
+    """Raised if another request is currently writing to, completing or deleting the same upload."""
+
+
+class UploadOffsetMismatch(Exception):
+    """Raised if a chunk does not start at the current offset of the upload."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Chunk has to start at offset {offset}")
+        self.offset = offset
+
+
+class UploadChecksumMismatch(Exception):
+    """Raised if a chunk or the completed file does not match its checksum. The data is discarded."""
+
+
+def create_session(report_id: int, filename: str, size: int, checksum: str | None = None) -> dict:
+    """Start a resumable upload of one image file.
+    Args:
+        report_id (int): The report the image belongs to.
+        filename (str): The original filename.
+        size (int): Total size of the file in bytes.
+        checksum (str | None): Optional sha256 hex digest of the whole file.
+    Returns:
+        dict: The session state, see get_session.
+    """
+    if size <= 0:
+        raise ValueError("File size has to be positive")
+    if filename.split(".")[-1].lower() not in ALLOWED_EXTENSIONS:
+        raise ValueError("Unsupported file type")
+    _sweep_periodically()
+
+    session = {
+        "upload_id": uuid4().hex,
+        "filename": filename,
+        "size": size,
+        "checksum": checksum.lower() if checksum else None,
+        "result": None,
+    }
+    _sessions_dir(report_id).mkdir(parents=True, exist_ok=True)
+    _part_path(report_id, session["upload_id"]).touch()
+    _write_state(report_id, session)
+    return _with_offset(report_id, session)
+
+
+def get_session(report_id: int, upload_id: str) -> dict:
+    """Return the state of an upload, including the offset the client has to resume from."""
+    return _with_offset(report_id, _read_state(report_id, upload_id))
+
+
+async def append_chunk(
+    report_id: int,
+    upload_id: str,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+    checksum: str | None = None,
+) -> dict:
+    """Append the streamed request body to an upload.
+
+    The chunk is written straight into the partial file. If it does not match
+    its checksum (header format "sha256 <base64 digest>"), the file is truncated
+    back to the previous offset so that the client only has to resend this chunk.
+    If the connection drops, the bytes received so far are kept unless a
+    checksum was given, since they can not be verified then.
+    An upload that is already complete is returned as is, e.g. when the client
+    resends the last chunk because it lost the response.
+    Returns:
+        dict: The session state after the chunk was stored.
+    """
+    await run_in_threadpool(_read_state, report_id, upload_id)
+    expected_digest = _parse_checksum(checksum) if checksum else None
+    part_path = _part_path(report_id, upload_id)
+
+    # file operations run in the threadpool, a slow disk must not stall the event loop
+    lock = await run_in_threadpool(_lock_upload, report_id, upload_id)
+    try:
+        session = await run_in_threadpool(_read_state, report_id, upload_id)
+        if session["result"] is not None:
+            # the part file is gone, it was moved into the report
+            return await run_in_threadpool(_with_offset, report_id, session)
+        await _write_chunk(part_path, session, offset, chunks, expected_digest)
+    finally:
+        lock.close()  # releases the lock
+
+    return await run_in_threadpool(_with_offset, report_id, session)
+
+
+async def _write_chunk(
+    part_path: Path,
+    session: dict,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+    expected_digest: bytes | None,
+) -> None:
+    f, current = await run_in_threadpool(_open_part, part_path)
+    try:
+        if offset != current:
+            raise UploadOffsetMismatch(current)
+
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            async for chunk in chunks:
+                written += len(chunk)
+                if current + written > session["size"]:
+                    raise ValueError(f"Chunk exceeds the announced file size of {session['size']} bytes")
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+            if expected_digest is not None and digest.digest() != expected_digest:
+                raise UploadChecksumMismatch("Chunk checksum mismatch")
+            await run_in_threadpool(f.flush)
+        except ClientDisconnect:
+            if expected_digest is not None:
+                await _truncate(f, current)
+            raise
+        except BaseException:
+            # keep only verified data, the client resends from the old offset
+            await _truncate(f, current)
+            raise
+    finally:
+        f.close()
+
+    logger.debug(f"Upload {session['upload_id']}: stored {written} bytes at offset {current}")
+
+
+def complete_session(report_id: int, upload_id: str, db: Session) -> dict:
+    """Verify a fully received upload and run it through the image pipeline.
+
+    Like process_images, the pipeline only runs while the request holds an
+    ingest slot (raises IngestBusy if none frees up in time). The upload stays
+    locked until its result is stored, so concurrent requests get
+    UploadSessionBusy and later ones the stored result.
+    Returns:
+        dict: The result of process_stored_image, same format as process_image.
+    """
+    _read_state(report_id, upload_id)
+    with _lock_upload(report_id, upload_id):
+        session = _read_state(report_id, upload_id)
+        if session["result"] is not None:
+            return _stored_result(session["result"], db)
+        return _complete_locked(report_id, session, db)
+
+
+def _complete_locked(report_id: int, session: dict, db: Session) -> dict:
+    upload_id = session["upload_id"]
+    part_path = _part_path(report_id, upload_id)
+
+    with part_path.open("rb") as f:
+        content_hash = hash_file(f)
+    if session["checksum"] and content_hash != session["checksum"]:
+        # the chunks were stored correctly but do not form the announced file, start over
+        part_path.write_bytes(b"")
+        raise UploadChecksumMismatch("File checksum mismatch, the upload has to be restarted")
+
+    # same admission as regular uploads, raises IngestBusy; the client resends an empty chunk at the final offset
+    with ingest_executor.admit():
+        mapping_report_id = check_mapping_report(report_id, db)
+        result = process_stored_image(report_id, part_path, session["filename"], mapping_report_id, db, content_hash)
+
+    image = result.get("image_object")
+    session["result"] = {
+        "status": result["status"],
+        "filename": result.get("filename", session["filename"]),
+        "error": result.get("error"),
+        "image_id": image.id if image is not None else None,
+    }
+    _write_state(report_id, session)
+    part_path.unlink(missing_ok=True)
+    return result
+
+
+def delete_session(report_id: int, upload_id: str) -> None:
+    """Abort an upload and remove its data."""
+    _read_state(report_id, upload_id)
+    with _lock_upload(report_id, upload_id):
+        _part_path(report_id, upload_id).unlink(missing_ok=True)
+        _state_path(report_id, upload_id).unlink(missing_ok=True)
+        _lock_path(report_id, upload_id).unlink(missing_ok=True)
+
+
+def sweep_expired_sessions(max_age: float | None = None) -> int:
+    """Remove uploads that were not touched for max_age seconds (default UPLOAD_SESSION_TTL).
+
+    Abandoned uploads would otherwise keep their partial files forever. Uploads
+    that are currently receiving data are skipped.
+    Returns:
+        int: The number of removed uploads.
+    """
+    max_age = config.UPLOAD_SESSION_TTL if max_age is None else max_age
+    deadline = time.time() - max_age
+    removed = 0
+    for sessions_dir in UPLOAD_DIR.glob(f"*/{SESSIONS_DIRNAME}"):
+        for state_path in sessions_dir.glob("*.json"):
+            upload_id = state_path.stem
+            part_path = sessions_dir / f"{upload_id}.part"
+            try:
+                last_change = max(p.stat().st_mtime for p in (state_path, part_path) if p.exists())
+            except (OSError, ValueError):
+                continue
+            if last_change > deadline:
+                continue
+            lock_path = sessions_dir / f"{upload_id}.lock"
+            try:
+                with lock_path.open("a") as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    part_path.unlink(missing_ok=True)
+                    state_path.unlink(missing_ok=True)
+                    lock_path.unlink()
+                removed += 1
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                logger.warning(f"Failed to remove expired upload {upload_id}: {e}")
+        # leftovers of interrupted state writes and locks of uploads deleted in the meantime
+        leftovers = [*sessions_dir.glob("*.tmp"), *(p for p in sessions_dir.glob("*.lock") if not p.with_suffix(".json").exists())]
+        for path in leftovers:
+            try:
+                if path.stat().st_mtime <= deadline:
+                    path.unlink()
+            except OSError:
+                pass
+    if removed:
+        logger.info(f"Removed {removed} expired chunked uploads")
+    return removed
+
+
+def _sweep_periodically() -> None:
+    global _last_sweep
+    if time.monotonic() - _last_sweep < SWEEP_INTERVAL:
+        return
+    _last_sweep = time.monotonic()
+    try:
+        sweep_expired_sessions()
+    except Exception as e:
+        logger.error(f"Failed to sweep expired uploads: {e}")
+
+
+def _lock_upload(report_id: int, upload_id: str):
+    """Take the lock of an upload without waiting. Returns the lock file, closing it releases the lock.
+
+    The lock lives in its own file because the partial file is moved away on completion.
+    """
+    lock = _lock_path(report_id, upload_id).open("a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        raise UploadSessionBusy(f"Upload {upload_id} is busy with another request")
+    return lock
+
+
+def _stored_result(result: dict, db: Session) -> dict:
+    image = crud_image.get_full_image(db, result["image_id"]) if result.get("image_id") else None
+    return {**result, "image_object": image}
+
+
+def _open_part(part_path: Path):
+    """Open the partial file for writing at its end. Returns the file and its size."""
+    f = part_path.open("r+b")
+    current = os.fstat(f.fileno()).st_size
+    f.seek(current)
+    return f, current
+
+
+async def _truncate(f, size: int) -> None:
+    # shielded, the truncate also has to happen if the request was cancelled
+    with anyio.CancelScope(shield=True):
+        await run_in_threadpool(f.truncate, size)
+
+
+def _parse_checksum(checksum: str) -> bytes:
+    algorithm, _, value = checksum.strip().partition(" ")
+    if algorithm.lower() != SUPPORTED_CHECKSUM_ALGORITHM:
+        raise ValueError(f"Unsupported checksum algorithm '{algorithm}', use {SUPPORTED_CHECKSUM_ALGORITHM}")
+    try:
+        return base64.b64decode(value, validate=True)
+    except ValueError:
+        raise ValueError("Checksum has to be base64 encoded")
+
+
+def _with_offset(report_id: int, session: dict) -> dict:
+    part_path = _part_path(report_id, session["upload_id"])
+    if session["result"] is not None:
+        offset = session["size"]
+    else:
+        offset = part_path.stat().st_size if part_path.exists() else 0
+    return {**session, "offset": offset, "complete": offset == session["size"]}
+
+
+def _sessions_dir(report_id: int) -> Path:
+    return UPLOAD_DIR / str(report_id) / SESSIONS_DIRNAME
+
+
+def _part_path(report_id: int, upload_id: str) -> Path:
+    return _sessions_dir(report_id) / f"{upload_id}.part"
+
+
+def _lock_path(report_id: int, upload_id: str) -> Path:
+    return _sessions_dir(report_id) / f"{upload_id}.lock"
+
+
+def _state_path(report_id: int, upload_id: str) -> Path:
+    return _sessions_dir(report_id) / f"{upload_id}.json"
+
+
+def _read_state(report_id: int, upload_id: str) -> dict:
+    # upload ids are uuid4 hex strings, anything else could escape the sessions directory
+    if not upload_id.isalnum():
+        raise UploadSessionNotFound(upload_id)
+    try:
+        with _state_path(report_id, upload_id).open() as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise UploadSessionNotFound(upload_id)
+
+
+def _write_state(report_id: int, session: dict) -> None:
+    path = _state_path(report_id, session["upload_id"])
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w") as f:
+        json.dump(session, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import queue
+import select
+import threading
+import subprocess
+import logging
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+EXIFTOOL_EXECUTABLE = "exiftool"
+# Same flags pyexifinfo used ("exiftool -G -j"): group-prefixed keys and
+# human readable values (no -n), so "EXIF:Model" and DMS coordinates keep working.
+EXIFTOOL_COMMON_ARGS = ["-G", "-j"]
+READY_MARKER = b"{ready}"
+READ_SIZE = 64 * 1024
+CALL_TIMEOUT = 10  # seconds per exiftool call, plus CALL_TIMEOUT_PER_FILE for every file in it
+CALL_TIMEOUT_PER_FILE = 2
+
+
+class ExifToolCrashed(RuntimeError):
+    """Raised when an exiftool process exits while serving a request."""
+
+
+class ExifToolTimeout(ExifToolCrashed):
+    """Raised when an exiftool process does not answer a request in time; the process is killed."""
+
+
+class _ExifToolProcess:
+    """A single ``exiftool -stay_open`` process speaking the ``-@ -`` argfile protocol."""
+
+    def __init__(self):
+        self._process = subprocess.Popen(
+            [EXIFTOOL_EXECUTABLE, "-stay_open", "True", "-@", "-", "-common_args", *EXIFTOOL_COMMON_ARGS],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def execute(self, params: list[str], timeout: float | None = None) -> bytes:
+        request = "\n".join([*params, "-execute"]) + "\n"
+        try:
+            self._process.stdin.write(request.encode("utf-8"))
+            self._process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ExifToolCrashed(f"could not send request: {e}") from e
+
+        # read the raw pipe with a deadline instead of readline(), which could block forever
+        deadline = None if timeout is None else time.monotonic() + timeout
+        fd = self._process.stdout.fileno()
+        output = bytearray()
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise ExifToolTimeout(f"exiftool did not answer within {timeout:.0f}s")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, READ_SIZE)
+            if not chunk:
+                raise ExifToolCrashed("exiftool exited before answering")
+            output += chunk
+            # the answer ends with the marker on a line of its own
+            if output.endswith(READY_MARKER + b"\n") and (
+                len(output) == len(READY_MARKER) + 1 or output[-len(READY_MARKER) - 2] == ord("\n")
+            ):
+                return bytes(output[:-len(READY_MARKER) - 1])
+
+    def kill(self):
+        if self.alive:
+            self._process.kill()
+        self._process.wait()
+
+    def terminate(self):
+        if not self.alive:
+            return
+        try:
+            self._process.stdin.write(b"-stay_open\nFalse\n")
+            self._process.stdin.flush()
+            self._process.wait(timeout=5)
+        except Exception:
+            self._process.kill()
+            self._process.wait()
+
+
+class ExifToolPool:
+    """Pool of long-lived exiftool processes shared by all threads of a process.
+
+    Workers are started lazily, handed out one thread at a time and restarted
+    transparently if the underlying Perl process died. The pool is reset after
+    a fork so celery/billiard children never share a parent's pipes.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._started = 0
+
+    def _ensure_pool(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # first use, or inherited from a parent process -> start from scratch
+            self._idle = queue.LifoQueue()
+            self._started = 0
+            self._pid = os.getpid()
+
+    def _checkout(self) -> _ExifToolProcess:
+        self._ensure_pool()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            spawn = self._started < self.size
+            if spawn:
+                self._started += 1
+        if spawn:
+            try:
+                return _ExifToolProcess()
+            except Exception:
+                with self._lock:
+                    self._started -= 1
+                raise
+        return self._idle.get()
+
+    def execute_json(self, paths: list[str]) -> list[dict]:
+        """Run ``exiftool -G -j`` on all paths with one worker and return the parsed JSON list.
+
+        If the worker process is dead or dies during the call, it is restarted
+        and the request is retried once. A worker that does not answer in time
+        is killed (and restarted on its next use) and ExifToolTimeout is raised.
+        """
+        params = [str(path) for path in paths]
+        timeout = CALL_TIMEOUT + CALL_TIMEOUT_PER_FILE * len(params)
+        worker = self._checkout()
+        try:
+            for attempt in (1, 2):
+                if not worker.alive:
+                    logger.warning("exiftool worker is not running, restarting it")
+                    worker = _ExifToolProcess()
+                try:
+                    output = worker.execute(params, timeout)
+                    break
+                except ExifToolTimeout as e:
+                    logger.error(f"exiftool worker hung on {len(params)} file(s), killing it: {e}")
+                    worker.kill()
+                    raise
+                except ExifToolCrashed as e:
+                    logger.warning(f"exiftool worker crashed (attempt {attempt}): {e}")
+                    worker.terminate()
+            else:
+                raise ExifToolCrashed(f"exiftool crashed twice while reading {len(params)} file(s)")
+        finally:
+            self._idle.put(worker)
+
+        if not output.strip():
+            # exiftool prints nothing if none of the files could be read
+            return []
+        return json.loads(output)
+
+    def close(self):
+        """Stop all idle workers (e.g. on shutdown)."""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            worker.terminate()
+            with self._lock:
+                self._started -= 1
+
+
+exiftool_pool = ExifToolPool(size=config.EXIFTOOL_POOL_SIZE)
+
+
+def read_metadata(paths: list[str]) -> dict[str, dict | None]:
+    """Read metadata for a list of files with a single exiftool call.
+
+    Returns a dict keyed by the path as given; files exiftool could not read map to None.
+    """
+    results = exiftool_pool.execute_json(paths)
+    by_source = {entry.get("SourceFile"): entry for entry in results}
+    return {str(path): by_source.get(str(path)) for path in paths}
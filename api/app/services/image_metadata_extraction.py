@@ -1,27 +1,32 @@
 import json
+import math
+import numpy as np
 import pyproj
-import pyexifinfo as p
 import re
 from datetime import datetime, timezone
 from pathlib import Path
 import logging
+from functools import lru_cache
+
+from app.services.exiftool_pool import exiftool_pool, read_metadata
+from app.services.camera_config_registry import CameraConfigRegistry
+from app.services.ingest_executor import ingest_executor
 
 logger = logging.getLogger(__name__)
 
 CAMERA_CONFIGS_DIR = Path("app/camera_configs")
+EXIF_BATCH_SIZE = 100  # max files per exiftool invocation
 
 
 def _read_metadata(image_path: str) -> dict:
-    data = p.get_json(image_path)
+    data = exiftool_pool.execute_json([image_path])
     if not data:
         raise ValueError("No metadata found in the image file.")
 
-    strings = json.dumps(data, sort_keys=True, indent=4, separators=(",", ": "))
-    python_dict = json.loads(strings)[0]
-
-    logger.debug(f"Metadata for {image_path}:\n{strings}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Metadata for {image_path}:\n{json.dumps(data[0], sort_keys=True, indent=4)}")
 
-    return python_dict
+    return data[0]
 
 
 def _model_name_to_filename(model_name: str) -> str:
@@ -30,21 +35,29 @@ def _model_name_to_filename(model_name: str) -> str:
     return safe + ".json"
 
 
+camera_configs = CameraConfigRegistry(CAMERA_CONFIGS_DIR, _model_name_to_filename)
+
+
 def _load_model_config(model_name: str, metadata: dict) -> dict:
     """Load per-model config, auto-discovering and saving if not found."""
-    config_path = CAMERA_CONFIGS_DIR / _model_name_to_filename(model_name)
-    if config_path.exists():
-        with config_path.open() as f:
-            return json.load(f)
-    logger.info(f"No config for '{model_name}', running auto-discovery.")
-    return _auto_discover_config(model_name, metadata)
+    def _discover():
+        logger.info(f"No config for '{model_name}', running auto-discovery.")
+        return _build_discovered_config(model_name, metadata)
+
+    return camera_configs.get_or_discover(model_name, _discover)
 
 
 def _auto_discover_config(model_name: str, metadata: dict) -> dict:
     """Try all candidate keys from _default.json against actual metadata, save result."""
-    default_path = CAMERA_CONFIGS_DIR / "_default.json"
-    with default_path.open() as f:
-        template = json.load(f)
+    config = _build_discovered_config(model_name, metadata)
+    save_path = camera_configs.save(model_name, config)
+    logger.info(f"Saved auto-discovered config to {save_path}")
+    return config
+
+
+def _build_discovered_config(model_name: str, metadata: dict) -> dict:
+    """Build a config by matching the candidate keys from _default.json against the metadata."""
+    template = camera_configs.get("_default") or {}
 
     config = {
         "_model": model_name,
@@ -88,27 +101,79 @@ def _auto_discover_config(model_name: str, metadata: dict) -> dict:
     ir_config["ir_scale"] = ir_template.get("ir_scale_default", 0.5)
     config["ir"] = ir_config
 
-    # Save
-    save_path = CAMERA_CONFIGS_DIR / _model_name_to_filename(model_name)
-    CAMERA_CONFIGS_DIR.mkdir(exist_ok=True)
-    with save_path.open("w") as f:
-        json.dump(config, f, indent=2)
-    logger.info(f"Saved auto-discovered config to {save_path}")
-
     return config
 
 
 def get_ir_scale(model_name: str) -> float:
     """Return ir_scale for a known model config, or 0.5 default."""
-    config_path = CAMERA_CONFIGS_DIR / _model_name_to_filename(model_name)
-    if config_path.exists():
-        with config_path.open() as f:
-            return json.load(f).get("ir", {}).get("ir_scale", 0.5)
+    config = camera_configs.get(model_name)
+    if config is not None:
+        return config.get("ir", {}).get("ir_scale", 0.5)
     return 0.5
 
 
 def extract_image_metadata(image_path: str) -> dict:
     metadata = _read_metadata(image_path)
+    return _build_image_data(image_path, metadata)
+
+
+def extract_image_metadata_batch(image_paths: list[str], batch_size: int = EXIF_BATCH_SIZE) -> list[tuple]:
+    """Extract metadata for many images with a few exiftool invocations.
+
+    The paths are split into chunks that are read in parallel by the exiftool pool.
+    Returns one ``(data, error)`` tuple per input path, in input order. A file that
+    cannot be read or parsed only fails its own entry, never the whole batch.
+    """
+    paths = [str(path) for path in image_paths]
+    if not paths:
+        return []
+
+    workers = exiftool_pool.size
+    batch_size = max(1, min(batch_size, math.ceil(len(paths) / workers)))
+    chunks = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+
+    raw_metadata = {}
+    for chunk_metadata in ingest_executor.map("exif", _read_metadata_chunk, chunks):
+        raw_metadata.update(chunk_metadata)
+
+    results = []
+    for path in paths:
+        metadata = raw_metadata.get(path)
+        if isinstance(metadata, Exception):
+            results.append((None, str(metadata)))
+            continue
+        if not metadata:
+            results.append((None, "No metadata found in the image file."))
+            continue
+        try:
+            results.append((_build_image_data(path, metadata, convert_utm=False), None))
+        except Exception as e:
+            logger.warning(f"Error extracting metadata from {path}: {e}")
+            results.append((None, str(e)))
+
+    _convert_utm_batch([data["coord"] for data, _ in results if data and data.get("coord")])
+    return results
+
+
+def _read_metadata_chunk(paths: list[str]) -> dict:
+    """Read one chunk with a single exiftool call, falling back to per-file reads if it fails."""
+    try:
+        return read_metadata(paths)
+    except Exception as e:
+        if len(paths) == 1:
+            return {paths[0]: e}
+        logger.warning(f"Batched exiftool call for {len(paths)} files failed ({e}), reading them one by one")
+
+    chunk_metadata = {}
+    for path in paths:
+        try:
+            chunk_metadata.update(read_metadata([path]))
+        except Exception as e:
+            chunk_metadata[path] = e
+    return chunk_metadata
+
+
+def _build_image_data(image_path: str, metadata: dict, convert_utm: bool = True) -> dict:
     model_name = metadata.get("EXIF:Model", "Unknown Camera")
     config = _load_model_config(model_name, metadata)
 
@@ -118,7 +183,7 @@ def extract_image_metadata(image_path: str) -> dict:
     logger.debug(f"extracted creation_date for {model_name}: {creation_date}")
     width, height = _extract_dimensions(metadata, config)
     logger.debug(f"extracted dimensions for {model_name}: width={width}, height={height}")
-    coord = _extract_coordinates(metadata, config)
+    coord = _extract_coordinates(metadata, config, convert_utm)
     logger.debug(f"extracted coordinates for {model_name}: {coord}")    
 
 
@@ -195,7 +260,7 @@ def _extract_dimensions(metadata: dict, config: dict) -> tuple:
     return width, height
 
 
-def _extract_coordinates(metadata: dict, config: dict) -> dict:
+def _extract_coordinates(metadata: dict, config: dict, convert_utm: bool = True) -> dict:
     gps_lat = metadata.get(config["gps"]["lat"], None)
     gps_lon = metadata.get(config["gps"]["lon"], None)
     gps_alt = metadata.get(config["gps"]["alt"], None)
@@ -203,7 +268,7 @@ def _extract_coordinates(metadata: dict, config: dict) -> dict:
     if gps_lat is None or gps_lon is None:
         coord = None
     else:
-        coord = _convert_coord(gps_lat, gps_lon, gps_alt, gps_rel_alt)
+        coord = _convert_coord(gps_lat, gps_lon, gps_alt, gps_rel_alt, convert_utm)
 
     return coord
 
@@ -264,7 +329,7 @@ def _adjust_data(model_name: str, data: dict) -> dict:
     return data
 
 
-def _convert_coord(lat: str, lon: str, alt: str, rel_alt: str) -> dict:
+def _convert_coord(lat: str, lon: str, alt: str, rel_alt: str, convert_utm: bool = True) -> dict:
     lat_decimal = _dms_to_decimal(lat)
     lon_decimal = _dms_to_decimal(lon)
 
@@ -286,7 +351,11 @@ def _convert_coord(lat: str, lon: str, alt: str, rel_alt: str) -> dict:
     hemisphere = "N" if lat_decimal >= 0 else "S"
     zone_letter = _latitude_to_utm_band_letter(lat_decimal)
 
-    easting, northing, utm_crs = _latlon_to_utm(lon_decimal, lat_decimal, zone)
+    if convert_utm:
+        easting, northing, utm_crs = _latlon_to_utm(lon_decimal, lat_decimal, zone)
+    else:
+        # filled in later by _convert_utm_batch
+        easting, northing, utm_crs = None, None, _utm_crs(zone, lat_decimal)
     return {
         "gps": {
             "lat": lat_decimal,
@@ -319,13 +388,19 @@ def _dms_to_decimal(dms_str: str) -> float:
     return decimal
 
 
-def _latlon_to_utm(long: float, lat: float, zone: int) -> tuple:
-    # Define the WGS84 and UTM projections using EPSG codes
-    wgs84_crs = "EPSG:4326"
-    utm_crs = f"EPSG:326{zone:02d}" if lat >= 0 else f"EPSG:327{zone:02d}"
+def _utm_crs(zone: int, lat: float) -> str:
+    return f"EPSG:326{zone:02d}" if lat >= 0 else f"EPSG:327{zone:02d}"
+
+
+@lru_cache(maxsize=32)
+def _get_wgs84_transformer(utm_crs: str):
+    """Cached pyproj Transformer for WGS84→UTM conversion."""
+    return pyproj.Transformer.from_crs("EPSG:4326", utm_crs)
 
-    # Create a transformer object
-    transformer = pyproj.Transformer.from_crs(wgs84_crs, utm_crs)
+
+def _latlon_to_utm(long: float, lat: float, zone: int) -> tuple:
+    utm_crs = _utm_crs(zone, lat)
+    transformer = _get_wgs84_transformer(utm_crs)
 
     # Transform the coordinates
     easting, northing = transformer.transform(lat, long)
@@ -333,6 +408,45 @@ def _latlon_to_utm(long: float, lat: float, zone: int) -> tuple:
     return (easting, northing, utm_crs)
 
 
+def latlon_to_utm_array(lats, lons) -> tuple:
+    """
+    Vectorized WGS84→UTM conversion for many points.
+
+    Points are grouped by UTM zone and hemisphere, each group is converted
+    with a single transform call.
+
+    Returns:
+        tuple: (eastings, northings, crs) as numpy arrays.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    zones = ((lons + 180) / 6).astype(np.int64) + 1
+    epsg_codes = np.where(lats >= 0, 32600, 32700) + zones
+
+    eastings = np.empty_like(lats)
+    northings = np.empty_like(lats)
+    for epsg_code in np.unique(epsg_codes):
+        mask = epsg_codes == epsg_code
+        transformer = _get_wgs84_transformer(f"EPSG:{epsg_code}")
+        eastings[mask], northings[mask] = transformer.transform(lats[mask], lons[mask])
+
+    crs = np.array([f"EPSG:{code}" for code in epsg_codes])
+    return eastings, northings, crs
+
+
+def _convert_utm_batch(coords: list[dict]) -> None:
+    """Fill in easting/northing of coord dicts created with convert_utm=False."""
+    if not coords:
+        return
+    lats = [coord["gps"]["lat"] for coord in coords]
+    lons = [coord["gps"]["lon"] for coord in coords]
+    eastings, northings, crs = latlon_to_utm_array(lats, lons)
+    for coord, easting, northing, utm_crs in zip(coords, eastings, northings, crs):
+        coord["utm"]["easting"] = float(easting)
+        coord["utm"]["northing"] = float(northing)
+        coord["utm"]["crs"] = str(utm_crs)
+
+
 def _calculate_zone(long):
     return int((long + 180) / 6) + 1
 
@@ -2,25 +2,32 @@ from fastapi import APIRouter, UploadFile, File, Depends
 from sqlalchemy.orm import Session
 from uuid import uuid4
 from pathlib import Path
-import shutil
+import os
+import hashlib
 from datetime import datetime, timezone
-from PIL import Image
+from sqlalchemy.exc import IntegrityError
 import logging
 
 from app.config import config
 UPLOAD_DIR = Path(config.UPLOAD_DIR)
 
+from app.database import get_db
 import app.crud.images as crud_image
 import app.crud.report as crud_report
 from app.schemas.image import ImageCreate, MappingDataCreate
+from app.services.celery_app import celery_app
+from app.services.ingest_executor import ingest_executor
 
 import app.services.image_metadata_extraction as metadata_extraction
+from app.services.thumbnails import create_thumbnail
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 UPLOAD_DIR.mkdir(exist_ok=True)
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png"} #maybe later add support for tiff, bmp, webp, etc.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+INGEST_BATCH_SIZE = 50  # deferred uploads handled per ingest task
 
 
 
@@ -32,102 +39,517 @@ def process_image(report_id: int, file: UploadFile, mapping_report_id: int, db:
     Returns:
         dict: A dictionary containing the original filename and the filename it was stored as.
     """
+    error = _validate_upload(file)
+    if error:
+        return error
 
-   
+    file_path = None
     try:
-        if not file.filename:
-            return {
-                "img_object": None,
-                "filename": "None",
-                "status": "error",
-                "error": "Filename not provided"
-            }
-    
-        if not file.filename.split(".")[-1].lower() in ALLOWED_EXTENSIONS:
-            return {
-                "img_object": None, 
-                "filename": file.filename,
-                "status": "error",
-                "error": "Unsupported file type"
-            }
-                
-        file.file.seek(0)
+        file_path, content_hash = _save_upload(report_id, file)
+    except Exception as e:
+        return _upload_error(file, e, file_path)
 
-        # Save file
-        og_filename = file.filename
-        ext = file.filename.split(".")[-1]
-        filename = f"{uuid4()}.{ext}"
-        file_path = UPLOAD_DIR / str(report_id) / filename
+    return _process_saved_image(file, file_path, content_hash, mapping_report_id, db)
 
-        # Ensure the directory exists
-        file_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with file_path.open("wb") as f:
-            shutil.copyfileobj(file.file, f)
+def process_stored_image(report_id: int, source: Path, filename: str, mapping_report_id: int, db: Session, content_hash: str = None) -> dict:
+    """Processes an image that is already on disk, e.g. a completed chunked upload.
 
+    The file is moved (not copied) into the report directory under a unique name
+    and then goes through the same pipeline as process_image.
+    Args:
+        report_id (int): The ID of the report the image belongs to.
+        source (Path): The file to take over, must be on the same filesystem as UPLOAD_DIR.
+        filename (str): The original filename of the upload.
+        mapping_report_id (int): The ID of the mapping report.
+        db (Session): Database session dependency.
+        content_hash (str): sha256 hex digest of the file if already known.
+    Returns:
+        dict: Same format as process_image.
+    """
+    with source.open("rb") as f:
+        file = UploadFile(file=f, filename=filename)
+        error = _validate_upload(file)
+        if error:
+            return error
 
+        file_path = None
+        try:
+            content_hash = content_hash or hash_file(f)
+            file_path = _unique_upload_path(report_id, filename)
+            os.replace(source, file_path)
+        except Exception as e:
+            return _upload_error(file, e, file_path)
+
+        return _process_saved_image(file, file_path, content_hash, mapping_report_id, db)
+
+
+def _process_saved_image(file: UploadFile, file_path: Path, content_hash: str, mapping_report_id: int, db: Session) -> dict:
+    """Duplicate check, metadata extraction, thumbnail and DB rows for a file in the report directory."""
+    try:
+        duplicate = crud_image.get_by_content_hashes(db, mapping_report_id, [content_hash]).get(content_hash)
+        if duplicate:
+            return _duplicate_result(file, duplicate, file_path)
         metadata = metadata_extraction.extract_image_metadata(file_path)
+    except Exception as e:
+        return _upload_error(file, e, file_path)
 
-        # Create a thumbnail (placeholder logic, replace with actual thumbnail creation)
-        thumbnail_path = save_thumbnail(file_path, file)
-        
-
-        data = {
-            "mapping_report_id": mapping_report_id,
-            "filename": og_filename,
-            "url": str(file_path),
-            "thumbnail_url": str(thumbnail_path),
-            "created_at": metadata["created_at"],
-            "uploaded_at": datetime.now(timezone.utc).isoformat(),
-            "width": metadata["width"],
-            "height": metadata["height"],
-            "camera_model": metadata["camera_model"],
-            "mappable": metadata["mappable"],
-            "panoramic": metadata["panoramic"],
-            "thermal": metadata["thermal"],
+    return _store_image(file, file_path, content_hash, metadata, mapping_report_id, db)
+
+
+def process_images(report_id: int, files: list[UploadFile], mapping_report_id: int, deferred: bool = False) -> list[dict]:
+    """Processes all image files of one upload request.
+
+    The request has to get one of the slots of the shared ingest executor
+    first (raises IngestBusy if none frees up in time), all parallel work runs
+    on its worker threads. Files are written and hashed in parallel. Files already present in the
+    report (or repeated within the request) are dropped as duplicates, the
+    metadata of the rest is read with a few batched exiftool calls and
+    thumbnails are created in parallel. Finally all Image and MappingData rows
+    are inserted in a single transaction with one DB session. A failing file
+    only produces an error entry for itself. Results are returned in upload order.
+
+    In deferred mode only the files and minimal "pending" Image rows are
+    stored; metadata, thumbnails and MappingData are created by the ingest
+    worker (see ingest_pending_images) and the rows switch to "ready".
+    Args:
+        report_id (int): The ID of the report the images belong to.
+        files (list[UploadFile]): The uploaded image files.
+        mapping_report_id (int): The ID of the mapping report.
+        deferred (bool): Return right after storing the files and queue the rest.
+    Returns:
+        list[dict]: One result dict per file, same format as process_image.
+    """
+    def _save(file: UploadFile):
+        error = _validate_upload(file)
+        if error:
+            return error
+        try:
+            return _save_upload(report_id, file)
+        except Exception as e:
+            return _upload_error(file, e)
+
+    def _thumbnail(file: UploadFile, saved: tuple, extracted: tuple):
+        file_path, _ = saved
+        _, error = extracted
+        if error:
+            return _upload_error(file, error, file_path)
+        try:
+            return save_thumbnail(file_path, file)
+        except Exception as e:
+            return _upload_error(file, e, file_path)
+
+    with ingest_executor.admit():
+        saved = ingest_executor.map("save", _save, files)
+        results = list(saved)
+
+        uploads = {i: item for i, item in enumerate(saved) if isinstance(item, tuple)}
+        with ingest_executor.timed("duplicates"):
+            duplicates = _find_duplicates(uploads, mapping_report_id)
+        for i, duplicate in duplicates.items():
+            file_path, _ = uploads.pop(i)
+            results[i] = _duplicate_result(files[i], duplicate, file_path)
+
+        if deferred:
+            with ingest_executor.timed("db_insert"):
+                queued = _queue_uploads(files, uploads, mapping_report_id)
+            for i, result in queued.items():
+                results[i] = result
+            return results
+
+        saved_indices = list(uploads)
+        extracted = metadata_extraction.extract_image_metadata_batch([uploads[i][0] for i in saved_indices])
+
+        thumbnails = ingest_executor.map(
+            "thumbnail",
+            _thumbnail,
+            [files[i] for i in saved_indices],
+            [uploads[i] for i in saved_indices],
+            extracted,
+        )
+
+        stored = {}
+        for i, (metadata, _), thumbnail in zip(saved_indices, extracted, thumbnails):
+            if isinstance(thumbnail, Path):
+                stored[i] = (metadata, thumbnail)
+            else:
+                results[i] = thumbnail
+
+        with ingest_executor.timed("db_insert"):
+            inserted = _insert_uploads(files, uploads, stored, mapping_report_id)
+        for i, result in inserted.items():
+            results[i] = result
+
+    return results
+
+
+def _validate_upload(file: UploadFile) -> dict | None:
+    """Returns an error result if the upload can not be processed as an image, else None."""
+    if not file.filename:
+        return {
+            "image_object": None,
+            "filename": "None",
+            "status": "error",
+            "error": "Filename not provided"
         }
 
+    if not file.filename.split(".")[-1].lower() in ALLOWED_EXTENSIONS:
+        return {
+            "image_object": None,
+            "filename": file.filename,
+            "status": "error",
+            "error": "Unsupported file type"
+        }
+    return None
+
+
+def _save_upload(report_id: int, file: UploadFile) -> tuple[Path, str]:
+    """Streams the uploaded file to the report directory under a unique name.
+
+    The upload is read once into a reused buffer and every chunk is hashed and
+    written from that same memory, so hashing needs no second pass over the file.
+    Returns:
+        tuple[Path, str]: The path of the stored file and the sha256 hex digest of its content.
+    """
+    file.file.seek(0)
+    file_path = _unique_upload_path(report_id, file.filename)
+
+    digest = hashlib.sha256()
+    buffer = bytearray(UPLOAD_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with file_path.open("wb") as f:
+        while True:
+            n = file.file.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+            f.write(view[:n])
+
+    return file_path, digest.hexdigest()
+
+
+def hash_file(f) -> str:
+    """Returns the sha256 hex digest of an open binary file, read from its current position."""
+    digest = hashlib.sha256()
+    buffer = bytearray(UPLOAD_CHUNK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        n = f.readinto(buffer)
+        if not n:
+            break
+        digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def _unique_upload_path(report_id: int, filename: str) -> Path:
+    """Returns a new unique path in the report directory, keeping the file extension."""
+    ext = filename.split(".")[-1]
+    file_path = UPLOAD_DIR / str(report_id) / f"{uuid4()}.{ext}"
+
+    # Ensure the directory exists
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    return file_path
+
+
+def _find_duplicates(uploads: dict[int, tuple[Path, str]], mapping_report_id: int) -> dict:
+    """Finds uploads whose content already exists in the report or earlier in the same request.
+    Args:
+        uploads (dict[int, tuple[Path, str]]): Upload index -> (file path, content hash).
+        mapping_report_id (int): The ID of the mapping report.
+    Returns:
+        dict: Upload index -> the existing Image, or None if the original is part of this request.
+    """
+    if not uploads:
+        return {}
+
+    db = next(get_db())
+    try:
+        existing = crud_image.get_by_content_hashes(
+            db, mapping_report_id, list({content_hash for _, content_hash in uploads.values()})
+        )
+    finally:
+        db.close()
+
+    duplicates = {}
+    seen = set()
+    for i, (_, content_hash) in uploads.items():
+        if content_hash in existing:
+            duplicates[i] = existing[content_hash]
+        elif content_hash in seen:
+            duplicates[i] = None
+        seen.add(content_hash)
+    return duplicates
+
+
+def _queue_uploads(files: list[UploadFile], uploads: dict[int, tuple[Path, str]], mapping_report_id: int) -> dict[int, dict]:
+    """Creates pending Image rows for saved uploads and queues them on the ingest worker.
+    Args:
+        files (list[UploadFile]): All files of the upload request.
+        uploads (dict[int, tuple[Path, str]]): Upload index -> (file path, content hash) of the files to queue.
+        mapping_report_id (int): The ID of the mapping report.
+    Returns:
+        dict[int, dict]: Upload index -> result dict.
+    """
+    if not uploads:
+        return {}
+
+    indices = list(uploads)
+    uploaded_at = datetime.now(timezone.utc).isoformat()
+    data = [
+        ImageCreate(
+            mapping_report_id=mapping_report_id,
+            filename=files[i].filename,
+            url=str(uploads[i][0]),
+            thumbnail_url=str(_thumbnail_path(uploads[i][0])),
+            uploaded_at=uploaded_at,
+            content_hash=uploads[i][1],
+            ingest_status="pending",
+        )
+        for i in indices
+    ]
+
+    db = next(get_db())
+    try:
+        image_ids = crud_image.create_bulk(db, data)
+        results = _insert_results(files, uploads, dict(zip(indices, image_ids)), {}, mapping_report_id, db)
+    except Exception as e:
+        db.rollback()
+        return {i: _upload_error(files[i], e, uploads[i][0]) for i in indices}
+    finally:
+        db.close()
+
+    queued = [image_id for image_id in image_ids if image_id]
+    sent = 0
+    try:
+        for start in range(0, len(queued), INGEST_BATCH_SIZE):
+            batch = queued[start:start + INGEST_BATCH_SIZE]
+            celery_app.signature("ingest.process_images", args=[batch], queue="ingest").apply_async()
+            sent += len(batch)
+    except Exception as e:
+        # no task will pick the rest up, so they must not stay pending
+        unsent = queued[sent:]
+        logger.error(f"Could not queue {len(unsent)} deferred uploads for ingestion: {e}")
+        db = next(get_db())
         try:
-            data["coord"] = metadata["coord"]
-        except KeyError:
-            #print("No coordinate data found in metadata.", flush=True)
-            pass
-            
+            crud_image.set_pending_ingest_status(db, unsent, "error")
+        finally:
+            db.close()
+        unsent = set(unsent)
+        for i, image_id in zip(indices, image_ids):
+            if image_id in unsent:
+                results[i]["image_object"].ingest_status = "error"
+                results[i].update(status="error", filename=files[i].filename, error=f"Could not queue the image for ingestion: {e}")
+    logger.info(f"Queued {sent} deferred uploads for ingestion")
+
+    return results
+
+
+def _insert_uploads(files: list[UploadFile], uploads: dict[int, tuple[Path, str]], stored: dict[int, tuple[dict, Path]], mapping_report_id: int) -> dict[int, dict]:
+    """Inserts the Image and MappingData rows of all stored uploads in one transaction.
+    Args:
+        files (list[UploadFile]): All files of the upload request.
+        uploads (dict[int, tuple[Path, str]]): Upload index -> (file path, content hash).
+        stored (dict[int, tuple[dict, Path]]): Upload index -> (metadata, thumbnail path) of the files to insert.
+        mapping_report_id (int): The ID of the mapping report.
+    Returns:
+        dict[int, dict]: Upload index -> result dict.
+    """
+    if not stored:
+        return {}
+
+    results = {}
+    images = {}
+    mapping_data = {}
+    uploaded_at = datetime.now(timezone.utc).isoformat()
+    for i, (metadata, thumbnail_path) in stored.items():
+        file_path, content_hash = uploads[i]
+        try:
+            images[i] = _image_create(files[i], file_path, thumbnail_path, content_hash, metadata, mapping_report_id, uploaded_at)
+            if metadata.get("mapping_data"):
+                # validated per image here, the bulk insert replaces the placeholder image_id
+                mapping_data[i] = MappingDataCreate(**{**metadata["mapping_data"], "image_id": 0})
+        except Exception as e:
+            images.pop(i, None)
+            results[i] = _upload_error(files[i], e, file_path, thumbnail_path)
+
+    indices = list(images)
+    thumbnails = {i: stored[i][1] for i in indices}
+    db = next(get_db())
+    try:
+        image_ids = crud_image.create_bulk(db, list(images.values()), [mapping_data.get(i) for i in indices])
+        results.update(_insert_results(files, uploads, dict(zip(indices, image_ids)), thumbnails, mapping_report_id, db))
+    except Exception as e:
+        db.rollback()
+        for i in indices:
+            results[i] = _upload_error(files[i], e, uploads[i][0], thumbnails[i])
+    finally:
+        db.close()
+
+    return results
+
+
+def _insert_results(files: list[UploadFile], uploads: dict[int, tuple[Path, str]], image_ids: dict[int, int | None], thumbnails: dict[int, Path], mapping_report_id: int, db: Session) -> dict[int, dict]:
+    """Builds the results of a bulk insert, loading all new images with a single query.
+
+    Uploads without an id lost a race against a concurrent request with the same file
+    and are reported as duplicates of the stored image.
+    """
+    new_images = {image.id: image for image in crud_image.get_full_images(db, [x for x in image_ids.values() if x])}
+    missing = [uploads[i][1] for i, image_id in image_ids.items() if image_id is None]
+    duplicates = crud_image.get_by_content_hashes(db, mapping_report_id, missing)
+
+    results = {}
+    for i, image_id in image_ids.items():
+        file_path, content_hash = uploads[i]
+        if image_id is None:
+            results[i] = _duplicate_result(files[i], duplicates.get(content_hash), file_path, thumbnails.get(i))
+        else:
+            results[i] = {"image_object": new_images[image_id], "status": "success"}
+    return results
+
+
+def ingest_pending_images(image_ids: list[int], db: Session) -> int:
+    """Completes deferred uploads: reads metadata, creates thumbnails and MappingData.
+
+    Images that are not pending anymore (e.g. handled by an earlier delivery of
+    the same task) are skipped. Images that fail are marked with ingest_status "error".
+    Args:
+        image_ids (list[int]): IDs of the pending images.
+        db (Session): Database session dependency.
+    Returns:
+        int: Number of images that are ready now.
+    """
+    images = crud_image.get_pending_by_ids(db, image_ids)
+    if not images:
+        return 0
+
+    extracted = metadata_extraction.extract_image_metadata_batch([image.url for image in images])
+
+    def _thumbnail(image, extracted_item):
+        if extracted_item[1]:
+            return None
+        try:
+            save_thumbnail(Path(image.url))
+        except Exception as e:
+            return e
+        return None
+
+    thumbnail_errors = ingest_executor.map("thumbnail", _thumbnail, images, extracted)
+
+    ready = 0
+    mapping_data = []
+    for image, (metadata, error), thumbnail_error in zip(images, extracted, thumbnail_errors):
+        error = error or thumbnail_error
+        if error:
+            logger.warning(f"Failed to ingest image {image.id}: {error}")
+            image.ingest_status = "error"
+            continue
+
+        _apply_metadata(image, metadata)
+        image.ingest_status = "ready"
+        if metadata.get("mapping_data"):
+            mapping_data.append(MappingDataCreate(**{**metadata["mapping_data"], "image_id": image.id}))
+        ready += 1
+
+    db.commit()
+    if mapping_data:
+        crud_image.create_multiple_mapping_data(db, mapping_data)
+    return ready
+
+
+def _store_image(file: UploadFile, file_path: Path, content_hash: str, metadata: dict, mapping_report_id: int, db: Session) -> dict:
+    """Creates the thumbnail and the Image/MappingData rows for an already saved file."""
+    thumbnail_path = None
+    try:
+        thumbnail_path = save_thumbnail(file_path, file)
+        data = _image_create(
+            file, file_path, thumbnail_path, content_hash, metadata, mapping_report_id,
+            datetime.now(timezone.utc).isoformat(),
+        )
 
         # Store metadata in the database
-        img = crud_image.create(db, ImageCreate(**data))
+        img = crud_image.create(db, data)
         if metadata.get("mapping_data"):
             mapping_data = metadata["mapping_data"]
             mapping_data["image_id"] = img.id
             img = crud_image.create_mapping_data(db, MappingDataCreate(**mapping_data))
         else:
             img = crud_image.get_full_image(db, img.id)
-            
-
 
         return {
             "image_object": img,
             "status": "success",
         }
-    
+
+    except IntegrityError as e:
+        db.rollback()
+        # a concurrent request stored the same file in the meantime
+        duplicate = crud_image.get_by_content_hashes(db, mapping_report_id, [content_hash]).get(content_hash)
+        if duplicate:
+            return _duplicate_result(file, duplicate, file_path, thumbnail_path)
+        return _upload_error(file, e, file_path, thumbnail_path)
+
     except Exception as e:
-        print(f"Error processing file {file.filename}: {e}")
+        db.rollback()
+        return _upload_error(file, e, file_path, thumbnail_path)
 
-        # delete possibly created files
-        if file_path:
-            if file_path.exists():
-                file_path.unlink()
 
-        if thumbnail_path:
-            if thumbnail_path.exists():
-                thumbnail_path.unlink()
+def _image_create(file: UploadFile, file_path: Path, thumbnail_path: Path, content_hash: str, metadata: dict, mapping_report_id: int, uploaded_at: str) -> ImageCreate:
+    """Builds the Image row for a stored upload from its extracted metadata."""
+    data = {
+        "mapping_report_id": mapping_report_id,
+        "filename": file.filename,
+        "url": str(file_path),
+        "thumbnail_url": str(thumbnail_path),
+        "created_at": metadata["created_at"],
+        "uploaded_at": uploaded_at,
+        "width": metadata["width"],
+        "height": metadata["height"],
+        "camera_model": metadata["camera_model"],
+        "mappable": metadata["mappable"],
+        "panoramic": metadata["panoramic"],
+        "thermal": metadata["thermal"],
+        "content_hash": content_hash,
+    }
+
+    try:
+        data["coord"] = metadata["coord"]
+    except KeyError:
+        pass
+
+    return ImageCreate(**data)
 
-        return {
-            "image_object": None,
-            "filename": file.filename,
-            "status": "error",
-            "error": str(e)
-        }
+
+def _duplicate_result(file: UploadFile, duplicate, file_path: Path, thumbnail_path: Path = None) -> dict:
+    """Removes the files of a duplicate upload and returns a duplicate result pointing to the stored image."""
+    logger.info(f"Skipping duplicate upload {file.filename}")
+
+    for path in (file_path, thumbnail_path):
+        if path and path.exists():
+            path.unlink()
+
+    return {
+        "image_object": duplicate,
+        "filename": file.filename,
+        "status": "duplicate",
+        "error": None
+    }
+
+
+def _upload_error(file: UploadFile, error, file_path: Path = None, thumbnail_path: Path = None) -> dict:
+    """Removes possibly created files and returns an error result for the upload."""
+    logger.warning(f"Error processing file {file.filename}: {error}")
+
+    for path in (file_path, thumbnail_path):
+        if path and path.exists():
+            path.unlink()
+
+    return {
+        "image_object": None,
+        "filename": file.filename,
+        "status": "error",
+        "error": str(error)
+    }
 
 
 
@@ -156,7 +578,7 @@ def extract_metadata(file_path: Path) -> dict:
 
 
 
-def save_thumbnail(file_path: Path, file: UploadFile) -> Path:
+def save_thumbnail(file_path: Path, file: UploadFile = None) -> Path:
     """Saves a thumbnail for the image file.
     Args:
         file_path (Path): The path to the original image file.
@@ -164,15 +586,14 @@ def save_thumbnail(file_path: Path, file: UploadFile) -> Path:
     Returns:
         Path: The path to the saved thumbnail image.
     """
-    thumb_dir = file_path.parent / "thumbnails"
-    thumb_dir.mkdir(parents=True, exist_ok=True)
-    thumb_path = thumb_dir / file_path.name
+    thumb_path = _thumbnail_path(file_path)
+    thumb_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with Image.open(file_path) as img:
-        img.thumbnail((300, 300))
-        img.save(thumb_path, "JPEG")
+    return create_thumbnail(file_path, thumb_path)
 
-    return thumb_path
+
+def _thumbnail_path(file_path: Path) -> Path:
+    return file_path.parent / "thumbnails" / file_path.name
 
 
 
@@ -203,23 +624,14 @@ def reread_image_metadata(images, db: Session, progress_updater=None):
     """
     total = len(images)
     updated = 0
-    for i, image in enumerate(images):
-        try:
-            metadata = metadata_extraction.extract_image_metadata(image.url)
-        except Exception as e:
-            logger.warning(f"Failed to re-read metadata for image {image.id}: {e}")
+    # one batched exiftool read and one vectorized UTM conversion for the whole report
+    extracted = metadata_extraction.extract_image_metadata_batch([image.url for image in images])
+    for i, (image, (metadata, error)) in enumerate(zip(images, extracted)):
+        if error:
+            logger.warning(f"Failed to re-read metadata for image {image.id}: {error}")
             continue
 
-        image.width = metadata["width"]
-        image.height = metadata["height"]
-        image.camera_model = metadata["camera_model"]
-        image.mappable = metadata["mappable"]
-        image.panoramic = metadata["panoramic"]
-        image.thermal = metadata["thermal"]
-        image.created_at = metadata["created_at"]
-        image.preprocessed = False
-        if metadata.get("coord"):
-            image.coord = metadata["coord"]
+        _apply_metadata(image, metadata)
 
         # Delete old MappingData and recreate from fresh extraction
         crud_image.delete_mapping_data(db, image.id)
@@ -236,3 +648,17 @@ def reread_image_metadata(images, db: Session, progress_updater=None):
 
     db.commit()
     logger.info(f"Re-read metadata for {updated}/{total} images")
+
+
+def _apply_metadata(image, metadata: dict):
+    """Copies the fields derived from EXIF metadata onto an existing Image row."""
+    image.width = metadata["width"]
+    image.height = metadata["height"]
+    image.camera_model = metadata["camera_model"]
+    image.mappable = metadata["mappable"]
+    image.panoramic = metadata["panoramic"]
+    image.thermal = metadata["thermal"]
+    image.created_at = metadata["created_at"]
+    image.preprocessed = False
+    if metadata.get("coord"):
+        image.coord = metadata["coord"]
@@ -0,0 +1,24 @@
+# entrypoint for the ingest worker, completes uploads that were stored in deferred mode
+from app.services.celery_app import celery_app
+from app.database import get_db
+from app.services.image_processing import ingest_pending_images
+import app.crud.images as crud_image
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="ingest.process_images")
+def process_images(image_ids: list[int]):
+    db = next(get_db())
+    try:
+        ready = ingest_pending_images(image_ids, db)
+        logger.info(f"Ingested {ready}/{len(image_ids)} deferred uploads")
+    except Exception as e:
+        logger.error(f"Ingest of images {image_ids} failed: {e}")
+        db.rollback()
+        # do not leave the images pending forever
+        crud_image.set_pending_ingest_status(db, image_ids, "error")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,148 @@
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from app.config import config
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+
+class IngestBusy(Exception):
+    """Raised when all ingest slots stay taken for longer than the admission timeout."""
+
+
+class IngestExecutor:
+    """Process-wide thread pool for the upload/ingest pipeline.
+
+    All upload requests share one pool of worker threads instead of starting
+    their own. Requests have to take one of a fixed number of slots first, which
+    bounds the number of uploads in flight (and the DB connections they need) no
+    matter how many operators upload at once. A request that does not get a slot
+    within the admission timeout is rejected with IngestBusy, which the routers
+    turn into a 429.
+
+    Queue depth, slot usage and the latency of every pipeline stage are
+    available through metrics().
+    """
+
+    def __init__(self, workers: int, slots: int, admission_timeout: float):
+        self.workers = max(1, workers)
+        self.slots = max(1, slots)
+        self.admission_timeout = admission_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._slot_semaphore = threading.BoundedSemaphore(self.slots)
+        self._active_requests = 0
+        self._waiting_requests = 0
+        self._rejected_requests = 0
+        self._queued = 0
+        self._running = 0
+        # stage -> [count, total seconds, max seconds]
+        self._stages: dict[str, list] = {}
+
+    @contextmanager
+    def admit(self):
+        """Hold one ingest slot for the duration of an upload request."""
+        with self._lock:
+            self._waiting_requests += 1
+        acquired = self._slot_semaphore.acquire(timeout=self.admission_timeout)
+        with self._lock:
+            self._waiting_requests -= 1
+            if not acquired:
+                self._rejected_requests += 1
+            else:
+                self._active_requests += 1
+        if not acquired:
+            raise IngestBusy(f"All {self.slots} ingest slots are busy, try again later")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active_requests -= 1
+            self._slot_semaphore.release()
+
+    def map(self, stage: str, fn, *iterables) -> list:
+        """Run fn over the iterables on the shared pool and return the results in input order."""
+        futures = [self.submit(stage, fn, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    def submit(self, stage: str, fn, *args) -> Future:
+        """Schedule fn(*args) on the shared pool, its run time is recorded under stage."""
+        def run():
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+                with self._lock:
+                    self._running -= 1
+
+        executor = self._get_executor()
+        with self._lock:
+            self._queued += 1
+        return executor.submit(run)
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Record the run time of a block that does not go through the pool (e.g. a bulk insert)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            stats = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "slots": self.slots,
+                "active_requests": self._active_requests,
+                "waiting_requests": self._waiting_requests,
+                "rejected_requests": self._rejected_requests,
+                "queue_depth": self._queued,
+                "running_tasks": self._running,
+                "stages": {
+                    stage: {
+                        "count": count,
+                        "avg_seconds": total / count if count else 0.0,
+                        "max_seconds": max_seconds,
+                    }
+                    for stage, (count, total, max_seconds) in self._stages.items()
+                },
+            }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._pid != os.getpid():
+                # first use, or inherited through a fork (celery prefork): threads do not survive a fork
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+                self._queued = 0
+                self._running = 0
+                self._pid = os.getpid()
+            return self._executor
+
+
+# one slot per pooled DB connection: an admitted upload request holds at most one session at a time
+# (the batch route releases its own session before it asks for a slot, chunked uploads use only the route session)
+ingest_executor = IngestExecutor(
+    workers=config.INGEST_WORKERS,
+    slots=engine.pool.size(),
+    admission_timeout=config.INGEST_ADMISSION_TIMEOUT,
+)
@@ -16,7 +16,7 @@ import time
 
 import cv2
 import numpy as np
-from billiard import Pool
+from rasterio.transform import from_origin
 from scipy.spatial import Voronoi
 
 
@@ -25,6 +25,18 @@ from app.schemas.image import ImageOut, MappingDataOut
 from app.schemas.map import MapCreate, MapElementCreate
 from app.schemas.report import ProcessingSettings
 from app.services.mapping.progress_updater import ProgressUpdater
+from app.services.mapping.map_canvas import (
+    TiledCanvas,
+    SharedCanvas,
+    SharedImage,
+    attach_shared_memory,
+    discard_shared_memory,
+    shared_image_name,
+    shared_image_prefix,
+)
+from app.services.mapping.map_tiles import write_cog, utm_crs
+from app.services.mapping.mapping_pool import mapping_pool, TaskTimeoutError
+from app.services.thermal import temperature_store
 from app.services.mapping.fast_mapping import (
     calculate_reference_yaw,
     save_map_image,
@@ -39,6 +51,11 @@ import app.crud.map as crud
 logger = logging.getLogger(__name__)
 UPLOAD_DIR = config.UPLOAD_DIR
 
+MIN_BAND_HEIGHT = 256  # pixels, thinner bands load the same images too often
+BAND_TIMEOUT = 30  # seconds per band, plus BAND_TIMEOUT_PER_ELEMENT per image in it
+BAND_TIMEOUT_PER_ELEMENT = 5
+PARALLEL_CANVAS_MEMORY_FRACTION = 0.25  # of the available memory, larger maps use the tiled compositor
+
 
 # ---------------------------------------------------------------------------
 # MapElement — stores an image's perspective-projected ground footprint
@@ -50,7 +67,7 @@ class MapElement:
     __slots__ = (
         "image_id", "image_path", "utm", "utm_corners", "creation_timestamp",
         "matrix_contains_temperature", "index", "px_corners", "px_center",
-        "image_matrix", "use_lower_half",
+        "shared_image", "use_lower_half",
         "image_width", "image_height",
         "voronoi_gps", "voronoi_image_px",
     )
@@ -70,7 +87,7 @@ class MapElement:
         self.index = None
         self.px_corners = None                  # 4 pixel (x, y) tuples
         self.px_center = None                   # pixel (x, y)
-        self.image_matrix = None                # loaded & warped image ROI
+        self.shared_image = None                # SharedImage of the warped ROI
         self.voronoi_gps = None                 # [[lat, lon], ...] polygon
         self.voronoi_image_px = None            # [[x, y], ...] in full image space
 
@@ -83,8 +100,8 @@ class MapElement:
         x1, y1, x2, y2 = self.get_bounds()
         return x2 - x1, y2 - y1
 
-    def clear_image_matrix(self):
-        self.image_matrix = None
+    def clear_shared_image(self):
+        self.shared_image = None
 
     def generate_database_map_element(self, utm_to_latlon, map_id):
         zone = self.utm["zone"]
@@ -331,29 +348,46 @@ def _calculate_px_coords(elements, target_resolution):
 # Image loading & perspective warp (runs in worker pool)
 # ---------------------------------------------------------------------------
 
-def _load_and_warp_image(element):
+def _load_and_warp_image(element, shm_name):
     """
     Load an image and warp it into its map-pixel footprint via
     cv2.getPerspectiveTransform + cv2.warpPerspective.
 
     This replaces the old resize → rotate → resize pipeline with a single
     perspective warp that correctly handles non-nadir viewing angles.
+    The warp is written straight into the shared memory block shm_name and
+    only its SharedImage handle is returned (None if the image failed).
     """
-    # --- Load ---
+    image = _load_source_image(element)
+    if image is None:
+        return None
+
+    x1, y1, x2, y2 = element.get_bounds()
+    if x2 - x1 <= 0 or y2 - y1 <= 0:
+        return None
+
+    with SharedImage.create(shm_name, (y2 - y1, x2 - x1, image.shape[2]), image.dtype) as (handle, warped):
+        _warp_to_region(element, image, (x1, y1, x2, y2), dst=warped)
+        del warped  # the block can only be closed without views
+    return handle
+
+
+def _load_source_image(element):
+    """Load an element's image (or temperature matrix) as 4-channel BGRA, cropped to the usable part."""
     image = None
-    if element.image_path.endswith(".npy"):
+    if temperature_store.is_temperature_matrix(element.image_path):
         try:
-            image = np.load(element.image_path)
+            image = temperature_store.load(element.image_path)
             if image.ndim == 2:
                 image = np.dstack((image,) * 3)
         except Exception as e:
-            logger.error(f"Failed to load npy {element.image_path}: {e}")
+            logger.error(f"Failed to load temperature matrix {element.image_path}: {e}")
 
     if image is None:
         image = cv2.imread(element.image_path, cv2.IMREAD_UNCHANGED)
         if image is None:
             logger.error(f"Failed to load image {element.image_path}")
-            return element
+            return None
 
     # Add alpha channel
     if image.ndim == 2:
@@ -361,52 +395,59 @@ def _load_and_warp_image(element):
     elif image.shape[2] == 3:
         image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
 
-    h, w = image.shape[:2]
-
     # Crop to lower half if the full footprint was too large
     if element.use_lower_half:
-        image = image[h // 2:, :]
-        h = image.shape[0]
+        image = image[image.shape[0] // 2:, :]
+    return image
 
-    # --- Perspective warp to ROI ---
-    x1, y1, x2, y2 = element.get_bounds()
-    roi_w, roi_h = x2 - x1, y2 - y1
-    if roi_w <= 0 or roi_h <= 0:
-        return element
+
+def _warp_to_region(element, image, region, dst=None):
+    """
+    Perspective-warp a loaded image onto the map pixels of region (x1, y1, x2, y2).
+
+    The region is usually the element's bounding box; a smaller region gives
+    the pixels of the full warp there (up to rounding) without computing the rest.
+    The warp is written into dst if given.
+    """
+    h, w = image.shape[:2]
+    rx1, ry1, rx2, ry2 = region
 
     src_pts = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
-    dst_pts = np.float32([(px - x1, py - y1) for px, py in element.px_corners])
+    dst_pts = np.float32([(px - rx1, py - ry1) for px, py in element.px_corners])
 
     H = cv2.getPerspectiveTransform(src_pts, dst_pts)
     interp = cv2.INTER_NEAREST if element.matrix_contains_temperature else cv2.INTER_LINEAR
 
-    element.image_matrix = cv2.warpPerspective(
-        image, H, (roi_w, roi_h),
+    return cv2.warpPerspective(
+        image, H, (rx2 - rx1, ry2 - ry1), dst,
         flags=interp,
         borderMode=cv2.BORDER_CONSTANT,
         borderValue=(0, 0, 0, 0),
     )
 
-    return element
 
-
-def _process_batch(pool, batch, timeout=5):
-    """Load and warp a batch of images in parallel."""
+def _process_batch(pool, batch, shm_prefix, timeout=5):
+    """
+    Load and warp a batch of images in parallel. The warped images come back
+    as SharedImages in el.shared_image, named by shared_image_name().
+    """
     async_results = [
-        pool.apply_async(_load_and_warp_image, (el,)) for el in batch
+        pool.apply_async(_load_and_warp_image, (el, shared_image_name(shm_prefix, el.index)))
+        for el in batch
     ]
     results = []
     timed_out_count = 0
     for i, ar in enumerate(async_results):
+        el = batch[i]
+        el.shared_image = None
         try:
-            results.append(ar.get(timeout=timeout))
-        except TimeoutError:
+            el.shared_image = ar.get(timeout=timeout)
+        except TaskTimeoutError:
             logger.warning(f"Timeout loading element {i} in batch")
             timed_out_count += 1
-            results.append(batch[i])  # element without image_matrix
         except Exception as e:
             logger.error(f"Error loading element {i} in batch: {e}")
-            results.append(batch[i])
+        results.append(el)  # without shared_image if it failed
 
     if timed_out_count:
         raise BatchTimeoutError(results, timed_out_count)
@@ -417,25 +458,67 @@ def _process_batch(pool, batch, timeout=5):
 # Map compositing
 # ---------------------------------------------------------------------------
 
-def _draw_map(elements, voronoi_mask, map_w, map_h, progress_updater):
-    """Composite perspective-warped images using Voronoi seam selection."""
+def _draw_map(elements, voronoi_polygons, map_w, map_h, progress_updater, work_dir):
+    """
+    Composite perspective-warped images using Voronoi seam selection.
+
+    config.MAPPING_COMPOSITOR picks the compositor: "parallel" (bands composited
+    by the pool into a shared-memory canvas), "tiled" (disk-backed canvas, for
+    maps that do not fit into memory) or "auto" (parallel if the canvas fits).
+    Returns the finished uint8 BGRA canvas; the caller closes it.
+    """
     thermal = elements[0].matrix_contains_temperature if elements else False
     dtype = np.float32 if thermal else np.uint8
-    map_img = np.zeros((map_h, map_w, 4), dtype=dtype)
+
+    mode = config.MAPPING_COMPOSITOR
+    if mode == "auto":
+        nbytes = map_h * map_w * 4 * np.dtype(dtype).itemsize
+        mode = "parallel" if SharedCanvas.fits(nbytes, PARALLEL_CANVAS_MEMORY_FRACTION) else "tiled"
+    logger.info(f"Compositing {map_w}x{map_h} map with the {mode} compositor")
+
+    canvas = None
+    if mode == "parallel":
+        try:
+            canvas = _draw_map_parallel(elements, voronoi_polygons, map_w, map_h,
+                                        progress_updater, thermal, dtype)
+        except Exception as e:
+            logger.warning(f"Parallel compositing failed, falling back to tiled: {e!r}")
+    if canvas is None:
+        canvas = _draw_map_tiled(elements, voronoi_polygons, map_w, map_h,
+                                 progress_updater, work_dir, thermal, dtype)
+
+    if not thermal:
+        return canvas
+    with canvas:
+        return _colorize_thermal_canvas(canvas, work_dir)
+
+
+def _draw_map_tiled(elements, voronoi_polygons, map_w, map_h, progress_updater, work_dir, thermal, dtype):
+    """
+    The canvas and the Voronoi label mask are disk-backed TiledCanvases in
+    work_dir. The pool warps the images and every warped image is blended tile
+    by tile, only into the tiles its footprint intersects, so the memory needed
+    does not grow with the map size.
+    """
+    # Rasterize polygons to label mask (sharp edges, no upscaling)
+    voronoi = TiledCanvas(work_dir, map_h, map_w, 1, np.int32, fill=-1)
+    _rasterize_voronoi_mask(voronoi_polygons, elements, map_w, map_h, out=voronoi.array)
+    canvas = TiledCanvas(work_dir, map_h, map_w, 4, dtype)
 
     batch_size = 32
     batches = [elements[i:i + batch_size]
                for i in range(0, len(elements), batch_size)]
 
     MAX_RETRIES = 3
-    pool = Pool(processes=8)
+    shm_prefix = shared_image_prefix()
+    pool = mapping_pool.get()
     try:
         for bi, batch in enumerate(batches):
             logger.info(f"Starting batch {bi + 1}/{len(batches)}")
 
             for attempt in range(MAX_RETRIES):
                 try:
-                    warped = _process_batch(pool, batch)
+                    warped = _process_batch(pool, batch, shm_prefix)
                     break
                 except BatchTimeoutError as e:
                     logger.warning(
@@ -443,17 +526,15 @@ def _draw_map(elements, voronoi_mask, map_w, map_h, progress_updater):
                         f"replacing pool and using partial results"
                     )
                     warped = e.results
-                    pool.terminate()
-                    pool.join()
-                    pool = Pool(processes=8)
+                    mapping_pool.recycle("batch timed out")
+                    pool = mapping_pool.get()
                     break  # use partial results, don't retry
                 except Exception as e:
                     logger.error(
                         f"Batch {bi + 1} attempt {attempt + 1} failed: {e}"
                     )
-                    pool.terminate()
-                    pool.join()
-                    pool = Pool(processes=8)
+                    mapping_pool.recycle("batch failed")
+                    pool = mapping_pool.get()
                 if attempt == MAX_RETRIES - 1:
                     raise TimeoutError(
                         f"Batch {bi + 1} failed after {MAX_RETRIES} retries"
@@ -465,84 +546,156 @@ def _draw_map(elements, voronoi_mask, map_w, map_h, progress_updater):
             )
 
             for el in warped:
-                if el.image_matrix is None:
+                if el.shared_image is None:
                     logger.warning(
                         f"Skipping element {el.image_id} — image failed to load"
                     )
                     continue
 
                 x1, y1, x2, y2 = el.get_bounds()
+                with el.shared_image.open() as warped_image:
+                    for tx1, ty1, tx2, ty2 in canvas.tiles(x1, y1, x2, y2):
+                        # Slice into warped image (offset from ROI origin)
+                        _blend_tile(
+                            canvas.array[ty1:ty2, tx1:tx2],
+                            warped_image[ty1 - y1:ty2 - y1, tx1 - x1:tx2 - x1],
+                            voronoi.array[ty1:ty2, tx1:tx2] == el.index, thermal,
+                        )
+                    del warped_image  # the block can only be closed without views
+                el.clear_shared_image()
 
-                # Clamp ROI to map bounds
-                mx1, my1 = max(x1, 0), max(y1, 0)
-                mx2, my2 = min(x2, map_w), min(y2, map_h)
-                if mx2 <= mx1 or my2 <= my1:
-                    el.clear_image_matrix()
-                    continue
-
-                # Slice into warped image (offset from ROI origin)
-                ix1, iy1 = mx1 - x1, my1 - y1
-                image = el.image_matrix[iy1:iy1 + (my2 - my1),
-                                        ix1:ix1 + (mx2 - mx1)]
-
-                voronoi_roi = voronoi_mask[my1:my2, mx1:mx2]
-
-                if thermal:
-                    existing = map_img[my1:my2, mx1:mx2]
-                    is_voronoi = voronoi_roi == el.index
-                    undrawn = existing[:, :, 3] == 0
-                    img_has_data = image[:, :, 3] > 0
-                    existing_much_hotter = (
-                        existing[:, :, 0] >= image[:, :, 0] + 20
-                    )
-                    image_much_hotter = (
-                        image[:, :, 0] >= existing[:, :, 0] + 20
-                    )
-
-                    use_image = np.zeros_like(is_voronoi)
-                    use_image |= is_voronoi & img_has_data
-                    use_image |= ~is_voronoi & img_has_data & image_much_hotter
-                    use_image &= ~existing_much_hotter
-                    use_image |= undrawn & img_has_data
+            progress_updater.update_progress_of_map(
+                "processing", 50 + (bi + 1) / len(batches) * 45
+            )
+    except BaseException:
+        mapping_pool.recycle("compositing failed")  # tasks of the failed batch may still be running
+        canvas.close()
+        raise
+    finally:
+        voronoi.close()
+        # blocks of timed out or failed workers
+        discard_shared_memory(shared_image_name(shm_prefix, el.index) for el in elements)
+    return canvas
 
-                    mask = use_image[:, :, np.newaxis]
-                    map_img[my1:my2, mx1:mx2] = np.where(
-                        mask, image, existing
-                    )
-                else:
-                    existing = map_img[my1:my2, mx1:mx2]
-                    is_voronoi = voronoi_roi == el.index
-                    undrawn = existing[:, :, 3] == 0
-                    img_has_data = image[:, :, 3] > 0
-                    use_image = (is_voronoi | undrawn) & img_has_data
-                    mask = use_image[:, :, np.newaxis]
-                    map_img[my1:my2, mx1:mx2] = np.where(
-                        mask, image, existing
-                    )
 
-                el.clear_image_matrix()
+def _draw_map_parallel(elements, voronoi_polygons, map_w, map_h, progress_updater, thermal, dtype):
+    """
+    Split the canvas into horizontal bands, one per pool process. Each process
+    loads and warps the part of every image that falls into its band and blends
+    it straight into a shared-memory canvas, so no warped image is sent back.
+    """
+    # the pool processes attach to the canvas through the resource tracker of this process
+    pool = mapping_pool.get()
+    canvas = SharedCanvas(map_h, map_w, 4, dtype)
+
+    band_count = max(1, min(mapping_pool.processes, math.ceil(map_h / MIN_BAND_HEIGHT)))
+    band_h = math.ceil(map_h / band_count)
+    polygon_ys = [
+        (min(y for _, y in poly), max(y for _, y in poly)) if poly is not None else None
+        for poly in voronoi_polygons
+    ]
+    jobs = []
+    for y0 in range(0, map_h, band_h):
+        y1 = min(y0 + band_h, map_h)
+        band_elements = [el for el in elements
+                         if el.get_bounds()[1] < y1 and el.get_bounds()[3] > y0]
+        # drawn in index order like _rasterize_voronoi_mask, later cells win shared edges
+        band_polygons = [(el.index, voronoi_polygons[i]) for i, el in enumerate(elements)
+                         if polygon_ys[i] is not None
+                         and polygon_ys[i][0] <= y1 and polygon_ys[i][1] >= y0]
+        jobs.append(((y0, y1), band_elements, band_polygons))
 
+    try:
+        async_results = [
+            pool.apply_async(_composite_band, (canvas.name, canvas.shape, canvas.dtype.str,
+                                               thermal, band, band_elements, band_polygons))
+            for band, band_elements, band_polygons in jobs
+        ]
+        for bi, (ar, (band, band_elements, _)) in enumerate(zip(async_results, jobs)):
+            drawn = ar.get(timeout=BAND_TIMEOUT + len(band_elements) * BAND_TIMEOUT_PER_ELEMENT)
+            logger.info(f"Composited band {bi + 1}/{len(jobs)} (rows {band[0]}-{band[1]}, {drawn} images)")
             progress_updater.update_progress_of_map(
-                "processing", 50 + (bi + 1) / len(batches) * 45
+                "processing", 50 + (bi + 1) / len(jobs) * 45
             )
+    except BaseException:
+        mapping_pool.recycle("band compositing failed")  # bands may still be running
+        canvas.close()
+        raise
+    return canvas
+
+
+def _composite_band(canvas_name, shape, dtype, thermal, band, elements, polygons):
+    """Composite all elements touching rows band[0]:band[1] into the shared canvas (runs in the pool)."""
+    y0, y1 = band
+    map_h, map_w = shape[:2]
+    labels = np.full((y1 - y0, map_w), -1, dtype=np.int32)
+    for index, poly in polygons:
+        pts = (np.array(poly, dtype=np.int32) - [0, y0]).astype(np.int32).reshape((-1, 1, 2))
+        cv2.fillPoly(labels, [pts], color=index)
+
+    shm = attach_shared_memory(canvas_name)
+    try:
+        canvas = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        drawn = 0
+        for el in elements:
+            x1, ey1, x2, ey2 = el.get_bounds()
+            rx1, ry1 = max(x1, 0), max(ey1, y0)
+            rx2, ry2 = min(x2, map_w), min(ey2, y1)
+            if rx2 <= rx1 or ry2 <= ry1:
+                continue
+            image = _load_source_image(el)
+            if image is None:
+                continue
+            warped = _warp_to_region(el, image, (rx1, ry1, rx2, ry2))
+            _blend_tile(canvas[ry1:ry2, rx1:rx2], warped,
+                        labels[ry1 - y0:ry2 - y0, rx1:rx2] == el.index, thermal)
+            drawn += 1
+        del canvas
     finally:
-        pool.terminate()
-        pool.join()
+        shm.close()
+    return drawn
 
-    # Convert thermal float map to coloured uint8
+
+def _blend_tile(existing, image, is_voronoi, thermal):
+    """Blend one tile of a warped image into the canvas, in place."""
+    img_has_data = image[:, :, 3] > 0
+    undrawn = existing[:, :, 3] == 0
     if thermal:
-        alpha = map_img[:, :, 3]
-        temp = map_img[:, :, 0]
-        t_max, t_min = np.max(temp), np.min(temp)
-        if t_min < 0:
+        existing_much_hotter = existing[:, :, 0] >= image[:, :, 0] + 20
+        image_much_hotter = image[:, :, 0] >= existing[:, :, 0] + 20
+
+        use_image = is_voronoi & img_has_data
+        use_image |= ~is_voronoi & img_has_data & image_much_hotter
+        use_image &= ~existing_much_hotter
+        use_image |= undrawn & img_has_data
+    else:
+        use_image = (is_voronoi | undrawn) & img_has_data
+    np.copyto(existing, image, where=use_image[:, :, np.newaxis])
+
+
+def _colorize_thermal_canvas(canvas, work_dir):
+    """Convert the float temperature canvas to grayscale BGRA, tile by tile."""
+    # the range covers the whole canvas, including undrawn (0 °C) pixels
+    t_min, t_max = np.inf, -np.inf
+    for x1, y1, x2, y2 in canvas.tiles():
+        temp = canvas.array[y1:y2, x1:x2, 0]
+        t_min, t_max = min(t_min, float(temp.min())), max(t_max, float(temp.max()))
+    compress_negative = t_min < 0
+    if compress_negative:
+        t_min /= 3
+    factor = 255.0 / (t_max - t_min) if t_max != t_min else 0
+
+    out = TiledCanvas(work_dir, canvas.height, canvas.width, 4, np.uint8)
+    for x1, y1, x2, y2 in canvas.tiles():
+        tile = canvas.array[y1:y2, x1:x2]
+        temp = tile[:, :, 0]
+        if compress_negative:
             temp = np.where(temp < 0, temp / 3, temp)
-            t_min = np.min(temp)
-        factor = 255.0 / (t_max - t_min) if t_max != t_min else 0
         temp_u8 = ((temp - t_min) * factor).astype(np.uint8)
-        map_img = cv2.cvtColor(temp_u8, cv2.COLOR_GRAY2BGRA)
-        map_img[:, :, 3] = (alpha * 255).astype(np.uint8)
-
-    return map_img
+        out_tile = out.array[y1:y2, x1:x2]
+        out_tile[:, :, :3] = temp_u8[:, :, np.newaxis]
+        out_tile[:, :, 3] = (tile[:, :, 3] * 255).astype(np.uint8)
+    return out
 
 
 # ---------------------------------------------------------------------------
@@ -637,14 +790,15 @@ def _compute_voronoi_polygons(elements, map_w, map_h):
     return result
 
 
-def _rasterize_voronoi_mask(voronoi_polygons, elements, map_w, map_h):
+def _rasterize_voronoi_mask(voronoi_polygons, elements, map_w, map_h, out=None):
     """
     Rasterize vector Voronoi cell polygons to a (map_h, map_w) int32 label map.
 
     Each pixel is assigned the index of its owning element, or -1 if uncovered.
     Uses cv2.fillPoly for pixel-exact polygon edges (no stepping artifacts).
+    The labels are drawn into out if given (e.g. a TiledCanvas array filled with -1).
     """
-    mask = np.full((map_h, map_w), -1, dtype=np.int32)
+    mask = np.full((map_h, map_w), -1, dtype=np.int32) if out is None else out
     for i, el in enumerate(elements):
         poly = voronoi_polygons[i]
         if poly is None:
@@ -791,25 +945,25 @@ def map_images_advanced(report_id, mapping_report_id, mapping_selection, setting
     params = [(d, reference_yaw) for d in dicts]
     MAX_RETRIES = 3
     for attempt in range(MAX_RETRIES):
-        with Pool(processes=8) as pool:
-            try:
-                elements = process_with_timeouts_starmap(
-                    pool, _compute_ground_footprint, params, timeout_per_item=2
-                )
-                break
-            except StarmapTimeoutError as e:
-                logger.warning(
-                    f"Attempt {attempt + 1}: {len(e.timed_out_indices)} footprint(s) "
-                    f"timed out, using partial results"
-                )
-                elements = e.results
-                break  # pool terminated by context manager, use partial results
-            except Exception as e:
-                logger.error(
-                    f"Ground footprint attempt {attempt + 1} failed: {e}"
-                )
-                pool.terminate()
-                pool.join()
+        pool = mapping_pool.get()
+        try:
+            elements = process_with_timeouts_starmap(
+                pool, _compute_ground_footprint, params, timeout_per_item=2
+            )
+            break
+        except StarmapTimeoutError as e:
+            logger.warning(
+                f"Attempt {attempt + 1}: {len(e.timed_out_indices)} footprint(s) "
+                f"timed out, using partial results"
+            )
+            elements = e.results
+            mapping_pool.recycle("footprints timed out")  # timed out items still occupy processes
+            break  # use partial results
+        except Exception as e:
+            logger.error(
+                f"Ground footprint attempt {attempt + 1} failed: {e}"
+            )
+            mapping_pool.recycle("footprints failed")
         if attempt == MAX_RETRIES - 1:
             raise TimeoutError("Failed to compute ground footprints")
 
@@ -831,8 +985,6 @@ def map_images_advanced(report_id, mapping_report_id, mapping_selection, setting
     # Compute vector Voronoi cell polygons (clipped to map bounds)
     voronoi_polygons = _compute_voronoi_polygons(elements, map_w, map_h)
 
-    # Rasterize polygons to label mask for compositing (sharp edges, no upscaling)
-    voronoi = _rasterize_voronoi_mask(voronoi_polygons, elements, map_w, map_h)
     progress_updater.update_progress_of_map("processing", 50.0)
 
     # Assign GPS and image-pixel polygon fields for DB storage
@@ -847,13 +999,23 @@ def map_images_advanced(report_id, mapping_report_id, mapping_selection, setting
         )
         el.voronoi_image_px = _voronoi_poly_to_image_px(poly, el)
 
-    # Composite
-    map_img = _draw_map(elements, voronoi, map_w, map_h, progress_updater)
-
-    # Save
+    # Composite & save
     file_path = (UPLOAD_DIR / str(report_id)
                  / f"final_map_{map_index}_{int(time.time())}.png")
-    save_map_image(map_img, file_path)
+    # scratch files of large maps are kept next to the map
+    work_dir = UPLOAD_DIR / str(report_id)
+    map_canvas = _draw_map(elements, voronoi_polygons, map_w, map_h,
+                           progress_updater, work_dir)
+    cog_path = file_path.with_name(f"{file_path.stem}_cog.tif")
+    with map_canvas:
+        save_map_image(map_canvas.array, file_path)
+        # pixel (0, 0) is the north-west corner of the UTM bounding box
+        transform = from_origin(min_e, min_n + map_h / scale, 1 / scale, 1 / scale)
+        try:
+            write_cog(map_canvas, cog_path, utm_crs(zone, hemi), transform)
+        except Exception as e:
+            logger.error(f"Failed to write cloud-optimized GeoTIFF {cog_path}: {e}")
+            cog_path = None
     logger.info(f"Advanced map for report {report_id} saved as {file_path}")
 
     # Database: Map
@@ -861,6 +1023,7 @@ def map_images_advanced(report_id, mapping_report_id, mapping_selection, setting
         mapping_report_id=mapping_report_id,
         name=f"advanced_{mapping_selection['type']}_{map_index}",
         url=str(file_path),
+        cog_url=str(cog_path) if cog_path else None,
         odm=False,
         bounds=bounds,
     )
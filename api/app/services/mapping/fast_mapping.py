@@ -10,12 +10,18 @@ from app.schemas.image import ImageOut, MappingDataOut
 from app.schemas.map import MapCreate, MapElementCreate
 from app.schemas.report import ProcessingSettings
 from app.services.mapping.progress_updater import ProgressUpdater
+from app.services.mapping.map_canvas import (
+    SharedImage,
+    discard_shared_memory,
+    shared_image_name,
+    shared_image_prefix,
+)
+from app.services.mapping.mapping_pool import mapping_pool, TaskTimeoutError
+from app.services.thermal import temperature_store
 import app.crud.map as crud
 import logging
 import time
 
-import billiard as multiprocessing
-from billiard import Pool
 
 UPLOAD_DIR = config.UPLOAD_DIR
 logger = logging.getLogger(__name__)
@@ -61,7 +67,7 @@ class Map_Element:
         self.px_center = None  # Placeholder for pixel center calculation
         self.scale = None  # Placeholder for scale calculation
         self.index = None  # Placeholder for index in the map
-        self.image_matrix = None  # Placeholder for image matrix calculation
+        self.shared_image = None  # SharedImage of the transformed image, set by process_batch_with_timeouts
         self.matrix_contains_temperature = matrix_contains_temperature  # Placeholder for temperature data presence
 
     def get_bounds(self):
@@ -86,12 +92,12 @@ class Map_Element:
         x_coords, y_coords = zip(*self.px_corners)
         return int(max(x_coords) - min(x_coords)), int(max(y_coords) - min(y_coords))
 
-    def clear_image_matrix(self):
+    def clear_shared_image(self):
         """
-        Clears the image matrix to free memory.
+        Drops the handle of the transformed image once its block is unlinked.
         """
-        self.image_matrix = None
-        logger.debug(f"Cleared image matrix for element with UTM: {self.utm}")
+        self.shared_image = None
+        logger.debug(f"Cleared shared image for element with UTM: {self.utm}")
 
     def generate_database_map_element(self, utm_conversion_callable, map_id) -> MapElementCreate:
         """
@@ -150,21 +156,21 @@ def map_images(report_id: int, mapping_report_id: int, mapping_selection: dict,
     
     for attempt in range(MAX_RETRIES):
         logger.info(f"Attempt {attempt + 1} to calculate UTM corners")
-        with Pool(processes=8) as pool:
-            try:
-                map_elements = process_with_timeouts_starmap(pool, calculate_utm_corners, params, TIMEOUT_PER_ITEM)
-                break  # success
-            except StarmapTimeoutError as e:
-                logger.warning(
-                    f"Attempt {attempt + 1}: {len(e.timed_out_indices)} item(s) timed out, "
-                    f"using partial results"
-                )
-                map_elements = e.results
-                break  # pool terminated by context manager, use partial results
-            except Exception as e:
-                logger.error(f"Failure in starmap attempt {attempt + 1}: {e}")
-                pool.terminate()
-                pool.join()
+        pool = mapping_pool.get()
+        try:
+            map_elements = process_with_timeouts_starmap(pool, calculate_utm_corners, params, TIMEOUT_PER_ITEM)
+            break  # success
+        except StarmapTimeoutError as e:
+            logger.warning(
+                f"Attempt {attempt + 1}: {len(e.timed_out_indices)} item(s) timed out, "
+                f"using partial results"
+            )
+            map_elements = e.results
+            mapping_pool.recycle("UTM corners timed out")  # timed out items still occupy processes
+            break  # use partial results
+        except Exception as e:
+            logger.error(f"Failure in starmap attempt {attempt + 1}: {e}")
+            mapping_pool.recycle("UTM corners failed")
 
         if attempt == MAX_RETRIES - 1:
             logger.error("Failed to generate map elements after all retries")
@@ -239,7 +245,7 @@ def process_with_timeouts_starmap(pool, func, params, timeout_per_item=5):
         try:
             result = res.get(timeout=timeout_per_item)
             results.append(result)
-        except TimeoutError:
+        except TaskTimeoutError:
             logger.warning(f"Timeout processing item {i}")
             timed_out_indices.append(i)
             results.append(None)
@@ -511,13 +517,14 @@ def draw_map(map_elements, voronoi_mask, map_width, map_height, progress_updater
     logger.info(f"Processing {len(map_elements)} map elements in {len(map_elements_batches)} batches")
 
     MAX_RETRIES = 3
-    pool = Pool(processes=8)
+    shm_prefix = shared_image_prefix()
+    pool = mapping_pool.get()
     try:
         for i, batch in enumerate(map_elements_batches):
             logger.info(f"Starting batch {i + 1}/{len(map_elements_batches)}")
             for attempt in range(MAX_RETRIES):
                 try:
-                    map_elements_with_images = process_batch_with_timeouts(pool, batch)
+                    map_elements_with_images = process_batch_with_timeouts(pool, batch, shm_prefix)
                     break  # success
                 except BatchTimeoutError as e:
                     logger.warning(
@@ -525,15 +532,13 @@ def draw_map(map_elements, voronoi_mask, map_width, map_height, progress_updater
                         f"replacing pool and using partial results"
                     )
                     map_elements_with_images = e.results
-                    pool.terminate()
-                    pool.join()
-                    pool = Pool(processes=8)
+                    mapping_pool.recycle("batch timed out")
+                    pool = mapping_pool.get()
                     break  # use partial results, don't retry
                 except Exception as e:
                     logger.error(f"Unexpected failure in batch {i + 1} attempt {attempt + 1}: {e}")
-                    pool.terminate()
-                    pool.join()
-                    pool = Pool(processes=8)  # replace dead pool
+                    mapping_pool.recycle("batch failed")
+                    pool = mapping_pool.get()  # replace dead pool
                 if attempt == MAX_RETRIES - 1:
                     logger.error(f"Batch {i + 1} failed after {MAX_RETRIES} attempts")
                     raise TimeoutError("Giving up on this batch")
@@ -541,51 +546,56 @@ def draw_map(map_elements, voronoi_mask, map_width, map_height, progress_updater
             progress_updater.update_progress_of_map("processing", 50 + ((i+1) / len(map_elements_batches)*40))
 
             for element in map_elements_with_images:
-                if element.image_matrix is None:
+                if element.shared_image is None:
                     logger.warning(f"Skipping element {element.image_id} — image failed to load")
                     continue
                 x1, y1, x2, y2 = element.get_bounds()
-                index = element.index
-                #crop element image matrix to the bounds
-                image = element.image_matrix[:y2 - y1, :x2 - x1]
-                voronoi_roi = voronoi_mask[y1:y2, x1:x2]
-                #repeat voronoi index, as often, as the dimensions of the image (for example a pixel with one, three or 4 values)
-                voronoi_roi = np.repeat(voronoi_roi[:, :, np.newaxis], image.shape[2], axis=2)
-
-                #inside of roi, check voronoi mask index, if index matches, copy pixel data
-                if element.matrix_contains_temperature:
-                    existing = map_img[y1:y2, x1:x2]
-                    temp_ch = 0  # temperature is in channel 0
-                    # pixel-level masks (H, W) — applied uniformly to all channels
-                    is_voronoi = voronoi_mask[y1:y2, x1:x2] == index
-                    undrawn = existing[:, :, 3] == 0  # alpha 0 = never drawn
-                    img_has_data = image[:, :, 3] > 0  # image has actual content (not rotation padding)
-                    existing_much_hotter = existing[:, :, temp_ch] >= image[:, :, temp_ch] + 20
-                    image_much_hotter = image[:, :, temp_ch] >= existing[:, :, temp_ch] + 20
-
-                    # default: keep existing
-                    use_image = np.zeros_like(is_voronoi)
-                    # voronoi zone: use image
-                    use_image |= is_voronoi & img_has_data
-                    # hotspot outside voronoi: image bleeds through
-                    use_image |= ~is_voronoi & img_has_data & image_much_hotter
-                    # never overwrite with colder overlap when existing is much hotter
-                    use_image &= ~existing_much_hotter
-                    # always fill undrawn pixels with image data
-                    use_image |= undrawn & img_has_data
-
-                    # expand (H, W) mask to (H, W, 4) and apply
-                    mask = use_image[:, :, np.newaxis]
-                    merged_roi = np.where(mask, image, existing)
-
-                else:
-                    merged_roi = np.where(voronoi_roi == index, image, map_img[y1:y2, x1:x2])
-                map_img[y1:y2, x1:x2] = merged_roi
-                element.clear_image_matrix()  # Clear the image matrix to free memory
+                with element.shared_image.open() as image_matrix:
+                    index = element.index
+                    #crop element image matrix to the bounds
+                    image = image_matrix[:y2 - y1, :x2 - x1]
+                    voronoi_roi = voronoi_mask[y1:y2, x1:x2]
+                    #repeat voronoi index, as often, as the dimensions of the image (for example a pixel with one, three or 4 values)
+                    voronoi_roi = np.repeat(voronoi_roi[:, :, np.newaxis], image.shape[2], axis=2)
+
+                    #inside of roi, check voronoi mask index, if index matches, copy pixel data
+                    if element.matrix_contains_temperature:
+                        existing = map_img[y1:y2, x1:x2]
+                        temp_ch = 0  # temperature is in channel 0
+                        # pixel-level masks (H, W) — applied uniformly to all channels
+                        is_voronoi = voronoi_mask[y1:y2, x1:x2] == index
+                        undrawn = existing[:, :, 3] == 0  # alpha 0 = never drawn
+                        img_has_data = image[:, :, 3] > 0  # image has actual content (not rotation padding)
+                        existing_much_hotter = existing[:, :, temp_ch] >= image[:, :, temp_ch] + 20
+                        image_much_hotter = image[:, :, temp_ch] >= existing[:, :, temp_ch] + 20
+
+                        # default: keep existing
+                        use_image = np.zeros_like(is_voronoi)
+                        # voronoi zone: use image
+                        use_image |= is_voronoi & img_has_data
+                        # hotspot outside voronoi: image bleeds through
+                        use_image |= ~is_voronoi & img_has_data & image_much_hotter
+                        # never overwrite with colder overlap when existing is much hotter
+                        use_image &= ~existing_much_hotter
+                        # always fill undrawn pixels with image data
+                        use_image |= undrawn & img_has_data
+
+                        # expand (H, W) mask to (H, W, 4) and apply
+                        mask = use_image[:, :, np.newaxis]
+                        merged_roi = np.where(mask, image, existing)
+
+                    else:
+                        merged_roi = np.where(voronoi_roi == index, image, map_img[y1:y2, x1:x2])
+                    map_img[y1:y2, x1:x2] = merged_roi
+                    del image_matrix, image  # the block can only be closed without views
+                element.clear_shared_image()
             progress_updater.update_progress_of_map("processing", 50 + ((i+1) / len(map_elements_batches)*45))
+    except BaseException:
+        mapping_pool.recycle("drawing the map failed")  # tasks of the failed batch may still be running
+        raise
     finally:
-        pool.terminate()
-        pool.join()
+        # blocks of timed out or failed workers
+        discard_shared_memory(shared_image_name(shm_prefix, element.index) for element in map_elements)
 
     if thermal_map:
         #convert the temperature map into a colored map
@@ -608,38 +618,42 @@ def draw_map(map_elements, voronoi_mask, map_width, map_height, progress_updater
 
     return map_img
 
-def process_batch_with_timeouts(pool, batch, timeout_per_item=5):
+def process_batch_with_timeouts(pool, batch, shm_prefix, timeout_per_item=5):
+    """
+    Loads and transforms a batch in the pool. Workers leave the images in shared
+    memory, the elements come back with a SharedImage handle in shared_image.
+    """
     results = []
     async_results = []
     timed_out_count = 0
 
     for element in batch:
-        res = pool.apply_async(load_and_transform_images, args=(element,))
+        res = pool.apply_async(load_and_transform_images, args=(element, shared_image_name(shm_prefix, element.index)))
         async_results.append(res)
 
     for i, res in enumerate(async_results):
+        element = batch[i]
+        element.shared_image = None
         try:
-            result = res.get(timeout=timeout_per_item)
-            results.append(result)
-        except TimeoutError:
+            element.shared_image = res.get(timeout=timeout_per_item)
+        except TaskTimeoutError:
             logger.warning(f"Timeout processing element {i} in batch")
             timed_out_count += 1
-            results.append(batch[i])  # element without image_matrix
         except Exception as e:
             logger.error(f"Error processing element {i} in batch: {e}")
-            results.append(batch[i])
+        results.append(element)  # without shared_image if it failed
 
     if timed_out_count:
         raise BatchTimeoutError(results, timed_out_count)
     return results
 
-def load_and_transform_images(element: Map_Element) -> Map_Element:
+def load_and_transform_images(element: Map_Element, shm_name: str) -> SharedImage | None:
     image = None
 
-    if element.image_path[-4:] == ".npy":
-        # Load the image matrix from a numpy file
+    if temperature_store.is_temperature_matrix(element.image_path):
+        # Load the temperature matrix (.tmx or legacy .npy)
         try:
-            image = np.load(element.image_path)
+            image = temperature_store.load(element.image_path)
             if image.ndim == 2:  # If it's a single channel image, convert to 3 channels
                 image = np.dstack((image,)*3)
         except Exception as e:
@@ -649,7 +663,7 @@ def load_and_transform_images(element: Map_Element) -> Map_Element:
         image = cv2.imread(element.image_path, cv2.IMREAD_UNCHANGED)
         if image is None:
             logger.error(f"Failed to load image at {element.image_path}")
-            return element
+            return None
 
     # Scale down first so rotation operates on a smaller image (performance)
     target_size = (int(image.shape[1] * element.scale), int(image.shape[0] * element.scale))
@@ -664,10 +678,12 @@ def load_and_transform_images(element: Map_Element) -> Map_Element:
     # Rotate the scaled-down image (much cheaper than rotating the original)
     image = imutils.rotate_bound(image, -1*math.degrees(element.rotation))
 
-    # Final resize to exact pixel dimensions from corner calculations
+    # Final resize to exact pixel dimensions from corner calculations, straight into shared memory
     width, height = element.get_dims()
-    element.image_matrix = cv2.resize(image, (width, height), interpolation=cv2.INTER_LINEAR)
-    return element
+    with SharedImage.create(shm_name, (height, width, image.shape[2]), image.dtype) as (handle, image_matrix):
+        cv2.resize(image, (width, height), dst=image_matrix, interpolation=cv2.INTER_LINEAR)
+        del image_matrix  # the block can only be closed without views
+    return handle
 
 def draw_test_map(map_elements, map_width, map_height):
     # Generate a transparent array and fill it with another color for each map element, in the area between the px corners
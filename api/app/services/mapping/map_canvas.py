@@ -0,0 +1,212 @@
+"""
+map_canvas.py — Rasters for map compositing.
+
+A whole orthomosaic canvas does not have to fit into memory: the pixels of a
+TiledCanvas live in a memory-mapped scratch file and are processed in
+TILE_SIZE × TILE_SIZE tiles, so the memory a compositing step needs depends
+on the tile size and not on the map size. Pages that are not in use can be
+written back and dropped by the OS.
+
+A SharedCanvas has the same interface but lives in shared memory, so pool
+workers can composite into it directly when the map fits into memory.
+
+A SharedImage is how pool workers hand a warped image back: the worker warps
+into a named shared memory block and returns only the small handle, the
+parent maps the block, blends it and unlinks it. Nothing is pickled through
+the result pipe but the handle.
+"""
+
+import os
+import uuid
+import shutil
+import tempfile
+import logging
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import psutil
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 1024  # pixels, a float32 RGBA tile is 16 MiB
+SHM_DIR = "/dev/shm"
+
+
+class TiledCanvas:
+    """A (height, width[, channels]) raster in a memory-mapped scratch file.
+
+    Use as a context manager (or call close()) to remove the scratch file.
+    """
+
+    def __init__(self, directory, height, width, channels=1, dtype=np.uint8, fill=0, tile_size=TILE_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix=".canvas_", suffix=".raw")
+        os.close(fd)
+        self.height = height
+        self.width = width
+        self.tile_size = tile_size
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        # a new memmap is a sparse, zero filled file
+        self.array = np.memmap(self.path, dtype=dtype, mode="w+", shape=shape)
+        if fill:
+            for x1, y1, x2, y2 in self.tiles():
+                self.array[y1:y2, x1:x2] = fill
+
+    def tiles(self, x1=0, y1=0, x2=None, y2=None):
+        """
+        Yield the parts of the tile grid that intersect a region, clipped to it
+        and to the canvas, as (x1, y1, x2, y2).
+        """
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2 = self.width if x2 is None else min(x2, self.width)
+        y2 = self.height if y2 is None else min(y2, self.height)
+        size = self.tile_size
+        for ty in range(y1 - y1 % size, y2, size):
+            for tx in range(x1 - x1 % size, x2, size):
+                cx1, cy1 = max(tx, x1), max(ty, y1)
+                cx2, cy2 = min(tx + size, x2), min(ty + size, y2)
+                if cx2 > cx1 and cy2 > cy1:
+                    yield cx1, cy1, cx2, cy2
+
+    def close(self):
+        # the mapping stays valid for views that are still referenced, the file is freed with them
+        self.array = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SharedCanvas(TiledCanvas):
+    """A (height, width[, channels]) raster in a multiprocessing.shared_memory block.
+
+    Workers attach to it by name with attach_shared_memory(). Only the creating
+    process unlinks the block, in close().
+    """
+
+    def __init__(self, height, width, channels=1, dtype=np.uint8, tile_size=TILE_SIZE):
+        self.height = height
+        self.width = width
+        self.tile_size = tile_size
+        self.shape = (height, width, channels) if channels > 1 else (height, width)
+        self.dtype = np.dtype(dtype)
+        # new shared memory is zero filled
+        self._shm = SharedMemory(create=True, size=max(1, int(np.prod(self.shape)) * self.dtype.itemsize))
+        self.name = self._shm.name
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+
+    def close(self):
+        if self._shm is None:
+            return
+        self.array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # a view is still referenced, the memory is freed with it
+        self._shm.unlink()
+        self._shm = None
+
+    @staticmethod
+    def fits(nbytes, memory_fraction):
+        """Whether a block of nbytes fits into /dev/shm and memory_fraction of the available memory."""
+        try:
+            shm_free = shutil.disk_usage(SHM_DIR).free
+        except OSError:
+            return False
+        return nbytes <= shm_free and nbytes <= psutil.virtual_memory().available * memory_fraction
+
+
+class SharedImage:
+    """Handle of an image in a named shared memory block: name, shape and dtype."""
+
+    __slots__ = ("name", "shape", "dtype")
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    @classmethod
+    @contextmanager
+    def create(cls, name, shape, dtype):
+        """
+        Create the block `name` for an image of shape and dtype (in a pool worker).
+
+        Yields (handle, array); write the image into the array and drop it
+        before the block is closed. The block is left for the parent to open()
+        and unlink; one left over from an earlier, killed attempt is replaced.
+        """
+        handle = cls(name, shape, dtype)
+        size = max(1, int(np.prod(handle.shape)) * handle.dtype.itemsize)
+        try:
+            shm = SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            discard_shared_memory([name])
+            shm = SharedMemory(name=name, create=True, size=size)
+        try:
+            array = np.ndarray(handle.shape, dtype=handle.dtype, buffer=shm.buf)
+            yield handle, array
+            del array
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+
+    @contextmanager
+    def open(self):
+        """Yield the image as an array and unlink the block afterwards; drop all views of it before."""
+        shm = attach_shared_memory(self.name)
+        try:
+            yield np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        finally:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # a view is still referenced, the memory is freed with it
+            shm.unlink()
+
+
+def shared_image_prefix():
+    """A name prefix for the SharedImages of one compositing run, see discard_shared_memory()."""
+    return f"argus_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+
+
+def shared_image_name(prefix, key):
+    """Deterministic block name, so the parent can discard what a killed worker left behind."""
+    return f"{prefix}_{key}"
+
+
+def discard_shared_memory(names):
+    """Unlink the named shared memory blocks that still exist, e.g. of killed workers."""
+    for name in names:
+        try:
+            shm = SharedMemory(name=name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        shm.unlink()
+
+
+def attach_shared_memory(name):
+    """
+    Attach to a SharedCanvas from another process.
+
+    The resource tracker has to be running in the creating process before the
+    workers are forked, then they share it and attaching does not hand the
+    block to a tracker that would remove it when the worker exits.
+    """
+    return SharedMemory(name=name)
+
+
+def ensure_resource_tracker():
+    """Start the resource tracker now, so pool processes forked afterwards share it."""
+    resource_tracker.ensure_running()
@@ -0,0 +1,151 @@
+"""
+map_tiles.py — Cloud-optimized GeoTIFF output and XYZ tiles for maps.
+
+A map is written once as a COG (512 px tiles, DEFLATE, overviews) in its UTM
+grid. XYZ (web mercator) tiles are cut from it on request: only the source
+window under a tile is read, at the overview level closest to the tile
+resolution, and reprojected into the 256 px tile. Clients only fetch what
+they display instead of the full PNG.
+"""
+
+import io
+import math
+import os
+import logging
+from pathlib import Path
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from PIL import Image
+from rasterio.enums import ColorInterp, Resampling
+from rasterio.errors import WindowError
+from rasterio.transform import Affine, from_origin
+from rasterio.warp import reproject, transform_bounds
+from rasterio.windows import Window, from_bounds
+
+logger = logging.getLogger(__name__)
+
+COG_BLOCK_SIZE = 512
+XYZ_TILE_SIZE = 256
+MAX_ZOOM = 24
+WEB_MERCATOR = "EPSG:3857"
+WEB_MERCATOR_ORIGIN = 20037508.342789244  # meters, half the extent of the web mercator square
+
+
+def utm_crs(zone: int, hemisphere: str) -> str:
+    return f"EPSG:326{zone:02d}" if hemisphere == "N" else f"EPSG:327{zone:02d}"
+
+
+def write_cog(canvas, path, crs: str, transform: Affine) -> Path:
+    """
+    Writes a BGRA uint8 TiledCanvas as an RGBA Cloud-Optimized GeoTIFF.
+
+    The canvas is copied tile by tile into a tiled GeoTIFF, which GDAL's COG
+    driver then rewrites with overviews, so the map never has to be in memory.
+
+    Args:
+        canvas (TiledCanvas): (height, width, 4) uint8 BGRA canvas.
+        path: Target .tif path.
+        crs (str): CRS of the canvas, e.g. utm_crs(32, "N").
+        transform (Affine): Pixel to CRS transform of the canvas.
+    Returns:
+        Path: The written path.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.stem}.tmp.tif")
+    profile = {
+        "driver": "GTiff",
+        "width": canvas.width,
+        "height": canvas.height,
+        "count": 4,
+        "dtype": "uint8",
+        "crs": crs,
+        "transform": transform,
+        "tiled": True,
+        "blockxsize": COG_BLOCK_SIZE,
+        "blockysize": COG_BLOCK_SIZE,
+        "compress": "DEFLATE",
+        "photometric": "RGB",
+        "BIGTIFF": "IF_SAFER",
+        "NUM_THREADS": "ALL_CPUS",
+    }
+    try:
+        with rasterio.open(tmp_path, "w", **profile) as dst:
+            dst.colorinterp = [ColorInterp.red, ColorInterp.green, ColorInterp.blue, ColorInterp.alpha]
+            for x1, y1, x2, y2 in canvas.tiles():
+                bgra = canvas.array[y1:y2, x1:x2]
+                dst.write(np.moveaxis(bgra[:, :, [2, 1, 0, 3]], -1, 0), window=Window(x1, y1, x2 - x1, y2 - y1))
+        rasterio.shutil.copy(
+            tmp_path, path, driver="COG",
+            compress="DEFLATE", blocksize=COG_BLOCK_SIZE,
+            overview_resampling="average", BIGTIFF="IF_SAFER", NUM_THREADS="ALL_CPUS",
+        )
+    finally:
+        if tmp_path.exists():
+            os.remove(tmp_path)
+    return path
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """Web mercator bounds (left, bottom, right, top) of XYZ tile z/x/y."""
+    size = 2 * WEB_MERCATOR_ORIGIN / 2 ** z
+    left = -WEB_MERCATOR_ORIGIN + x * size
+    top = WEB_MERCATOR_ORIGIN - y * size
+    return left, top - size, left + size, top
+
+
+def render_xyz_tile(path, z: int, x: int, y: int, tile_size: int = XYZ_TILE_SIZE) -> np.ndarray | None:
+    """
+    Cuts XYZ tile z/x/y out of a COG.
+
+    Args:
+        path: Path to the COG.
+        z, x, y (int): Tile address, y counted from the north.
+        tile_size (int): Edge length of the tile in pixels.
+    Returns:
+        np.ndarray | None: (tile_size, tile_size, 4) RGBA uint8, None if the map does not cover the tile.
+    """
+    left, bottom, right, top = tile_bounds(z, x, y)
+    resolution = (right - left) / tile_size
+    dst_transform = from_origin(left, top, resolution, resolution)
+
+    with rasterio.open(path) as src:
+        src_bounds = transform_bounds(WEB_MERCATOR, src.crs, left, bottom, right, top, densify_pts=21)
+        window = from_bounds(*src_bounds, transform=src.transform)
+        try:
+            window = window.intersection(Window(0, 0, src.width, src.height))
+        except WindowError:
+            return None
+        window = window.round_offsets().round_lengths()
+        if window.width < 1 or window.height < 1:
+            return None
+
+        # read about as many pixels as the tile shows, GDAL serves them from the matching overview
+        src_pixels_per_tile_pixel = (src_bounds[2] - src_bounds[0]) / src.res[0] / tile_size
+        factor = max(src_pixels_per_tile_pixel, 1.0)
+        out_w = max(1, math.ceil(window.width / factor))
+        out_h = max(1, math.ceil(window.height / factor))
+        data = src.read(window=window, out_shape=(src.count, out_h, out_w), resampling=Resampling.bilinear)
+        src_transform = src.window_transform(window) * Affine.scale(window.width / out_w, window.height / out_h)
+        src_crs = src.crs
+
+    tile = np.zeros((data.shape[0], tile_size, tile_size), dtype=data.dtype)
+    reproject(
+        data, tile,
+        src_transform=src_transform, src_crs=src_crs,
+        dst_transform=dst_transform, dst_crs=WEB_MERCATOR,
+        resampling=Resampling.bilinear,
+    )
+    if not tile[3].any():
+        return None
+    return np.moveaxis(tile, 0, -1)
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(rgba), "RGBA").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+EMPTY_TILE = encode_png(np.zeros((XYZ_TILE_SIZE, XYZ_TILE_SIZE, 4), dtype=np.uint8))
@@ -0,0 +1,137 @@
+"""
+mapping_pool.py — The long-lived process pool of a mapping worker.
+
+Footprints, image warping, band compositing and ODM proxy scaling all run in
+one billiard pool per Celery worker process. It is started on first use and
+reused across batches, mapping steps and reports, so the processes (and their
+cv2/numpy imports) are paid for once instead of once per step.
+
+Every Celery child process of the worker gets its own pool, so the CPUs and
+the memory are divided by the worker concurrency (the mapping worker runs
+with --concurrency=1, parallelism comes from the pool).
+
+A pool is checked with a ping before it is handed out and replaced if it
+does not answer. Callers recycle() it when a task timed out or failed, since
+the task may still occupy a process. Processes are replaced after
+MAPPING_POOL_MAX_TASKS_PER_CHILD tasks, so leaked memory does not pile up.
+"""
+
+import os
+import threading
+import logging
+
+import psutil
+from billiard import Pool
+from billiard.exceptions import TimeoutError as TaskTimeoutError
+from celery.signals import worker_init, worker_process_shutdown
+
+from app.config import config
+from app.services.mapping.map_canvas import ensure_resource_tracker
+
+logger = logging.getLogger(__name__)
+
+WORKER_MEMORY = 1024 ** 3  # bytes per process: a decoded 20 MP image, its BGRA copy and the warp
+PING_TIMEOUT = 10  # seconds an idle pool gets to answer the health check
+
+_worker_concurrency = 1  # Celery child processes that each start a pool, set when the worker starts
+
+
+def mapping_pool_size() -> int:
+    """Number of mapping processes the CPUs and the available memory allow for one Celery child."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    cpus = max(1, cpus // _worker_concurrency)
+    if cpus > 2:
+        cpus -= 1  # leave a core for the celery process that composites the results
+    by_memory = int(psutil.virtual_memory().available // WORKER_MEMORY // _worker_concurrency)
+    return max(1, min(cpus, by_memory))
+
+
+def _ping():
+    return os.getpid()
+
+
+class MappingPool:
+    """Process pool shared by all mapping steps of a (Celery worker) process.
+
+    get() hands out the running pool or starts a new one; recycle() terminates
+    it after a failure. A pool inherited through fork is not used by the child.
+    """
+
+    def __init__(self, processes: int = 0, max_tasks_per_child: int | None = None):
+        self._configured_processes = processes
+        self.max_tasks_per_child = max_tasks_per_child if max_tasks_per_child and max_tasks_per_child > 0 else None
+        self.processes = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pool = None
+
+    def get(self) -> Pool:
+        """Return the healthy pool of this process, starting one if needed."""
+        with self._lock:
+            if self._pool is not None and self._pid != os.getpid():
+                # inherited from a parent process, its workers are not ours
+                self._pool = None
+            if self._pool is not None and not self._is_healthy():
+                logger.warning("Mapping pool did not answer the health check, replacing it")
+                self._terminate()
+            if self._pool is None:
+                self._start()
+            return self._pool
+
+    def recycle(self, reason: str = ""):
+        """Terminate the pool, e.g. because a timed out task still occupies a process; get() starts a new one."""
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = None
+                return
+            logger.info(f"Recycling mapping pool{': ' + reason if reason else ''}")
+            self._terminate()
+
+    def close(self):
+        """Stop the pool (on worker shutdown)."""
+        self.recycle()
+
+    def _start(self):
+        self.processes = self._configured_processes or mapping_pool_size()
+        # shared memory blocks of the workers are tracked by the tracker of this process
+        ensure_resource_tracker()
+        self._pool = Pool(processes=self.processes, maxtasksperchild=self.max_tasks_per_child)
+        self._pid = os.getpid()
+        logger.info(f"Started mapping pool with {self.processes} processes")
+
+    def _is_healthy(self) -> bool:
+        try:
+            self._pool.apply_async(_ping).get(timeout=PING_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.warning(f"Mapping pool health check failed: {e!r}")
+            return False
+
+    def _terminate(self):
+        pool, self._pool = self._pool, None
+        try:
+            pool.terminate()
+            pool.join()
+        except Exception as e:
+            logger.error(f"Failed to terminate mapping pool: {e}")
+
+
+mapping_pool = MappingPool(
+    processes=config.MAPPING_POOL_SIZE,
+    max_tasks_per_child=config.MAPPING_POOL_MAX_TASKS_PER_CHILD,
+)
+
+
+@worker_init.connect
+def _remember_worker_concurrency(sender=None, **kwargs):
+    # runs in the main worker process before the children are forked, they inherit the value
+    global _worker_concurrency
+    _worker_concurrency = max(1, getattr(sender, "concurrency", None) or 1)
+
+
+@worker_process_shutdown.connect
+def _close_mapping_pool(**kwargs):
+    mapping_pool.close()
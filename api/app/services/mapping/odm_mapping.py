@@ -11,10 +11,7 @@ from app.crud import report as crud_report
 from app.crud import map as map_crud
 import logging
 
-import billiard as multiprocessing
-from billiard import Pool
 from rasterio.transform import from_bounds
-import psutil
 
 
 import pyproj
@@ -27,6 +24,7 @@ import subprocess
 
 from app.config import config
 from app.services.mapping.fast_mapping import process_with_timeouts_starmap, StarmapTimeoutError
+from app.services.mapping.mapping_pool import mapping_pool
 UPLOAD_DIR = config.UPLOAD_DIR
 
 
@@ -228,9 +226,6 @@ def scale_images(images, report_id, proxy_size):
         os.mkdir(proxy_path)
 
     scaled_image_paths = []
-    nmbr_of_processes = calculate_number_of_safely_usable_processes(images[0].url)
-    if nmbr_of_processes > len(images):
-        nmbr_of_processes = len(images)
 
     MAX_RETRIES = 3
     TIMEOUT_PER_ITEM = 3  # seconds
@@ -238,23 +233,23 @@ def scale_images(images, report_id, proxy_size):
 
     for attempt in range(MAX_RETRIES):
         logger.info(f"Attempt {attempt + 1} to scale images")
-        with Pool(processes=nmbr_of_processes) as pool:
-            try:
-                scaled_image_paths = process_with_timeouts_starmap(
-                    pool, scale_image, params, TIMEOUT_PER_ITEM
-                )
-                break  # success
-            except StarmapTimeoutError as e:
-                logger.warning(
-                    f"Attempt {attempt + 1}: {len(e.timed_out_indices)} image(s) "
-                    f"timed out during scaling, using partial results"
-                )
-                scaled_image_paths = [r for r in e.results if r is not None]
-                break  # pool terminated by context manager
-            except Exception as e:
-                logger.error(f"Failure in starmap attempt {attempt + 1}: {e}")
-                pool.terminate()
-                pool.join()
+        pool = mapping_pool.get()
+        try:
+            scaled_image_paths = process_with_timeouts_starmap(
+                pool, scale_image, params, TIMEOUT_PER_ITEM
+            )
+            break  # success
+        except StarmapTimeoutError as e:
+            logger.warning(
+                f"Attempt {attempt + 1}: {len(e.timed_out_indices)} image(s) "
+                f"timed out during scaling, using partial results"
+            )
+            scaled_image_paths = [r for r in e.results if r is not None]
+            mapping_pool.recycle("scaling timed out")  # timed out items still occupy processes
+            break
+        except Exception as e:
+            logger.error(f"Failure in starmap attempt {attempt + 1}: {e}")
+            mapping_pool.recycle("scaling failed")
 
         if attempt == MAX_RETRIES - 1:
             logger.error("Failed to scale images after all retries")
@@ -263,36 +258,6 @@ def scale_images(images, report_id, proxy_size):
     print("scaling done")
     return scaled_image_paths
 
-def calculate_number_of_safely_usable_processes(example_image_path):
-    example_memory_usage = get_image_memory_usage(example_image_path)
-    print('example_memory_usage: ', example_memory_usage, 'of image: ', example_image_path)
-    available_memory = psutil.virtual_memory().available
-
-    # Calculate the number of processes based on memory usage
-    max_processes = multiprocessing.cpu_count()
-    if max_processes > 8:
-        max_processes = max_processes - 2
-    elif max_processes > 2:
-        max_processes -= 1
-    #len(os.sched_getaffinity(0))
-    if example_memory_usage == 0:
-        print("Example memory usage is 0, cannot calculate safely usable processes.")
-        return max_processes
-    safely_usable_processes = min(max_processes, int(available_memory / example_memory_usage))
-    print('safely_usable_processes: ', safely_usable_processes, 'with max_processes: ', max_processes, 'and available_memory: ', available_memory)
-    return safely_usable_processes
-
-def get_image_memory_usage(image_path):
-    img = cv2.imread(image_path)
-    if img is None:
-        return 0
-    # Calculate actual memory: height * width * channels * bytes_per_channel
-    memory = img.shape[0] * img.shape[1] * img.shape[2] * img.dtype.itemsize
-    return memory
-
-
-
-
 def scale_image(load_path, destination_path, size):
     img = cv2.imread(os.path.abspath(load_path))
 
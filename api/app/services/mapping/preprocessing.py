@@ -1,11 +1,15 @@
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
+from pathlib import Path
 from geopy.geocoders import Nominatim
 from sqlalchemy.orm import Session
-from billiard import Pool, Manager
+from billiard import Pool
 from typing import List
 
-import threading
+import os
+import math
+import psutil
+import numpy as np
 
 import logging
 
@@ -18,11 +22,18 @@ import app.crud.report as crud_report
 import app.crud.weather as crud_weather
 import app.crud.images as crud_image
 import app.services.thermal.thermal_processing as thermal_processing
+from app.services.thermal import temperature_store
+from app.services.thermal.counterpart_matching import match_counterparts
 from app.services.mapping.progress_updater import ProgressUpdater
 from app.services.image_metadata_extraction import get_ir_scale
 
 logger = logging.getLogger(__name__)
 
+THERMAL_WORKER_MEMORY = 512 * 1024 ** 2  # DJI SDK, R-JPEG and matrix buffers of one parse process
+THERMAL_MAX_CHUNKSIZE = 16
+THERMAL_PROGRESS_EVERY = 5
+COUNTERPART_MAX_DELTA = timedelta(seconds=2)  # max time between a thermal image and its RGB counterpart
+
 def preprocess_report(report_id: int, images: list[ImageOut], settings: ProcessingSettings, db, progress_updater: ProgressUpdater):
     settings = settings.model_dump() if isinstance(settings, ProcessingSettings) else settings
     # crud_image.delete_all_thermal_data(db)  # Clear old thermal data before processing new images
@@ -584,55 +595,46 @@ def _set_bounds_and_corners_per_job(mapping_jobs: list[dict]) -> list[dict]:
 
 
 
-def process_thermal_wrapper(data, progress_queue):
-    from pathlib import Path
-
+def process_thermal_wrapper(data):
+    """Parse (or reload) one thermal image in a pool worker. Failures only affect this image."""
     path = Path(data["target_path"])
-    if path.exists():
-        thermal_matrix = thermal_processing.load_temperature_matrix(path)
-        min_temp, max_temp = thermal_processing.get_temperature_range(thermal_matrix)
-    else:
-        try:
-            min_temp, max_temp = thermal_processing.process_thermal_image(data["url"], path)
-        except Exception as e:
-            logger.error(f"Error processing thermal image {data['image_id']}: {e}")
-            progress_queue.put(1)
-            return {
-                "image_id": data["image_id"],
-                "counterpart_id": data["counterpart_id"],
-                "counterpart_scale": data["counterpart_scale"],
-                "min_temp": None,
-                "max_temp": None,
-                "temp_matrix_path": None
-            }
-
-    # Report progress
-    progress_queue.put(1)
-
-    return {
+    result = {
         "image_id": data["image_id"],
         "counterpart_id": data["counterpart_id"],
         "counterpart_scale": data["counterpart_scale"],
-        "min_temp": min_temp,
-        "max_temp": max_temp,
-        "temp_matrix_path": str(path)
+        "min_temp": None,
+        "max_temp": None,
+        "temp_matrix_path": None,
+        "source_fingerprint": data.get("source_fingerprint"),
+        "temp_stats": None,
     }
+    try:
+        if path.exists():
+            min_temp, max_temp, temp_stats = thermal_processing.summarize_temperature_matrix(path)
+        else:
+            min_temp, max_temp, temp_stats = thermal_processing.process_thermal_image(data["url"], path, data.get("metadata"))
+    except Exception as e:
+        logger.error(f"Error processing thermal image {data['image_id']}: {e}")
+        return result
 
+    result.update(min_temp=float(min_temp), max_temp=float(max_temp), temp_matrix_path=str(path), temp_stats=temp_stats)
+    return result
 
-def progress_listener(queue, updater, total):
-    completed = 0
-    while completed < total:
-        try:
-            _ = queue.get(timeout=1)
-            completed += 1
-            if completed % 5 == 0 or completed == total:
-                updater.update_partial_progress("preprocessing", 10.0, 30.0, total, completed)
-        except:
-            pass
+
+def _thermal_worker_count(total: int) -> int:
+    """Number of thermal parse processes the CPUs and the available memory allow."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    if cpus > 2:
+        cpus -= 1  # leave a core for the API and the celery main process
+    by_memory = int(psutil.virtual_memory().available // THERMAL_WORKER_MEMORY)
+    return max(1, min(cpus, by_memory, total))
 
 
 def _process_thermal_images(images: List[ImageOut], report_id: int, db: Session, progress_updater):
-    images.sort(key=lambda x: x.created_at)
+    images.sort(key=lambda x: (x.created_at is None, x.created_at or datetime.min))
     thermal_images = [img for img in images if img.thermal]
     rgb_images = [img for img in images if not img.thermal]
 
@@ -642,74 +644,73 @@ def _process_thermal_images(images: List[ImageOut], report_id: int, db: Session,
     if total_ir_images == 0:
         logger.info("No thermal images found, skipping thermal processing.")
         return images
-    
-    rgb_start = 0  # index pointer into rgb_images — avoids O(n²) list slicing
-    matched_rgb = set()  # track matched RGB indices to avoid reuse
-
-    for thermal_image in thermal_images:
-        closest_rgb_image_index = -1
-        smallest_diff = float("inf")
-        counterpart = None
-        discard_to_index = -1
-
-        for i in range(rgb_start, len(rgb_images)):
-            if i in matched_rgb:
-                continue
-            rgb_image = rgb_images[i]
-            time_diff = (rgb_image.created_at - thermal_image.created_at).total_seconds()
-            if time_diff > 2:  # rgb too far ahead, rest will be further (sorted)
-                break
-            if time_diff < -2:  # rgb too far behind
-                discard_to_index = i
-                continue
-            if abs(time_diff) < smallest_diff:
-                smallest_diff = abs(time_diff)
-                closest_rgb_image_index = i
-            elif abs(time_diff) > smallest_diff:  # past the best match, stop
-                break
-
-        if closest_rgb_image_index != -1:
-            rgb_start = closest_rgb_image_index  # advance pointer past old entries
-            matched_rgb.add(closest_rgb_image_index)
-            counterpart = rgb_images[closest_rgb_image_index]
-        elif discard_to_index != -1:
-            rgb_start = discard_to_index  # advance pointer past too-old entries
 
+    counterparts = _match_rgb_counterparts(thermal_images, rgb_images)
+
+    for thermal_image, counterpart in zip(thermal_images, counterparts):
         camera_model = thermal_image.camera_model
         scale = get_ir_scale(camera_model)
 
-        target_path = config.UPLOAD_DIR / str(report_id) / "thermal" / f"{thermal_image.id}.npy"
+        # reports processed before the compact format keep their .npy matrices
+        target_path = temperature_store.matrix_path(config.UPLOAD_DIR / str(report_id) / "thermal", thermal_image.id)
 
         thermal_metadata_list.append({
             "url": thermal_image.url,
             "target_path": str(target_path),
             "image_id": thermal_image.id,
             "counterpart_id": counterpart.id if counterpart else None,
-            "counterpart_scale": scale
+            "counterpart_scale": scale,
+            "source_fingerprint": _thermal_source_fingerprint(thermal_image),
         })
 
         if len(thermal_metadata_list) % 10 == 0:
             progress_updater.update_partial_progress("preprocessing", 5.0, 10.0, total_ir_images, len(thermal_metadata_list))
 
-    # -- PARALLEL PROCESSING --
-    manager = Manager()
-    progress_queue = manager.Queue()
-
-    progress_thread = threading.Thread(
-        target=progress_listener,
-        args=(progress_queue, progress_updater, len(thermal_metadata_list)),
+    # -- SKIP UNCHANGED --
+    existing = crud_image.get_thermal_data_by_image_ids(db, [data["image_id"] for data in thermal_metadata_list])
+    to_parse, results = [], []
+    for data in thermal_metadata_list:
+        row = existing.get(data["image_id"])
+        if _matrix_is_current(row, data["source_fingerprint"]):
+            if row.counterpart_id != data["counterpart_id"] or row.counterpart_scale != data["counterpart_scale"]:
+                # only the RGB match changed, the stored matrix and range stay valid
+                results.append({
+                    **data, "min_temp": row.min_temp, "max_temp": row.max_temp,
+                    "temp_matrix_path": row.temp_matrix_path, "temp_stats": row.temp_stats,
+                })
+            continue
+        if row is not None and row.source_fingerprint and row.source_fingerprint != data["source_fingerprint"]:
+            # the R-JPEG changed since its matrix was written
+            Path(data["target_path"]).unlink(missing_ok=True)
+        to_parse.append(data)
+    logger.info(
+        f"Thermal images: {len(to_parse)} to parse, {len(results)} with a new counterpart, "
+        f"{len(thermal_metadata_list) - len(to_parse) - len(results)} unchanged"
     )
-    progress_thread.start()
 
-    with Pool(processes=6) as pool:
-        results = pool.starmap(
-            process_thermal_wrapper,
-            [(data, progress_queue) for data in thermal_metadata_list]
-        )
-
-    progress_thread.join()
+    # read the metadata of all images that still need parsing up front, in a few exiftool calls
+    pending = [data for data in to_parse if not Path(data["target_path"]).exists()]
+    metadata = thermal_processing.read_thermal_metadata_batch([data["url"] for data in pending])
+    for data in pending:
+        data["metadata"] = metadata.get(data["url"])
 
-    # -- INSERT TO DB --
+    # -- PARALLEL PROCESSING --
+    # results come back per chunk, so the parent only hears from a worker every `chunksize` images
+    total = len(to_parse)
+    if total:
+        workers = _thermal_worker_count(total)
+        chunksize = max(1, min(THERMAL_MAX_CHUNKSIZE, math.ceil(total / (workers * 4))))
+        logger.info(f"Parsing {total} thermal images with {workers} processes (chunksize {chunksize})")
+
+        parsed = 0
+        with Pool(processes=workers) as pool:
+            for result in pool.imap_unordered(process_thermal_wrapper, to_parse, chunksize=chunksize):
+                results.append(result)
+                parsed += 1
+                if parsed % THERMAL_PROGRESS_EVERY == 0 or parsed == total:
+                    progress_updater.update_partial_progress("preprocessing", 10.0, 30.0, total, parsed)
+
+    # -- UPSERT CHANGED ROWS --
     thermal_data_list = [
         ThermalDataCreate(
             image_id=item["image_id"],
@@ -719,15 +720,69 @@ def _process_thermal_images(images: List[ImageOut], report_id: int, db: Session,
             max_temp=item["max_temp"],
             temp_matrix_path=item["temp_matrix_path"],
             temp_embedded=True,
-            lut_name="white_hot"
+            lut_name="white_hot",
+            temp_stats=item["temp_stats"],
+            # failed parses keep no fingerprint, so they are retried next time
+            source_fingerprint=item["source_fingerprint"] if item["temp_matrix_path"] else None,
         )
         for item in results
     ]
+    crud_image.upsert_thermal_data(db, thermal_data_list)
 
-    crud_image.create_multiple_thermal_data(db, thermal_data_list)
-
-    for img in images:
-        if img.thermal:
-            db.refresh(img, ["thermal_data"])
+    # one query for all images instead of a refresh per image
+    crud_image.refresh_thermal_data(db, [img.id for img in thermal_images])
     return images
 
+
+def _match_rgb_counterparts(thermal_images: list, rgb_images: list) -> list:
+    """RGB image taken with each thermal image (within COUNTERPART_MAX_DELTA), or None. GPS distance breaks ties."""
+    ir_valid = np.array([img.created_at is not None for img in thermal_images], dtype=bool)
+    rgb = [img for img in rgb_images if img.created_at is not None]
+    matches = match_counterparts(
+        _epoch_ms([img.created_at for img in thermal_images]),
+        _epoch_ms([img.created_at for img in rgb]),
+        int(COUNTERPART_MAX_DELTA.total_seconds() * 1000),
+        _gps_positions(thermal_images),
+        _gps_positions(rgb),
+    )
+    return [rgb[match] if valid and match >= 0 else None for match, valid in zip(matches, ir_valid)]
+
+
+def _epoch_ms(timestamps: list) -> np.ndarray:
+    # images without a timestamp are placed far away from every other frame
+    return np.array([ts or datetime.min for ts in timestamps], dtype="datetime64[ms]").astype(np.int64)
+
+
+def _gps_positions(images: list) -> np.ndarray:
+    positions = np.full((len(images), 2), np.nan)
+    for i, img in enumerate(images):
+        gps = (img.coord or {}).get("gps") or {}
+        if gps.get("lat") is not None and gps.get("lon") is not None:
+            positions[i] = (gps["lat"], gps["lon"])
+    return positions
+
+
+def _thermal_source_fingerprint(image) -> str | None:
+    """Identifies the version of an R-JPEG: its upload hash, or mtime and size for older uploads."""
+    if image.content_hash:
+        return f"sha256:{image.content_hash}"
+    try:
+        stat = os.stat(image.url)
+    except (OSError, TypeError):
+        return None
+    return f"stat:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _matrix_is_current(row, fingerprint: str | None) -> bool:
+    """Whether the stored matrix of a ThermalData row was parsed from this version of the image and still exists."""
+    return (
+        row is not None
+        and fingerprint is not None
+        and row.source_fingerprint == fingerprint
+        and row.min_temp is not None
+        and row.max_temp is not None
+        and bool(row.temp_matrix_path)
+        and os.path.isfile(row.temp_matrix_path)
+        # rows from before the statistics existed reload their matrix once to compute them
+        and row.temp_stats is not None
+    )
@@ -20,6 +20,16 @@ import logging
 r = redis.Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=0)
 logger = logging.getLogger(__name__)
 
+def _ready_images(report):
+    """Images of the report that are fully ingested; deferred uploads that are still pending
+    or failed have no metadata and no MappingData yet."""
+    images = report.mapping_report.images
+    ready = [image for image in images if image.ingest_status == "ready"]
+    if len(ready) < len(images):
+        logger.warning(f"Skipping {len(images) - len(ready)} image(s) of report {report.report_id} that are not ingested")
+    return ready
+
+
 @celery_app.task(name="mapping.process_report")
 def process_report(report_id: int, settings: dict = None):
     db = next(get_db())
@@ -28,7 +38,7 @@ def process_report(report_id: int, settings: dict = None):
     logger.info(f"Settings of type {type(settings)}: {settings}")
     try:
         report = crud.get_full_report(db, report_id, r)
-        images = report.mapping_report.images
+        images = _ready_images(report)
         mapping_report_id = report.mapping_report.id
 
         do_reread = settings.get('reread_metadata', False)
@@ -37,7 +47,7 @@ def process_report(report_id: int, settings: dict = None):
             progress_updater.scope(0.0, 20.0)
             reread_image_metadata(images, db, progress_updater)
             report = crud.get_full_report(db, report_id, r)
-            images = report.mapping_report.images
+            images = _ready_images(report)
 
         progress_updater.scope(20.0 if do_reread else 0.0, 100.0)
         mapping_selections = preprocess_report(report_id, images, settings, db, progress_updater)
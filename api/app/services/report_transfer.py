@@ -528,7 +528,7 @@ def _extract_and_update_paths(db, zip_path, manifest, new_report_id, image_id_ma
             else:
                 img_obj.thumbnail_url = None
 
-            # Extract thermal .npy
+            # Extract thermal matrix (.tmx or .npy)
             td = m_img.get("thermal_data")
             if td and td.get("temp_matrix_path") and td["temp_matrix_path"] in zf.namelist():
                 td_obj = db.query(models.ThermalData).filter(
@@ -0,0 +1,89 @@
+import numpy as np
+
+EARTH_RADIUS = 6_371_000.0  # meters
+
+
+def match_counterparts(
+    ir_times: np.ndarray,
+    rgb_times: np.ndarray,
+    max_delta: int,
+    ir_positions: np.ndarray | None = None,
+    rgb_positions: np.ndarray | None = None,
+) -> np.ndarray:
+    """Pair every IR frame with at most one RGB frame taken at (nearly) the same time.
+
+    Candidate pairs are all RGB frames within max_delta of an IR frame, found with
+    np.searchsorted on the sorted RGB timestamps. Pairs are ranked by time difference,
+    then by GPS distance if positions are given (IR and RGB of one shot often share a
+    timestamp), and assigned greedily so that each frame is used once: in every round
+    all pairs that are the best remaining pair for both of their frames are accepted.
+    This gives the same result as accepting pairs one by one in rank order.
+
+    Args:
+        ir_times (np.ndarray): int64 timestamps of the IR frames, any unit and order.
+        rgb_times (np.ndarray): int64 timestamps of the RGB frames, same unit.
+        max_delta (int): Largest allowed time difference, inclusive.
+        ir_positions (np.ndarray | None): (n, 2) lat/lon in degrees, NaN where unknown.
+        rgb_positions (np.ndarray | None): (m, 2) lat/lon in degrees, NaN where unknown.
+    Returns:
+        np.ndarray: For every IR frame the index of its RGB counterpart, or -1.
+    """
+    ir_times = np.asarray(ir_times, dtype=np.int64)
+    rgb_times = np.asarray(rgb_times, dtype=np.int64)
+    matches = np.full(len(ir_times), -1, dtype=np.int64)
+    if len(ir_times) == 0 or len(rgb_times) == 0:
+        return matches
+
+    # candidate pairs: the window [t - max_delta, t + max_delta] of every IR frame
+    rgb_order = np.argsort(rgb_times, kind="stable")
+    sorted_rgb_times = rgb_times[rgb_order]
+    lo = np.searchsorted(sorted_rgb_times, ir_times - max_delta, side="left")
+    hi = np.searchsorted(sorted_rgb_times, ir_times + max_delta, side="right")
+    counts = hi - lo
+    total = int(counts.sum())
+    if total == 0:
+        return matches
+    pair_ir = np.repeat(np.arange(len(ir_times)), counts)
+    window_offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    pair_rgb = rgb_order[np.repeat(lo, counts) + window_offset]
+
+    delta = np.abs(rgb_times[pair_rgb] - ir_times[pair_ir])
+    if ir_positions is not None and rgb_positions is not None:
+        distance = _distances(np.asarray(ir_positions, dtype=np.float64)[pair_ir],
+                              np.asarray(rgb_positions, dtype=np.float64)[pair_rgb])
+    else:
+        distance = np.zeros(total)
+    # unique rank per pair, lexsort sorts by the last key first and is stable
+    order = np.lexsort((distance, delta))
+    rank = np.empty(total, dtype=np.int64)
+    rank[order] = np.arange(total)
+
+    alive = np.ones(total, dtype=bool)
+    used_ir = np.zeros(len(ir_times), dtype=bool)
+    used_rgb = np.zeros(len(rgb_times), dtype=bool)
+    while alive.any():
+        ir_idx, rgb_idx, pair_rank = pair_ir[alive], pair_rgb[alive], rank[alive]
+        best_for_ir = np.full(len(ir_times), total, dtype=np.int64)
+        best_for_rgb = np.full(len(rgb_times), total, dtype=np.int64)
+        np.minimum.at(best_for_ir, ir_idx, pair_rank)
+        np.minimum.at(best_for_rgb, rgb_idx, pair_rank)
+        accepted = (best_for_ir[ir_idx] == pair_rank) & (best_for_rgb[rgb_idx] == pair_rank)
+
+        matches[ir_idx[accepted]] = rgb_idx[accepted]
+        used_ir[ir_idx[accepted]] = True
+        used_rgb[rgb_idx[accepted]] = True
+        alive &= ~used_ir[pair_ir] & ~used_rgb[pair_rgb]
+    return matches
+
+
+def _distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Approximate distance in meters between lat/lon pairs (equirectangular, fine for nearby points).
+
+    Unknown positions get an infinite distance so they lose every tie.
+    """
+    lat_a, lon_a = np.radians(a[:, 0]), np.radians(a[:, 1])
+    lat_b, lon_b = np.radians(b[:, 0]), np.radians(b[:, 1])
+    x = (lon_b - lon_a) * np.cos((lat_a + lat_b) / 2)
+    y = lat_b - lat_a
+    distance = EARTH_RADIUS * np.hypot(x, y)
+    return np.where(np.isnan(distance), np.inf, distance)
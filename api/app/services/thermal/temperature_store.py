@@ -0,0 +1,205 @@
+import os
+import struct
+import logging
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # compression is optional, uncompressed matrices work without it
+    zstandard = None
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# Compact temperature matrix file (.tmx), all values little-endian:
+#   0x00  4s   magic "ATMX"
+#   0x04  B    format version
+#   0x05  B    codec (0 = none, 1 = zstd)
+#   0x06  2x   reserved
+#   0x08  I    height
+#   0x0c  I    width
+#   0x10  f    scale  } temperature in °C = value * scale + offset
+#   0x14  f    offset }
+#   0x18  h    nodata value (NaN in the original matrix)
+#   0x20       int16 deci-Kelvin values, row-major (zstd frame if compressed)
+# The uncompressed payload starts at a fixed, aligned offset so it can be memory-mapped.
+MATRIX_SUFFIX = ".tmx"
+LEGACY_MATRIX_SUFFIX = ".npy"
+MAGIC = b"ATMX"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBxxIIffh")
+HEADER_SIZE = 32
+CODEC_NONE = 0
+CODEC_ZSTD = 1
+CODECS = {"none": CODEC_NONE, "zstd": CODEC_ZSTD}
+ZSTD_LEVEL = 3
+
+SCALE = 0.1  # deci-Kelvin, 0.1 °C resolution
+OFFSET = -273.15
+NODATA = np.iinfo(np.int16).min
+# 3276.7 K is far above anything a thermal camera reports
+QUANTIZED_MIN, QUANTIZED_MAX = NODATA + 1, np.iinfo(np.int16).max
+
+
+@dataclass
+class QuantizedMatrix:
+    """The int16 content of a temperature matrix file, memory-mapped if it is uncompressed."""
+    values: np.ndarray
+    scale: float
+    offset: float
+    nodata: int
+
+    def to_celsius(self) -> np.ndarray:
+        celsius = self.values.astype(np.float32)
+        celsius *= self.scale
+        celsius += self.offset
+        missing = self.values == self.nodata
+        if missing.any():
+            celsius[missing] = np.nan
+        return celsius
+
+
+def is_temperature_matrix(path: str | Path) -> bool:
+    """Whether path is a stored temperature matrix (compact or legacy .npy) rather than an image."""
+    return str(path).endswith((MATRIX_SUFFIX, LEGACY_MATRIX_SUFFIX))
+
+
+def matrix_path(directory: str | Path, stem: str | int) -> Path:
+    """Path of the temperature matrix for stem. An existing legacy .npy file is preferred over a new .tmx path."""
+    legacy = Path(directory) / f"{stem}{LEGACY_MATRIX_SUFFIX}"
+    if legacy.exists():
+        return legacy
+    return Path(directory) / f"{stem}{MATRIX_SUFFIX}"
+
+
+def quantize(temperature: np.ndarray) -> np.ndarray:
+    """Convert a °C matrix to int16 deci-Kelvin, NaN becomes NODATA."""
+    scaled = np.asarray(temperature, dtype=np.float32) - OFFSET
+    scaled /= SCALE
+    np.rint(scaled, out=scaled)
+    np.clip(scaled, QUANTIZED_MIN, QUANTIZED_MAX, out=scaled)
+    missing = np.isnan(scaled)
+    scaled[missing] = 0
+    values = scaled.astype(np.int16)
+    values[missing] = NODATA
+    return values
+
+
+def save(temperature: np.ndarray, path: str | Path, compression: str | None = None) -> Path:
+    """
+    Writes a temperature matrix. Paths ending in .npy are written as float32 .npy files like before.
+
+    :param temperature: 2D matrix in °C.
+    :param path: Target path.
+    :param compression: "none" or "zstd", defaults to config.THERMAL_MATRIX_COMPRESSION.
+    :return: The written path.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == LEGACY_MATRIX_SUFFIX:
+        np.save(path, np.asarray(temperature, dtype=np.float32))
+        return path
+
+    compression = (compression or config.THERMAL_MATRIX_COMPRESSION).lower()
+    codec = CODECS.get(compression)
+    if codec is None:
+        raise ValueError(f"Unknown temperature matrix compression: {compression}")
+    if codec == CODEC_ZSTD and zstandard is None:
+        logger.warning("zstandard is not installed, writing the temperature matrix uncompressed")
+        codec = CODEC_NONE
+
+    values = quantize(temperature)
+    height, width = values.shape
+    payload = values.astype("<i2", copy=False).tobytes()
+    if codec == CODEC_ZSTD:
+        payload = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, codec, height, width, SCALE, OFFSET, NODATA).ljust(HEADER_SIZE, b"\0")
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except Exception:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return path
+
+
+def open_quantized(path: str | Path) -> QuantizedMatrix:
+    """
+    Opens a compact temperature matrix without converting it to float.
+
+    :param path: Path to a .tmx file.
+    :return: QuantizedMatrix whose values are memory-mapped for uncompressed files.
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER.size:
+            raise ValueError(f"Truncated temperature matrix: {path}")
+        magic, version, codec, height, width, scale, offset, nodata = HEADER.unpack_from(header)
+        if magic != MAGIC:
+            raise ValueError(f"Not a temperature matrix: {path}")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Unsupported temperature matrix version {version}: {path}")
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is required to read the compressed temperature matrix {path}")
+            raw = zstandard.ZstdDecompressor().decompress(f.read(), max_output_size=height * width * 2)
+            values = np.frombuffer(raw, dtype="<i2").reshape(height, width)
+            return QuantizedMatrix(values, scale, offset, nodata)
+        if codec != CODEC_NONE:
+            raise ValueError(f"Unknown temperature matrix codec {codec}: {path}")
+
+    values = np.memmap(path, dtype="<i2", mode="r", offset=HEADER_SIZE, shape=(height, width))
+    return QuantizedMatrix(values, scale, offset, nodata)
+
+
+def load(path: str | Path) -> np.ndarray:
+    """
+    Loads a temperature matrix in °C as float32, from a compact .tmx or a legacy .npy file.
+
+    :param path: Path to the matrix file.
+    :return: Numpy array with the temperatures.
+    """
+    if str(path).endswith(LEGACY_MATRIX_SUFFIX):
+        return np.load(path)
+    return open_quantized(path).to_celsius()
+
+
+def read_window(
+    path: str | Path,
+    roi: tuple[int, int, int, int] | None = None,
+    step: int = 1,
+) -> tuple[QuantizedMatrix | np.ndarray, tuple[int, int, int, int]]:
+    """
+    Reads a region of a stored matrix, taking every step-th row and column. Only the
+    needed part of an uncompressed .tmx or .npy file is read from disk.
+
+    :param path: Path to the matrix file.
+    :param roi: (x, y, width, height), clipped to the matrix. None for the whole matrix.
+    :param step: Downsampling step.
+    :return: (QuantizedMatrix for .tmx or float32 °C array for .npy, clipped roi).
+    """
+    legacy = str(path).endswith(LEGACY_MATRIX_SUFFIX)
+    matrix = np.load(path, mmap_mode="r") if legacy else open_quantized(path)
+    values = matrix if legacy else matrix.values
+    height, width = values.shape
+
+    x, y, w, h = roi if roi is not None else (0, 0, width, height)
+    x0, y0 = min(max(x, 0), width), min(max(y, 0), height)
+    x1, y1 = min(max(x + w, x0), width), min(max(y + h, y0), height)
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError(f"ROI {roi} is outside of the {width}x{height} matrix")
+
+    window = np.ascontiguousarray(values[y0:y1:step, x0:x1:step])
+    clipped = (x0, y0, x1 - x0, y1 - y0)
+    if legacy:
+        return window.astype(np.float32, copy=False), clipped
+    return QuantizedMatrix(window, matrix.scale, matrix.offset, matrix.nodata), clipped
@@ -0,0 +1,80 @@
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from app.config import config
+from app.database import get_db
+import app.crud.images as crud_image
+import app.services.thermal.thermal_processing as thermal_processing
+from app.services.thermal import temperature_store
+
+logger = logging.getLogger(__name__)
+
+PARSE_TIMEOUT = 120  # seconds a request waits for its parse
+
+
+class ThermalParsePool:
+    """Parses R-JPEGs on request for thermal images that have no stored matrix yet.
+
+    At most `workers` images are parsed at once, so hovering over many unprocessed
+    images cannot swamp the API process. Concurrent requests for the same image
+    wait for the same parse instead of starting their own. The matrix is written
+    next to the ones of preprocessing and recorded in ThermalData.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._inflight: dict[int, Future] = {}
+
+    def ensure_matrix(self, image_id: int, report_id: int, url: str, timeout: float | None = PARSE_TIMEOUT) -> tuple[str, float, float]:
+        """Return (matrix path, min_temp, max_temp) of the image, parsing it if needed.
+
+        Raises TimeoutError if the parse does not finish within timeout; it keeps running
+        and a later request picks up the result.
+        """
+        with self._lock:
+            future = self._inflight.get(image_id)
+            created = future is None
+            if created:
+                future = self._get_executor().submit(self._parse, image_id, report_id, url)
+                self._inflight[image_id] = future
+        if created:
+            future.add_done_callback(lambda done: self._forget(image_id, done))
+        return future.result(timeout)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # a pool inherited through fork has no threads, start a new one
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thermal-parse")
+            self._inflight = {}
+            self._pid = os.getpid()
+        return self._executor
+
+    def _forget(self, image_id: int, future: Future):
+        with self._lock:
+            if self._inflight.get(image_id) is future:
+                del self._inflight[image_id]
+
+    def _parse(self, image_id: int, report_id: int, url: str) -> tuple[str, float, float]:
+        path = temperature_store.matrix_path(config.UPLOAD_DIR / str(report_id) / "thermal", image_id)
+        if path.exists():
+            # written by another process (or left over from an earlier run)
+            min_temp, max_temp, temp_stats = thermal_processing.summarize_temperature_matrix(path)
+        else:
+            logger.info(f"Parsing thermal image {image_id} on demand")
+            min_temp, max_temp, temp_stats = thermal_processing.process_thermal_image(url, str(path))
+        min_temp, max_temp = float(min_temp), float(max_temp)
+
+        db = next(get_db())
+        try:
+            crud_image.update_thermal_matrix_path(db, image_id, str(path), min_temp, max_temp, temp_stats)
+        finally:
+            db.close()
+        return str(path), min_temp, max_temp
+
+
+thermal_parse_pool = ThermalParsePool(workers=config.THERMAL_PARSE_WORKERS)
@@ -0,0 +1,83 @@
+"""
+Throughput benchmark for DJI R-JPEG parsing (`Thermal.parse_dirp2`).
+
+Compares the previous per-image path (read the file into bytes, allocate a fresh output
+array, copy the result) with the current one (memory-mapped input, reused output buffer,
+returned view).
+
+Usage (from the api directory):
+    python -m app.services.thermal.thermal_parser.benchmark M30T_0001_T.JPG M30T_0002_T.JPG --repeat 5
+    python -m app.services.thermal.thermal_parser.benchmark --width 640 --height 512 --no-m2ea XT2_*.jpg
+"""
+
+import argparse
+import time
+from ctypes import POINTER, c_float, c_int32, c_uint8, cast, sizeof
+from typing import Callable, List
+
+import numpy as np
+
+from .thermal import DIRP_HANDLE, Thermal, dirp_resolotion_t, dirp_rjpeg_version_t
+
+
+def parse_dirp2_legacy(thermal: Thermal, filepath_image: str, image_height: int, image_width: int) -> np.ndarray:
+    """The float32 M2EA-mode path as it was before buffers were reused."""
+    with open(filepath_image, 'rb') as file:
+        raw = file.read()
+        raw_size = c_int32(len(raw))
+        raw_c_uint8 = cast(raw, POINTER(c_uint8))
+
+    handle = DIRP_HANDLE()
+    assert thermal._dirp_create_from_rjpeg(raw_c_uint8, raw_size, handle) == Thermal.DIRP_SUCCESS
+    assert thermal._dirp_get_rjpeg_version(handle, dirp_rjpeg_version_t()) == Thermal.DIRP_SUCCESS
+    assert thermal._dirp_get_rjpeg_resolution(handle, dirp_resolotion_t()) == Thermal.DIRP_SUCCESS
+
+    data = np.zeros(image_width * image_height, dtype=np.float32)
+    data_ptr = data.ctypes.data_as(POINTER(c_float))
+    data_size = c_int32(image_width * image_height * sizeof(c_float))
+    assert thermal._dirp_measure_ex(handle, data_ptr, data_size) == Thermal.DIRP_SUCCESS
+    temp = np.reshape(data, (image_height, image_width))
+    assert thermal._dirp_destroy(handle) == Thermal.DIRP_SUCCESS
+    return np.array(temp, dtype=np.float32)
+
+
+def _run(name: str, parse: Callable[[str], np.ndarray], filepaths: List[str], repeat: int) -> float:
+    # warm up (page cache, SDK initialisation, buffer allocation)
+    parse(filepaths[0])
+    checksum = 0.0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for filepath in filepaths:
+            # consume the result like process_thermal_image does before the next parse
+            checksum += float(parse(filepath).max())
+    elapsed = time.perf_counter() - start
+    count = repeat * len(filepaths)
+    print(f'{name:>8}: {count} images in {elapsed:.3f} s, {count / elapsed:.1f} images/s, {elapsed / count * 1000:.2f} ms/image (checksum {checksum:.1f})')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='+', help='DJI R-JPEG files, e.g. M30T or M3T samples')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=512)
+    parser.add_argument('--no-m2ea', dest='m2ea', action='store_false',
+                        help='set measurement parameters (non M2EA/M3T/M30T cameras)')
+    args = parser.parse_args()
+
+    thermal = Thermal(dtype=np.float32)
+    if args.m2ea:
+        legacy = _run('legacy', lambda f: parse_dirp2_legacy(thermal, f, args.height, args.width), args.images, args.repeat)
+    else:
+        legacy = None
+        print('  legacy: skipped, only implemented for M2EA mode')
+    current = _run('current', lambda f: thermal.parse_dirp2(
+        f, image_height=args.height, image_width=args.width, m2ea_mode=args.m2ea, reuse_buffer=True,
+    ), args.images, args.repeat)
+    if legacy:
+        print(f' speedup: {legacy / current:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -16,12 +16,17 @@ copies or substantial portions of the Software.
 
 import os
 import re
+import json
+import mmap
+import logging
 import platform
 import subprocess
 import sys
+import threading
 from ctypes import *
+from functools import lru_cache
 from io import BufferedIOBase, BytesIO
-from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 from PIL import Image
@@ -30,6 +35,8 @@ __all__ = [
     'Thermal',
 ]
 
+logger = logging.getLogger(__name__)
+
 DIRP_HANDLE = c_void_p
 DIRP_VERBOSE_LEVEL_NONE = 0  # 0: Print none
 DIRP_VERBOSE_LEVEL_DEBUG = 1  # 1: Print debug log
@@ -114,7 +121,12 @@ class dirp_measurement_params_t(Structure):
 
 # Constants
 SEGMENT_SEP = b'\xff'
+JPEG_SOI_MARKER = b'\xd8'
+JPEG_SOS_MARKER = b'\xda'
+JPEG_EOI_MARKER = b'\xd9'
 APP1_MARKER = b'\xe1'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+RAW_DATA_BYTE_ORDER_LE = 2
 MAGIC_FLIR_DEF = b'FLIR\x00'
 
 CHUNK_APP1_BYTES_COUNT = len(APP1_MARKER)
@@ -182,19 +194,36 @@ def extract_flir_app1(stream: BinaryIO) -> BinaryIO:
         A bytes stream of the APP1 FLIR segments
     """
     # Check JPEG-ness
-    _ = stream.read(2)
+    if stream.read(2) != SEGMENT_SEP + JPEG_SOI_MARKER:
+        raise ValueError('Invalid FLIR: not a JPEG file')
 
     chunks_count: Optional[int] = None
     chunks: Dict[int, bytes] = {}
+    # Walk the segment headers, the FLIR APP1 segments all come before the scan data
     while True:
-        b = stream.read(1)
-        if b == b'':
+        header = stream.read(CHUNK_APP1_BYTES_COUNT + 1)
+        if len(header) < 2 or header[:1] != SEGMENT_SEP:
+            break
+        marker = header[1:]
+        if marker == SEGMENT_SEP:
+            # fill byte, the marker follows
+            stream.seek(-1, 1)
+            continue
+        if marker in (JPEG_SOS_MARKER, JPEG_EOI_MARKER):
             break
 
-        if b != SEGMENT_SEP:
+        length = int.from_bytes(stream.read(CHUNK_LENGTH_BYTES_COUNT), 'big')
+        if length < CHUNK_LENGTH_BYTES_COUNT:
+            break
+        if marker != APP1_MARKER:
+            stream.seek(length - CHUNK_LENGTH_BYTES_COUNT, 1)
             continue
 
+        # Rewind to the APP1 marker so parse_flir_chunk sees the full segment header
+        stream.seek(-CHUNK_LENGTH_BYTES_COUNT - CHUNK_APP1_BYTES_COUNT, 1)
+        segment_end = stream.tell() + CHUNK_APP1_BYTES_COUNT + length
         parsed_chunk = parse_flir_chunk(stream, chunks_count)
+        stream.seek(segment_end)
         if not parsed_chunk:
             continue
 
@@ -211,11 +240,11 @@ def extract_flir_app1(stream: BinaryIO) -> BinaryIO:
     if chunks_count is None:
         raise ValueError('Invalid FLIR: no metadata encountered')
 
-    flir_app1_bytes = b''
-    for chunk_num in range(chunks_count + 1):
-        flir_app1_bytes += chunks[chunk_num]
+    missing = [chunk_num for chunk_num in range(chunks_count + 1) if chunk_num not in chunks]
+    if missing:
+        raise ValueError(f'Invalid FLIR: missing chunks {missing}')
 
-    flir_app1_stream = BytesIO(flir_app1_bytes)
+    flir_app1_stream = BytesIO(b''.join(chunks[chunk_num] for chunk_num in range(chunks_count + 1)))
     flir_app1_stream.seek(0)
     return flir_app1_stream
 
@@ -297,8 +326,7 @@ def parse_flir_app1(stream: BinaryIO) -> Dict[int, Tuple[int, int, int, int]]:
     # First parse the record metadata
     record_details: Dict[int, Tuple[int, int, int, int]] = {}
     for record_nr in range(record_dir_entries_count):
-        record_dir_stream.seek(0)
-        details = parse_flir_record_metadata(stream, record_nr)
+        details = parse_flir_record_metadata(record_dir_stream, record_nr)
         if details:
             record_details[details[1]] = details
 
@@ -346,31 +374,150 @@ def parse_raw_data(stream: BinaryIO, metadata: Tuple[int, int, int, int]):
     (_, _, offset, length) = metadata
     stream.seek(offset)
 
-    stream.seek(2, 1)
-    width = int.from_bytes(stream.read(2), 'little')
-    height = int.from_bytes(stream.read(2), 'little')
+    # The byte order indicator reads as 2 in the byte order of the record
+    byte_order = 'little' if int.from_bytes(stream.read(2), 'little') == RAW_DATA_BYTE_ORDER_LE else 'big'
+    width = int.from_bytes(stream.read(2), byte_order)
+    height = int.from_bytes(stream.read(2), byte_order)
 
     stream.seek(offset + 32)
-
-    # Read the bytes with the raw thermal data and decode using PIL
     thermal_bytes = stream.read(length)
-    thermal_stream = BytesIO(thermal_bytes)
-    thermal_img = Image.open(thermal_stream)
-    thermal_np = np.array(thermal_img)
+
+    if thermal_bytes.startswith(PNG_SIGNATURE):
+        # Decode the embedded PNG using PIL
+        thermal_img = Image.open(BytesIO(thermal_bytes))
+        # FLIR PNG data is in the wrong byte order, fix that
+        thermal_np = np.asarray(thermal_img, dtype=np.uint16).byteswap()
+    else:
+        # Uncompressed 16 bit values
+        dtype = np.dtype('<u2' if byte_order == 'little' else '>u2')
+        thermal_np = np.frombuffer(thermal_bytes, dtype=dtype, count=width * height).astype(np.uint16)
+        thermal_np = thermal_np.reshape(height, width)
 
     # Check shape
     if thermal_np.shape != (height, width):
         msg = f'Invalid FLIR: metadata\'s width and height don\'t match thermal data\'s actual width and height ({thermal_np.shape} vs ({height}, {width})'
         raise ValueError(msg)
 
-    # FLIR PNG data is in the wrong byte order, fix that
-    fix_byte_order = np.vectorize(lambda x: (x >> 8) + ((x & 0x00FF) << 8))
-    thermal_np = fix_byte_order(thermal_np)
-
     return width, height, thermal_np
 
 
 ABSOLUTE_ZERO = 273.15
+FLIR_RAW_VALUES = 1 << 16
+FLIR_LUT_CACHE_SIZE = 32  # parameter sets, one LUT is 256 KiB
+NUMBER_PATTERN = re.compile(r'[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?')
+
+
+def normalize_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Key exiftool JSON metadata by bare tag name, dropping `-G` group prefixes such as `EXIF:`.
+
+    If a tag occurs in several groups the first occurrence wins.
+    """
+    normalized: Dict[str, Any] = {}
+    for key, value in metadata.items():
+        normalized.setdefault(key.split(':')[-1], value)
+    return normalized
+
+
+def metadata_float(value: Any) -> float:
+    """Converts a numeric or printed exiftool value such as `20.0 C` or `1.00 m` to float."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_PATTERN.search(str(value))
+    if match is None:
+        raise ValueError(f'Not a number: {value!r}')
+    return float(match.group())
+
+
+@lru_cache(maxsize=FLIR_LUT_CACHE_SIZE)
+def flir_temperature_lut(
+        emissivity: float,
+        object_distance: float,
+        atmospheric_temperature: float,
+        reflected_apparent_temperature: float,
+        ir_window_temperature: float,
+        ir_window_transmission: float,
+        relative_humidity: float,
+        planck_r1: float,
+        planck_b: float,
+        planck_f: float,
+        planck_o: float,
+        planck_r2: float,
+        ata1: float,
+        ata2: float,
+        atb1: float,
+        atb2: float,
+        atx: float,
+) -> np.ndarray:
+    """
+    Raw to temperature (°C) lookup table for one set of FLIR parameters, see `Thermal.parse_flir`.
+
+    The atmosphere, window and reflection terms only depend on the parameters, and the raw values are
+    16 bit, so the whole conversion is evaluated once for every possible raw value. Entries for raw
+    values that cannot occur in a valid image are NaN.
+
+    Returns:
+        np.ndarray: read-only float32 array with 65536 entries, indexed by the raw value
+    """
+    raw = np.arange(FLIR_RAW_VALUES, dtype=np.float64)
+    # transmission through window (calibrated)
+    emiss_wind = 1 - ir_window_transmission
+    refl_wind = 0
+    # transmission through the air
+    h2o = (relative_humidity / 100) * np.exp(
+        1.5587
+        + 0.06939 * atmospheric_temperature
+        - 0.00027816 * atmospheric_temperature ** 2
+        + 0.00000068455 * atmospheric_temperature ** 3
+    )
+    tau1 = atx * np.exp(-np.sqrt(object_distance / 2) * (ata1 + atb1 * np.sqrt(h2o))) + (1 - atx) * np.exp(
+        -np.sqrt(object_distance / 2) * (ata2 + atb2 * np.sqrt(h2o))
+    )
+    tau2 = atx * np.exp(-np.sqrt(object_distance / 2) * (ata1 + atb1 * np.sqrt(h2o))) + (1 - atx) * np.exp(
+        -np.sqrt(object_distance / 2) * (ata2 + atb2 * np.sqrt(h2o))
+    )
+    # radiance from the environment
+    raw_refl1 = planck_r1 / \
+        (planck_r2 * (np.exp(planck_b / (reflected_apparent_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o
+    # Reflected component
+    raw_refl1_attn = (1 - emissivity) / emissivity * raw_refl1
+
+    # Emission from atmosphere 1
+    raw_atm1 = (planck_r1 / (planck_r2 * (np.exp(planck_b / (atmospheric_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o)
+    # attenuation for atmospheric 1 emission
+    raw_atm1_attn = (1 - tau1) / emissivity / tau1 * raw_atm1
+
+    # Emission from window due to its own temp
+    raw_wind = (planck_r1 / (planck_r2 * (np.exp(planck_b / (ir_window_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o)
+    # Componen due to window emissivity
+    raw_wind_attn = (emiss_wind / emissivity / tau1 / ir_window_transmission * raw_wind)
+
+    # Reflection from window due to external objects
+    raw_refl2 = (planck_r1 / (planck_r2 *
+                 (np.exp(planck_b / (reflected_apparent_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o)
+    # component due to window reflectivity
+    raw_refl2_attn = (refl_wind / emissivity / tau1 / ir_window_transmission * raw_refl2)
+
+    # Emission from atmosphere 2
+    raw_atm2 = (planck_r1 / (planck_r2 * (np.exp(planck_b / (atmospheric_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o)
+    # attenuation for atmospheric 2 emission
+    raw_atm2_attn = ((1 - tau2) / emissivity / tau1 / ir_window_transmission / tau2 * raw_atm2)
+
+    raw_obj = (
+        raw / emissivity / tau1 / ir_window_transmission / tau2
+        - raw_atm1_attn
+        - raw_atm2_attn
+        - raw_wind_attn
+        - raw_refl1_attn
+        - raw_refl2_attn
+    )
+    val_to_log = planck_r1 / (planck_r2 * (raw_obj + planck_o)) + planck_f
+    # temperature from radiance, raw values that would be a corrupted image map to NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+        temperature = planck_b / np.log(val_to_log) - ABSOLUTE_ZERO
+    temperature[val_to_log < 0] = np.nan
+    lut = temperature.astype(np.float32)
+    lut.flags.writeable = False
+    return lut
 
 
 class Thermal:
@@ -413,12 +560,15 @@ class Thermal:
     def __init__(
             self,
             dtype=np.float32,
+            metadata_reader: Optional[Callable[[str], Dict[str, Any]]] = None,
     ):
         """
         Load exiftool/DJI SDK.
 
         Args:
             dtype: np.float32 or np.int16. parse R-JPEG files in the format specified by dtype
+            metadata_reader: callable returning the exiftool JSON metadata of an image,
+                e.g. backed by a persistent exiftool process. Defaults to running exiftool once per image.
 
         Raises
         ------
@@ -451,6 +601,9 @@ class Thermal:
             self._filepath_iirp,
             self._filepath_exiftool,
         ) = get_default_filepaths()
+        self._metadata_reader = metadata_reader or self._read_metadata_exiftool
+        # per-thread output buffers of parse_dirp2(reuse_buffer=True), keyed by dtype and resolution
+        self._local = threading.local()
         # print(f'loaded DJI SDK: {self._filepath_dirp}, {self._filepath_dirp_sub}, {self._filepath_iirp}, {self._filepath_exiftool}')
         # self._filepath_dirp = "./plugins/dji_thermal_sdk_v1.7_20241205/linux/release_x64/libdirp.so" 
         # self._filepath_dirp_sub = "./plugins/dji_thermal_sdk_v1.7_20241205/linux/release_x64/libdirp_sub.so"
@@ -527,15 +680,23 @@ class Thermal:
         self._dirp_measure_ex.argtypes = [DIRP_HANDLE, POINTER(c_float), c_int32]
         self._dirp_measure_ex.restype = c_int32
 
+    def _read_metadata_exiftool(self, filepath_image: str) -> Dict[str, Any]:
+        meta = subprocess.check_output([self._filepath_exiftool, '-j', filepath_image])
+        return json.loads(meta)[0]
+
     def parse(
             self,
             filepath_image: str,
+            metadata: Optional[Dict[str, Any]] = None,
+            reuse_buffer: bool = False,
     ) -> np.ndarray:
         """
         Parser infrared camera data as `NumPy` data.
 
         Args:
             filepath_image: str, relative path of R-JPEG image
+            metadata: dict, exiftool JSON metadata of the image if it was already read, else it is read with the metadata reader
+            reuse_buffer: bool, see `parse_dirp2`. The result may be a view that is overwritten by the next parse call.
 
         Returns:
             np.ndarray: temperature array
@@ -551,13 +712,11 @@ class Thermal:
 
         assert isinstance(filepath_image, str) and os.path.exists(
             filepath_image), f'Check if the file exists: {filepath_image}.'
-        meta = subprocess.Popen([self._filepath_exiftool, filepath_image], stdout=subprocess.PIPE).communicate()[0]
-        meta = meta.decode('utf8').replace('\r', '')
-        meta_json = dict([
-            (field.split(':')[0].strip(), field.split(':')[1].strip()) for field in meta.split('\n') if ':' in field
-        ])
-        assert 'Camera Model Name' in meta_json, f'{filepath_image} `Camera Model Name` field is missing'
-        camera_model = meta_json['Camera Model Name']
+        if metadata is None:
+            metadata = self._metadata_reader(filepath_image)
+        meta_json = normalize_metadata(metadata)
+        assert 'Model' in meta_json, f'{filepath_image} `Camera Model Name` field is missing'
+        camera_model = str(meta_json['Model'])
         assert camera_model in self._support_camera_model or Thermal.FLIR in camera_model, f'Unsupported camera type: {camera_model}'
         if camera_model in {
             Thermal.FLIR,
@@ -569,29 +728,25 @@ class Thermal:
             Thermal.DJI_XT2,
             Thermal.DJI_XTR,
         } or Thermal.FLIR in camera_model:
-            kwargs = dict((name, float(meta_json[key])) for name, key in [
+            kwargs = dict((name, metadata_float(meta_json[key])) for name, key in [
                 ('emissivity', 'Emissivity'),
-                ('ir_window_transmission', 'IR Window Transmission'),
-                ('planck_r1', 'Planck R1'),
-                ('planck_b', 'Planck B'),
-                ('planck_f', 'Planck F'),
-                ('planck_o', 'Planck O'),
-                ('planck_r2', 'Planck R2'),
-                ('ata1', 'Atmospheric Trans Alpha 1'),
-                ('ata2', 'Atmospheric Trans Alpha 2'),
-                ('atb1', 'Atmospheric Trans Beta 1'),
-                ('atb2', 'Atmospheric Trans Beta 2'),
-                ('atx', 'Atmospheric Trans X'),
+                ('ir_window_transmission', 'IRWindowTransmission'),
+                ('planck_r1', 'PlanckR1'),
+                ('planck_b', 'PlanckB'),
+                ('planck_f', 'PlanckF'),
+                ('planck_o', 'PlanckO'),
+                ('planck_r2', 'PlanckR2'),
+                ('ata1', 'AtmosphericTransAlpha1'),
+                ('ata2', 'AtmosphericTransAlpha2'),
+                ('atb1', 'AtmosphericTransBeta1'),
+                ('atb2', 'AtmosphericTransBeta2'),
+                ('atx', 'AtmosphericTransX'),
+                ('object_distance', 'ObjectDistance'),
+                ('atmospheric_temperature', 'AtmosphericTemperature'),
+                ('reflected_apparent_temperature', 'ReflectedApparentTemperature'),
+                ('ir_window_temperature', 'IRWindowTemperature'),
+                ('relative_humidity', 'RelativeHumidity'),
             ] if key in meta_json)
-            for name, key in [
-                ('object_distance', 'Object Distance'),
-                ('atmospheric_temperature', 'Atmospheric Temperature'),
-                ('reflected_apparent_temperature', 'Reflected Apparent Temperature'),
-                ('ir_window_temperature', 'IR Window Temperature'),
-                ('relative_humidity', 'Relative Humidity'),
-            ]:
-                if key in meta_json:
-                    kwargs[name] = float(meta_json[key][:-2])
             return self.parse_flir(
                 filepath_image=filepath_image,
                 **kwargs,
@@ -605,18 +760,18 @@ class Thermal:
             Thermal.DJI_M3T,
             Thermal.DJI_M30T,
         }:
-            for key in ['Image Height', 'Image Width']:
+            for key in ['ImageHeight', 'ImageWidth']:
                 assert key in meta_json, f'The `{key}` field is missing'
-            kwargs = dict((name, float(re.findall(r'\d+\.\d+|\d+', meta_json[key])[0])) for name, key in [
-                ('object_distance', 'Object Distance'),
-                ('relative_humidity', 'Relative Humidity'),
+            kwargs = dict((name, metadata_float(meta_json[key])) for name, key in [
+                ('object_distance', 'ObjectDistance'),
+                ('relative_humidity', 'RelativeHumidity'),
                 ('emissivity', 'Emissivity'),
-                ('reflected_apparent_temperature', 'Reflected Temperature'),
+                ('reflected_apparent_temperature', 'ReflectedTemperature'),
             ] if key in meta_json)
             # NOTE: the jpeg image of M30T has a fixed size of 640x512
             if camera_model != Thermal.DJI_M30T:
-                kwargs['image_height'] = int(meta_json['Image Height'])
-                kwargs['image_width'] = int(meta_json['Image Width'])
+                kwargs['image_height'] = int(meta_json['ImageHeight'])
+                kwargs['image_width'] = int(meta_json['ImageWidth'])
             if 'emissivity' in kwargs:
                 kwargs['emissivity'] /= 100
             if camera_model in [
@@ -628,6 +783,7 @@ class Thermal:
                 kwargs['m2ea_mode'] = True,
             return self.parse_dirp2(
                 filepath_image=filepath_image,
+                reuse_buffer=reuse_buffer,
                 **kwargs,
             )
 
@@ -689,79 +845,22 @@ class Thermal:
             * from https://github.com/detecttechnologies/thermal_base
             * from https://github.com/aloisklink/flirextractor/blob/1fc759808c747ad5562a9ddb3cd75c4def8a3f69/flirextractor/raw_temp_to_celcius.py
         """
-        thermal_img_bytes = subprocess.check_output([
-            self._filepath_exiftool, '-RawThermalImage', '-b', filepath_image
-        ])
-
-        thermal_img_stream = BytesIO(thermal_img_bytes)
-        thermal_img = Image.open(thermal_img_stream)
-        img_format = thermal_img.format
-
-        # checking for the type of the decoded images
-        if img_format == 'TIFF':
-            raw = np.array(thermal_img)
-        elif img_format == 'PNG':
-            raw = unpack(filepath_image)
-        else:
-            raise ValueError
-
-        # transmission through window (calibrated)
-        emiss_wind = 1 - ir_window_transmission
-        refl_wind = 0
-        # transmission through the air
-        h2o = (relative_humidity / 100) * np.exp(
-            1.5587
-            + 0.06939 * atmospheric_temperature
-            - 0.00027816 * atmospheric_temperature ** 2
-            + 0.00000068455 * atmospheric_temperature ** 3
-        )
-        tau1 = atx * np.exp(-np.sqrt(object_distance / 2) * (ata1 + atb1 * np.sqrt(h2o))) + (1 - atx) * np.exp(
-            -np.sqrt(object_distance / 2) * (ata2 + atb2 * np.sqrt(h2o))
+        # RawThermalImage is read straight from the FLIR APP1 segments (PNG or uncompressed 16 bit)
+        raw = unpack(filepath_image)
+
+        if raw.dtype != np.uint16:
+            raw = raw.astype(np.uint16)
+        # Frames of one flight share their parameters, so the LUT is computed once and reused
+        lut = flir_temperature_lut(
+            emissivity, object_distance, atmospheric_temperature, reflected_apparent_temperature,
+            ir_window_temperature, ir_window_transmission, relative_humidity,
+            planck_r1, planck_b, planck_f, planck_o, planck_r2,
+            ata1, ata2, atb1, atb2, atx,
         )
-        tau2 = atx * np.exp(-np.sqrt(object_distance / 2) * (ata1 + atb1 * np.sqrt(h2o))) + (1 - atx) * np.exp(
-            -np.sqrt(object_distance / 2) * (ata2 + atb2 * np.sqrt(h2o))
-        )
-        # radiance from the environment
-        raw_refl1 = planck_r1 / \
-            (planck_r2 * (np.exp(planck_b / (reflected_apparent_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o
-        # Reflected component
-        raw_refl1_attn = (1 - emissivity) / emissivity * raw_refl1
-
-        # Emission from atmosphere 1
-        raw_atm1 = (planck_r1 / (planck_r2 * (np.exp(planck_b / (atmospheric_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o)
-        # attenuation for atmospheric 1 emission
-        raw_atm1_attn = (1 - tau1) / emissivity / tau1 * raw_atm1
-
-        # Emission from window due to its own temp
-        raw_wind = (planck_r1 / (planck_r2 * (np.exp(planck_b / (ir_window_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o)
-        # Componen due to window emissivity
-        raw_wind_attn = (emiss_wind / emissivity / tau1 / ir_window_transmission * raw_wind)
-
-        # Reflection from window due to external objects
-        raw_refl2 = (planck_r1 / (planck_r2 *
-                     (np.exp(planck_b / (reflected_apparent_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o)
-        # component due to window reflectivity
-        raw_refl2_attn = (refl_wind / emissivity / tau1 / ir_window_transmission * raw_refl2)
-
-        # Emission from atmosphere 2
-        raw_atm2 = (planck_r1 / (planck_r2 * (np.exp(planck_b / (atmospheric_temperature + ABSOLUTE_ZERO)) - planck_f)) - planck_o)
-        # attenuation for atmospheric 2 emission
-        raw_atm2_attn = ((1 - tau2) / emissivity / tau1 / ir_window_transmission / tau2 * raw_atm2)
-
-        raw_obj = (
-            raw / emissivity / tau1 / ir_window_transmission / tau2
-            - raw_atm1_attn
-            - raw_atm2_attn
-            - raw_wind_attn
-            - raw_refl1_attn
-            - raw_refl2_attn
-        )
-        val_to_log = planck_r1 / (planck_r2 * (raw_obj + planck_o)) + planck_f
-        if any(val_to_log.ravel() < 0):
+        temperature = lut[raw]
+        if np.isnan(temperature).any():
             raise ValueError(f'Image seems to be corrupted: {filepath_image}')
-        # temperature from radiance
-        temperature = planck_b / np.log(val_to_log) - ABSOLUTE_ZERO
-        return np.array(temperature, self._dtype)
+        return temperature.astype(self._dtype, copy=False)
 
     def parse_dirp2(
             self,
@@ -773,6 +872,7 @@ class Thermal:
             emissivity: float = 1.0,
             reflected_apparent_temperature: float = 23.0,
             m2ea_mode: bool = False,
+            reuse_buffer: bool = False,
     ):
         """
         Parser infrared camera data as `NumPy` data`.
@@ -787,6 +887,8 @@ class Thermal:
             emissivity: float, How strongly the target surface is emitting energy as thermal radiation. Value range is [0.10~1.00].
             reflected_apparent_temperature: float, Reflected temperature in Celsius. The surface of the target that is measured could reflect the energy radiated by the surrounding objects. Value range is [-40.0~500.0]
             m2ea_mode: bool
+            reuse_buffer: bool, measure into a per-thread buffer that is reused for the next image of the same
+                resolution. The returned array is a view into it and only valid until the next parse call.
 
         Returns:
             np.ndarray: temperature array
@@ -794,54 +896,115 @@ class Thermal:
         References:
             * [DJI Thermal SDK](https://www.dji.com/cn/downloads/softwares/dji-thermal-sdk)
         """
-        with open(filepath_image, 'rb') as file:
-            raw = file.read()
-            raw_size = c_int32(len(raw))
-            raw_c_uint8 = cast(raw, POINTER(c_uint8))
+        image_height, image_width = int(image_height), int(image_width)
+        if self._dtype.__name__ == np.float32.__name__:
+            out_dtype, out_ctype, measure = np.float32, c_float, self._dirp_measure_ex
+        elif self._dtype.__name__ == np.int16.__name__:
+            out_dtype, out_ctype, measure = np.int16, c_int16, self._dirp_measure
+        else:
+            raise ValueError
+        if reuse_buffer:
+            data = self._output_buffer(out_dtype, image_height, image_width)
+        else:
+            data = np.empty((image_height, image_width), dtype=out_dtype)
+
+        # The R-JPEG is mapped instead of read into a bytes object; the private (copy-on-write) mapping
+        # gives ctypes a writable buffer without copying. It must stay valid until the handle is destroyed.
+        with open(filepath_image, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY) as raw:
+            raw_buffer = (c_uint8 * len(raw)).from_buffer(raw)
+            try:
+                self._measure_rjpeg(
+                    filepath_image, addressof(raw_buffer), len(raw_buffer), data, out_ctype, measure, m2ea_mode,
+                    object_distance, relative_humidity, emissivity, reflected_apparent_temperature,
+                )
+            finally:
+                # release the export, otherwise the mapping cannot be closed
+                del raw_buffer
+
+        if out_dtype is np.int16:
+            # Each INT16 value is ten times the temperature in Celsius
+            return np.array(data / 10, dtype=self._dtype)
+        return data
+
+    def parse_dirp2_batch(
+            self,
+            filepaths_images: List[str],
+            **kwargs,
+    ) -> Iterator[Tuple[str, np.ndarray]]:
+        """
+        Parse many DJI R-JPEG files of the same camera, reusing one output buffer per resolution.
+
+        Args:
+            filepaths_images: list of R-JPEG paths
+            **kwargs: measurement parameters as for `parse_dirp2`
+
+        Yields:
+            (filepath, temperature array) tuples. The array is a view into the reused buffer and
+            only valid until the next item is requested, copy it to keep it.
+        """
+        for filepath_image in filepaths_images:
+            yield filepath_image, self.parse_dirp2(filepath_image, reuse_buffer=True, **kwargs)
+
+    def _output_buffer(self, dtype, image_height: int, image_width: int) -> np.ndarray:
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        key = (np.dtype(dtype).name, image_height, image_width)
+        if key not in buffers:
+            buffers[key] = np.empty((image_height, image_width), dtype=dtype)
+        return buffers[key]
+
+    def _measure_rjpeg(
+            self,
+            filepath_image: str,
+            raw_address: int,
+            raw_length: int,
+            data: np.ndarray,
+            out_ctype,
+            measure,
+            m2ea_mode: bool,
+            object_distance: float,
+            relative_humidity: float,
+            emissivity: float,
+            reflected_apparent_temperature: float,
+    ) -> None:
+        # only the address is passed in, so a traceback of this frame does not keep the mapping exported
+        raw_size = c_int32(raw_length)
+        raw_c_uint8 = cast(c_void_p(raw_address), POINTER(c_uint8))
 
         handle = DIRP_HANDLE()
         rjpeg_version = dirp_rjpeg_version_t()
         rjpeg_resolotion = dirp_resolotion_t()
 
         return_status = self._dirp_create_from_rjpeg(raw_c_uint8, raw_size, handle)
-        # print(f'dirp_create_from_rjpeg: {return_status}')
-        # print(filepath_image, os.path.exists(filepath_image))
         assert return_status == Thermal.DIRP_SUCCESS, f'dirp_create_from_rjpeg error {filepath_image}:{return_status}'
-        assert self._dirp_get_rjpeg_version(handle, rjpeg_version) == Thermal.DIRP_SUCCESS
-        assert self._dirp_get_rjpeg_resolution(handle, rjpeg_resolotion) == Thermal.DIRP_SUCCESS
-
-        if not m2ea_mode:
-            params = dirp_measurement_params_t()
-            params_point = pointer(params)
-            return_status = self._dirp_get_measurement_params(handle, params_point)
-            assert return_status == Thermal.DIRP_SUCCESS, f'dirp_get_measurement_params error {filepath_image}:{return_status}'
-
-            if isinstance(object_distance, (float, int)):
-                params.distance = object_distance
-            if isinstance(relative_humidity, (float, int)):
-                params.humidity = relative_humidity
-            if isinstance(emissivity, (float, int)):
-                params.emissivity = emissivity
-            if isinstance(reflected_apparent_temperature, (float, int)):
-                params.reflection = reflected_apparent_temperature
-
-            return_status = self._dirp_set_measurement_params(handle, params)
-            assert return_status == Thermal.DIRP_SUCCESS, f'dirp_set_measurement_params error {filepath_image}:{return_status}'
-
-        if self._dtype.__name__ == np.float32.__name__:
-            data = np.zeros(image_width * image_height, dtype=np.float32)
-            data_ptr = data.ctypes.data_as(POINTER(c_float))
-            data_size = c_int32(image_width * image_height * sizeof(c_float))
-            assert self._dirp_measure_ex(handle, data_ptr, data_size) == Thermal.DIRP_SUCCESS
-            temp = np.reshape(data, (image_height, image_width))
-        elif self._dtype.__name__ == np.int16.__name__:
-            data = np.zeros(image_width * image_height, dtype=np.int16)
-            data_ptr = data.ctypes.data_as(POINTER(c_int16))
-            data_size = c_int32(image_width * image_height * sizeof(c_int16))
-            assert self._dirp_measure(handle, data_ptr, data_size) == Thermal.DIRP_SUCCESS
-            temp = np.reshape(data, (image_height, image_width)) / 10
-        else:
-            raise ValueError
-        assert self._dirp_destroy(handle) == Thermal.DIRP_SUCCESS
-
-        return np.array(temp, dtype=self._dtype)
+        try:
+            assert self._dirp_get_rjpeg_version(handle, rjpeg_version) == Thermal.DIRP_SUCCESS
+            assert self._dirp_get_rjpeg_resolution(handle, rjpeg_resolotion) == Thermal.DIRP_SUCCESS
+
+            if not m2ea_mode:
+                params = dirp_measurement_params_t()
+                params_point = pointer(params)
+                return_status = self._dirp_get_measurement_params(handle, params_point)
+                assert return_status == Thermal.DIRP_SUCCESS, f'dirp_get_measurement_params error {filepath_image}:{return_status}'
+
+                if isinstance(object_distance, (float, int)):
+                    params.distance = object_distance
+                if isinstance(relative_humidity, (float, int)):
+                    params.humidity = relative_humidity
+                if isinstance(emissivity, (float, int)):
+                    params.emissivity = emissivity
+                if isinstance(reflected_apparent_temperature, (float, int)):
+                    params.reflection = reflected_apparent_temperature
+
+                return_status = self._dirp_set_measurement_params(handle, params)
+                assert return_status == Thermal.DIRP_SUCCESS, f'dirp_set_measurement_params error {filepath_image}:{return_status}'
+
+            data_ptr = data.ctypes.data_as(POINTER(out_ctype))
+            data_size = c_int32(data.size * sizeof(out_ctype))
+            assert measure(handle, data_ptr, data_size) == Thermal.DIRP_SUCCESS
+        finally:
+            # never raise here, that would replace an exception of the measurement
+            return_status = self._dirp_destroy(handle)
+            if return_status != Thermal.DIRP_SUCCESS:
+                logger.error(f'dirp_destroy error {filepath_image}:{return_status}')
@@ -1,18 +1,60 @@
+import io
 import numpy as np
+from PIL import Image
 from app.services.thermal.thermal_parser.thermal import Thermal
-import os
+from app.services.thermal import temperature_store
+from app.services.thermal.thermal_statistics import compute_temperature_statistics
+from app.services.exiftool_pool import read_metadata
 
-thermal = Thermal(dtype=np.float32)
+THERMAL_METADATA_BATCH_SIZE = 100  # max files per exiftool invocation
+# binary matrix encodings: float32 °C, int16 deci-Kelvin, 16 bit grayscale PNG of deci-Kelvin
+MATRIX_MEDIA_TYPES = {
+    "f32": "application/octet-stream",
+    "i16": "application/octet-stream",
+    "png16": "image/png",
+}
 
-def parse_thermal_image(filepath_image: str) -> np.ndarray:
+
+def _read_thermal_metadata(filepath_image: str) -> dict:
+    metadata = read_metadata([filepath_image])[filepath_image]
+    if metadata is None:
+        raise ValueError(f"No metadata found in {filepath_image}")
+    return metadata
+
+
+# metadata is read through the shared exiftool -stay_open pool instead of one exiftool process per image
+thermal = Thermal(dtype=np.float32, metadata_reader=_read_thermal_metadata)
+
+
+def read_thermal_metadata_batch(filepaths: list[str]) -> dict:
+    """
+    Reads the metadata of many thermal images with a few calls to the shared exiftool pool.
+
+    :param filepaths: Paths to the thermal image files.
+    :return: Dict mapping each path to its exiftool metadata, or None if it could not be read.
+    """
+    metadata = {}
+    for i in range(0, len(filepaths), THERMAL_METADATA_BATCH_SIZE):
+        chunk = [str(path) for path in filepaths[i:i + THERMAL_METADATA_BATCH_SIZE]]
+        try:
+            metadata.update(read_metadata(chunk))
+        except Exception:
+            # the images are read one by one when they are parsed
+            metadata.update({path: None for path in chunk})
+    return metadata
+
+
+def parse_thermal_image(filepath_image: str, metadata: dict | None = None, reuse_buffer: bool = False) -> np.ndarray:
     """
     Parses a thermal image and returns the temperature data.
 
     :param filepath_image: Path to the thermal image file.
+    :param metadata: exiftool metadata of the image if it was already read.
+    :param reuse_buffer: Parse into a reused per-thread buffer; the result is only valid until the next parse.
     :return: Numpy array containing temperature data.
     """
     #print(f"Parsing thermal image from {filepath_image}")    
-    temp = thermal.parse(filepath_image=filepath_image)
+    temp = thermal.parse(filepath_image=filepath_image, metadata=metadata, reuse_buffer=reuse_buffer)
     min_temp = temp.min()
     max_temp = temp.max()
     #print(f"Parsed thermal image with min_temp: {min_temp}, max_temp: {max_temp}")
@@ -22,26 +64,26 @@ def parse_thermal_image(filepath_image: str) -> np.ndarray:
 
 def save_as_temperature_matrix(thermal_image: np.ndarray, filepath: str) -> None:
     """
-    Saves the thermal image as a temperature matrix in a .npy file.
+    Saves the thermal image as a temperature matrix, as compact int16 .tmx file
+    or, for paths ending in .npy, as float32 .npy file.
 
     :param thermal_image: Numpy array containing the thermal image data.
-    :param filepath: Path where the .npy file will be saved.
+    :param filepath: Path where the matrix file will be saved.
     """
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
     #print(f"Saving thermal image to {filepath}")
-    np.save(filepath, thermal_image)
+    temperature_store.save(thermal_image, filepath)
     #print(f"Thermal image saved successfully to {filepath}")
 
 
 def load_temperature_matrix(filepath: str) -> np.ndarray:
     """
-    Loads a temperature matrix from a .npy file.
+    Loads a temperature matrix from a .tmx or .npy file.
 
-    :param filepath: Path to the .npy file.
+    :param filepath: Path to the matrix file.
     :return: Numpy array containing the thermal image data.
     """
     #print(f"Loading thermal image from {filepath}")
-    thermal_image = np.load(filepath)
+    thermal_image = temperature_store.load(filepath)
     #print(f"Thermal image loaded successfully from {filepath}")
     
     return thermal_image
@@ -61,16 +103,77 @@ def get_temperature_range(thermal_image: np.ndarray) -> tuple:
     return min_temp, max_temp
 
 
-def process_thermal_image(filepath_image: str, save_path: str) -> tuple:
+def process_thermal_image(filepath_image: str, save_path: str, metadata: dict | None = None) -> tuple:
     """
     Processes a thermal image by parsing it, saving it as a temperature matrix,
-    and returning the temperature range.
+    and returning the temperature range and statistics.
 
     :param filepath_image: Path to the thermal image file.
-    :param save_path: Path where the processed .npy file will be saved.
-    :return: Tuple containing (min_temp, max_temp).
+    :param save_path: Path where the processed matrix file will be saved.
+    :param metadata: exiftool metadata of the image if it was already read.
+    :return: Tuple containing (min_temp, max_temp, temp_stats).
     """
-    thermal_image, min_temp, max_temp = parse_thermal_image(filepath_image)
+    # the matrix is used up right away, so it can live in the reused parse buffer
+    thermal_image, min_temp, max_temp = parse_thermal_image(filepath_image, metadata, reuse_buffer=True)
     save_as_temperature_matrix(thermal_image, save_path)
+    temp_stats = compute_temperature_statistics(thermal_image)
 
-    return min_temp, max_temp
+    return min_temp, max_temp, temp_stats
+
+
+def summarize_temperature_matrix(filepath: str) -> tuple:
+    """
+    Loads a stored temperature matrix and returns its temperature range and statistics.
+
+    :param filepath: Path to the matrix file.
+    :return: Tuple containing (min_temp, max_temp, temp_stats).
+    """
+    thermal_image = load_temperature_matrix(filepath)
+    min_temp, max_temp = get_temperature_range(thermal_image)
+    return min_temp, max_temp, compute_temperature_statistics(thermal_image)
+
+
+def encode_temperature_window(
+    filepath: str,
+    roi: tuple[int, int, int, int] | None = None,
+    step: int = 1,
+    fmt: str = "f32",
+) -> tuple[bytes, dict]:
+    """
+    Encodes a (downsampled) region of a stored temperature matrix for binary transport.
+
+    "f32" is little-endian float32 in °C. "i16" is little-endian int16 and "png16" a 16 bit
+    grayscale PNG, both with temperature = value * scale + offset (nodata is -32768 resp. 0).
+
+    :param filepath: Path to the matrix file.
+    :param roi: (x, y, width, height) region, None for the whole matrix.
+    :param step: Take every step-th row and column.
+    :param fmt: One of MATRIX_MEDIA_TYPES.
+    :return: Tuple of (encoded bytes, dict with width, height, roi, scale and offset).
+    """
+    if fmt not in MATRIX_MEDIA_TYPES:
+        raise ValueError(f"Unknown matrix format: {fmt}")
+    window, roi = temperature_store.read_window(filepath, roi, step)
+
+    if fmt == "f32":
+        celsius = window if isinstance(window, np.ndarray) else window.to_celsius()
+        data = celsius.astype("<f4", copy=False).tobytes()
+        scale, offset = 1.0, 0.0
+    else:
+        if isinstance(window, np.ndarray):
+            window = temperature_store.QuantizedMatrix(
+                temperature_store.quantize(window), temperature_store.SCALE,
+                temperature_store.OFFSET, temperature_store.NODATA,
+            )
+        scale, offset = window.scale, window.offset
+        if fmt == "i16":
+            data = window.values.astype("<i2", copy=False).tobytes()
+        else:
+            # deci-Kelvin is never negative, nodata becomes 0
+            values = np.where(window.values == window.nodata, 0, window.values).astype(np.uint16)
+            buffer = io.BytesIO()
+            Image.fromarray(values).save(buffer, format="PNG")
+            data = buffer.getvalue()
+
+    height, width = window.shape if isinstance(window, np.ndarray) else window.values.shape
+    return data, {"width": width, "height": height, "roi": roi, "scale": scale, "offset": offset}
@@ -0,0 +1,77 @@
+import numpy as np
+
+HISTOGRAM_BINS = 64
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+STATISTICS_RESOLUTION = 0.1  # °C, same as temperature_store
+HOTSPOT_COUNT = 16
+HOTSPOT_CELL = 16  # pixels, at most one hotspot per cell
+HOTSPOT_MIN_DISTANCE = 24  # pixels between two reported hotspots
+HOTSPOT_CANDIDATES = 4  # cells considered per reported hotspot before suppression
+
+
+def compute_temperature_statistics(temperature: np.ndarray) -> dict | None:
+    """Summarize a temperature matrix so hot spots can be found without loading it again.
+
+    The result is small enough to be stored next to min/max in ThermalData (about 1 kB):
+    a histogram between the image's min and max, a few percentiles (to STATISTICS_RESOLUTION)
+    and the hottest points, picked as the maxima of HOTSPOT_CELL sized cells that are at least
+    HOTSPOT_MIN_DISTANCE apart, so one warm object does not fill the whole list.
+
+    Args:
+        temperature (np.ndarray): 2D matrix in °C, NaN where there is no value.
+    Returns:
+        dict | None: {"histogram": {"min", "max", "counts"}, "percentiles": {"p50": ...},
+            "hotspots": [[x, y, temp], ...] hottest first}, or None if the matrix has no values.
+    """
+    temperature = np.asarray(temperature, dtype=np.float32)
+    valid = np.isfinite(temperature)
+    values = temperature[valid]
+    if values.size == 0:
+        return None
+
+    low, high = float(values.min()), float(values.max())
+    # bincount instead of np.histogram / np.percentile, which sort or search per value
+    bin_width = max(high - low, STATISTICS_RESOLUTION) / HISTOGRAM_BINS
+    counts = np.bincount(((values - low) / bin_width).astype(np.int64).clip(0, HISTOGRAM_BINS - 1), minlength=HISTOGRAM_BINS)
+    # percentiles from a histogram at the resolution of the stored matrices
+    cumulative = np.cumsum(np.bincount(((values - low) / STATISTICS_RESOLUTION).astype(np.int64)))
+    ranks = np.ceil(np.array(PERCENTILES) / 100 * values.size).clip(1, values.size)
+    percentiles = low + (np.searchsorted(cumulative, ranks) + 0.5) * STATISTICS_RESOLUTION
+
+    return {
+        "histogram": {"min": round(low, 2), "max": round(high, 2), "counts": counts.tolist()},
+        "percentiles": {f"p{p}": round(float(min(v, high)), 2) for p, v in zip(PERCENTILES, percentiles)},
+        "hotspots": _find_hotspots(np.where(valid, temperature, -np.inf)),
+    }
+
+
+def _find_hotspots(temperature: np.ndarray) -> list[list]:
+    height, width = temperature.shape
+    cell = HOTSPOT_CELL
+    rows, cols = -(-height // cell), -(-width // cell)
+    padded = np.full((rows * cell, cols * cell), -np.inf, dtype=np.float32)
+    padded[:height, :width] = temperature
+
+    # the hottest pixel of every cell
+    cells = padded.reshape(rows, cell, cols, cell).transpose(0, 2, 1, 3).reshape(rows * cols, cell * cell)
+    local = cells.argmax(axis=1)
+    peaks = cells[np.arange(rows * cols), local]
+    ys = (np.arange(rows * cols) // cols) * cell + local // cell
+    xs = (np.arange(rows * cols) % cols) * cell + local % cell
+
+    candidates = min(HOTSPOT_COUNT * HOTSPOT_CANDIDATES, peaks.size)
+    best = np.argpartition(-peaks, candidates - 1)[:candidates]
+    best = best[np.argsort(-peaks[best], kind="stable")]
+
+    hotspots = []
+    min_distance_sq = HOTSPOT_MIN_DISTANCE ** 2
+    for i in best:
+        if not np.isfinite(peaks[i]):
+            break
+        x, y = int(xs[i]), int(ys[i])
+        if any((x - hx) ** 2 + (y - hy) ** 2 < min_distance_sq for hx, hy, _ in hotspots):
+            continue
+        hotspots.append([x, y, round(float(peaks[i]), 2)])
+        if len(hotspots) == HOTSPOT_COUNT:
+            break
+    return hotspots
@@ -0,0 +1,133 @@
+import io
+import logging
+from pathlib import Path
+
+from PIL import Image, ExifTags
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (300, 300)
+# embedded previews with a different aspect ratio are letterboxed or cropped, skip them
+PREVIEW_ASPECT_TOLERANCE = 0.02
+
+EXIF_HEADER = b"Exif\x00\x00"
+TAG_JPEG_INTERCHANGE_FORMAT = 0x0201
+TAG_JPEG_INTERCHANGE_FORMAT_LENGTH = 0x0202
+
+# EXIF orientation -> transpose that brings the image upright
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def create_thumbnail(source: Path, target: Path, size: tuple[int, int] = THUMBNAIL_SIZE) -> Path:
+    """Write a JPEG thumbnail of source that fits into size, decoding as little as possible.
+
+    Tried in order:
+    1. an embedded preview (EXIF thumbnail or MPF frame) that is at least as large as the result,
+    2. a reduced-size JPEG decode (draft mode, the DCT scales the image down by up to 8x),
+    3. a full decode for everything that is not a JPEG.
+    The EXIF orientation of the original is applied in all cases.
+    Args:
+        source (Path): The image to create the thumbnail for.
+        target (Path): Where the JPEG thumbnail is written.
+        size (tuple[int, int]): Bounding box of the thumbnail.
+    Returns:
+        Path: The path of the written thumbnail.
+    """
+    with Image.open(source) as img:
+        orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+        thumb = _embedded_preview(img, size)
+        if thumb is None:
+            thumb = _decode_reduced(img, size)
+
+    thumb.thumbnail(size, reducing_gap=None)
+    if orientation in ORIENTATION_TRANSPOSE:
+        thumb = thumb.transpose(ORIENTATION_TRANSPOSE[orientation])
+    if thumb.mode not in ("RGB", "L"):
+        thumb = thumb.convert("RGB")
+    thumb.save(target, "JPEG")
+    return target
+
+
+def _embedded_preview(img: Image.Image, size: tuple[int, int]) -> Image.Image | None:
+    """Return a decoded embedded preview that can replace the full image, or None."""
+    if img.format not in ("JPEG", "MPO"):
+        return None
+
+    # img itself switches to the preview frame while iterating MPF frames
+    image_size = img.size
+    needed = _fit(image_size, size)
+    try:
+        # the EXIF thumbnail is the smallest candidate, check it before the MPF frames
+        exif_thumb = _exif_thumbnail(img)
+        if exif_thumb is not None and _usable_preview(exif_thumb.size, image_size, needed):
+            exif_thumb.load()
+            return exif_thumb
+
+        for preview in _mpf_previews(img):
+            if _usable_preview(preview.size, image_size, needed):
+                preview.draft(preview.mode, needed)
+                preview.load()
+                return preview.copy()
+    except Exception as e:
+        # a broken preview is no reason to fail, the main image is decoded instead
+        logger.debug(f"Ignoring unreadable embedded preview: {e}")
+    finally:
+        if img.format == "MPO":
+            img.seek(0)
+    return None
+
+
+def _mpf_previews(img: Image.Image):
+    """Yield the additional frames of a multi-picture (MPF) JPEG, e.g. the large preview of DJI images."""
+    for frame in range(1, getattr(img, "n_frames", 1)):
+        img.seek(frame)
+        yield img
+
+
+def _exif_thumbnail(img: Image.Image) -> Image.Image | None:
+    """Open the JPEG thumbnail stored in EXIF IFD1, or None if there is none."""
+    raw = img.info.get("exif")
+    if not raw or not raw.startswith(EXIF_HEADER):
+        return None
+    ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+    offset = ifd1.get(TAG_JPEG_INTERCHANGE_FORMAT)
+    length = ifd1.get(TAG_JPEG_INTERCHANGE_FORMAT_LENGTH)
+    if not offset or not length:
+        return None
+    # offsets are relative to the TIFF header that follows "Exif\0\0"
+    start = len(EXIF_HEADER) + offset
+    data = raw[start:start + length]
+    if len(data) != length:
+        return None
+    return Image.open(io.BytesIO(data))
+
+
+def _decode_reduced(img: Image.Image, size: tuple[int, int]) -> Image.Image:
+    """Decode the main image, letting libjpeg scale it down in the DCT domain where possible."""
+    if img.format in ("JPEG", "MPO"):
+        # draft picks the largest 1/2, 1/4 or 1/8 scale that is still >= size
+        img.draft(img.mode, size)
+    img.load()
+    return img.copy()
+
+
+def _usable_preview(preview_size: tuple[int, int], image_size: tuple[int, int], needed: tuple[int, int]) -> bool:
+    if preview_size[0] < needed[0] or preview_size[1] < needed[1]:
+        return False
+    preview_aspect = preview_size[0] / preview_size[1]
+    image_aspect = image_size[0] / image_size[1]
+    return abs(preview_aspect - image_aspect) <= PREVIEW_ASPECT_TOLERANCE * image_aspect
+
+
+def _fit(image_size: tuple[int, int], size: tuple[int, int]) -> tuple[int, int]:
+    """Size of image_size scaled down to fit into size, keeping the aspect ratio."""
+    scale = min(size[0] / image_size[0], size[1] / image_size[1], 1.0)
+    return max(1, round(image_size[0] * scale)), max(1, round(image_size[1] * scale))